@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""Compare requests/sec and latency of the sync, gthread and ASGI workers under many concurrent clients.
+
+Starts gunicorn three times with ``dude.gunicorn_config``: sync workers
+and then gthread workers with as many threads as `ASGI_THREADS` serving
+``dude.wsgi:app``, then uvicorn workers serving ``dude.asgi:app``. Each
+page is then requested by `--connections` keep-alive clients for
+`--duration` seconds, and its requests/sec, median and 99th percentile
+latency are reported, with the errors by status. The login posts the
+form, so it includes a bcrypt hash; a 503 there is the hashing queue
+shedding load (`HASHING_QUEUE_DEPTH`).
+
+Usage: ::
+
+    python -m benchmarks.asgi_load [--workers N] [--connections N] [--duration S] [--rounds N]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPRedirectHandler, build_opener, urlopen
+
+MODES = (
+    ('wsgi, sync workers', ['dude.wsgi:app']),
+    ('wsgi, gthread workers', ['-k', 'gthread', '--threads', '15', 'dude.wsgi:app']),
+    ('asgi, uvicorn workers', ['-k', 'uvicorn.workers.UvicornWorker', 'dude.asgi:app']),
+)
+
+CREDENTIALS = {'username': 'dude', 'password': 'sweet'}
+
+PAGES = (
+    ('GET', '/', None),
+    ('GET', '/register/', None),
+    ('GET', '/users/', None),
+    ('POST', '/', urlencode(CREDENTIALS).encode('ascii')),
+)
+
+
+def free_port():
+    """Return a TCP port nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def read_response(reader):
+    """Read one response and return its status and whether the connection stays open."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(port, request, deadline, latencies, errors):
+    """Send `request` over one connection, reconnecting when the server closes it, until `deadline`."""
+    loop = asyncio.get_event_loop()
+    reader = writer = None
+    while loop.time() < deadline:
+        start = loop.time()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError):
+            errors.append('conn')
+            keep_alive = False
+        else:
+            latencies.append(loop.time() - start)
+            if status >= 400:
+                errors.append(status)
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def load(port, method, path, body, cookie, options):
+    """Request a page from `options.connections` clients and return requests/sec, p50, p99 and errors."""
+    lines = ['{0} {1} HTTP/1.1'.format(method, path), 'Host: 127.0.0.1:{0}'.format(port), 'Cookie: ' + cookie]
+    if body is not None:
+        lines += ['Content-Type: application/x-www-form-urlencoded', 'Content-Length: {0}'.format(len(body))]
+    request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+    latencies = []
+    errors = []
+
+    async def clients():
+        deadline = loop.time() + options.duration
+        await asyncio.gather(*(client(port, request, deadline, latencies, errors)
+                               for _ in range(options.connections)))
+
+    loop = asyncio.new_event_loop()
+    try:
+        start = loop.time()
+        loop.run_until_complete(clients())
+        elapsed = loop.time() - start
+    finally:
+        loop.close()
+
+    counts = {}
+    for error in errors:
+        counts[error] = counts.get(error, 0) + 1
+    errors = ' '.join('{0}:{1}'.format(error, count) for error, count in sorted(counts.items(), key=str)) or '-'
+
+    latencies.sort()
+    if not latencies:
+        return 0, 0, 0, errors
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+    return len(latencies) / elapsed, percentile(0.5), percentile(0.99), errors
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """Hand redirects back as errors, keeping their headers."""
+
+    def redirect_request(self, *args, **kwargs):
+        """Don't follow."""
+        return None
+
+
+def log_in(base):
+    """Log in and return the session cookie."""
+    try:
+        response = build_opener(NoRedirect).open(base + '/', urlencode(CREDENTIALS).encode('ascii'))
+    except HTTPError as error:
+        response = error
+    return response.headers['Set-Cookie'].split(';', 1)[0]
+
+
+def run(name, args, env, options):
+    """Start gunicorn with `args`, load every page and print the results."""
+    port = free_port()
+    base = 'http://127.0.0.1:{0}'.format(port)
+    master = subprocess.Popen(  # noqa: S603
+        [sys.executable, '-m', 'gunicorn', '-c', 'python:dude.gunicorn_config', '-w', str(options.workers),
+         '-b', '127.0.0.1:{0}'.format(port), '--backlog', str(options.connections * 2)] + args,
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urlopen(base + '/about/').read()  # noqa: S310 # always http://127.0.0.1
+                break
+            except OSError:
+                if master.poll() is not None:
+                    raise RuntimeError('gunicorn exited with {0}'.format(master.returncode))
+                time.sleep(0.05)
+        cookie = log_in(base)
+        for method, path, body in PAGES:
+            rps, p50, p99, errors = load(port, method, path, body, cookie, options)
+            print('{0:22} {1:4} {2:11} {3:8.0f} {4:9.1f} {5:9.1f} {6}'.format(
+                name, method, path, rps, p50 * 1000, p99 * 1000, errors))
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=5, help='Seconds to load each page for')
+    parser.add_argument('--rounds', type=int, default=10, help='bcrypt log rounds')
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='dude-asgi-load-')
+    database = 'sqlite:///{0}'.format(os.path.join(directory, 'dude.db'))
+    settings = os.path.join(directory, 'settings.py')
+    with open(settings, 'w') as fp:
+        # No Redis needed; the workers share sessions through their cookies
+        fp.write("CACHE_TYPE = 'simple'\nSESSION_TYPE = 'cookie'\nWTF_CSRF_ENABLED = False\n")
+        fp.write('BCRYPT_LOG_ROUNDS = {0}\n'.format(options.rounds))
+    env = dict(os.environ, SECRET_KEY='benchmark', DATABASE_URL=database, CACHE_REDIS_URL='redis://localhost',
+               DUDE_SETTINGS=settings, FLASK_ENV='production')
+    env.pop('WEB_CONCURRENCY', None)
+
+    try:
+        subprocess.check_call(  # noqa: S603
+            [sys.executable, '-c', 'from dude.app import create_app; from dude.database import db; '
+                                   'from dude.user.models import User; '
+                                   'app = create_app(); app.app_context().push(); db.create_all(); '
+                                   "User.create(username='dude', email='dude@example.com', password='sweet', "
+                                   'is_active=True)'], env=env)
+
+        print('{0} workers, {1} connections, {2:g}s per page'.format(
+            options.workers, options.connections, options.duration))
+        print('{0:22} {1:4} {2:11} {3:>8} {4:>9} {5:>9} {6}'.format(
+            'server', '', 'page', 'req/s', 'p50 (ms)', 'p99 (ms)', 'errors'))
+        for name, args in MODES:
+            run(name, args, env, options)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Measure login throughput under concurrent load for each hashing executor.
+
+Usage: ::
+
+    python -m benchmarks.login_throughput [--clients N] [--logins N] [--rounds N] [--workers N] [--queue-depth N]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from dude.app import create_app
+from dude.database import db
+from dude.user.models import User
+
+
+def make_settings(database, executor, args):
+    """Return a settings object for one benchmark run."""
+    class Settings(object):
+        TESTING = True
+        SECRET_KEY = 'benchmark'
+        WTF_CSRF_ENABLED = False
+        DEBUG_TB_ENABLED = False
+        CACHE_TYPE = 'simple'
+        SESSION_TYPE = 'simple'
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///{0}'.format(database)
+        BCRYPT_LOG_ROUNDS = args.rounds
+        HASHING_EXECUTOR = executor
+        HASHING_WORKERS = args.workers
+        HASHING_QUEUE_DEPTH = args.queue_depth
+
+    return Settings
+
+
+def run(executor, args, database):
+    """Log in `args.logins` times from `args.clients` threads and return the results."""
+    app = create_app(make_settings(database, executor, args))
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        User.create(username='dude', email='dude@example.com', password='sweet', is_active=True)
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    per_client = args.logins // args.clients
+
+    def client():
+        test_client = app.test_client()
+        for _ in range(per_client):
+            start = time.perf_counter()
+            response = test_client.post('/', data={'username': 'dude', 'password': 'sweet'})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return len(latencies) / total, p99, statuses
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=160)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-depth', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'bench.db')
+        for executor in ('inline', 'thread', 'process'):
+            rps, p99, statuses = run(executor, args, database)
+            print('{0:8} {1:8.1f} logins/s  p99 {2:7.1f} ms  statuses {3}'.format(
+                executor, rps, p99 * 1000, statuses))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Measure the per-request cost of `HeaderMiddleware` against the bare WSGI app.
+
+Usage: ::
+
+    python -m benchmarks.middleware_overhead [--paths N] [--number N]
+"""
+import argparse
+import timeit
+
+from dude.middleware import HeaderMiddleware
+
+HEADERS = (
+    ('X-Clacks-Overhead', 'GNU'),
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'SAMEORIGIN'),
+    ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+)
+
+
+def bare_app(environ, start_response):
+    """Respond with a fixed body, like the cheapest possible view."""
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', '2')])
+    return [b'ok']
+
+
+def start_response(status, headers, exc_info=None):
+    """Discard the response."""
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paths', type=int, default=8, help='Prefixes in the per-path header map')
+    parser.add_argument('--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    paths = {'/section{0}/'.format(n): (('Cache-Control', 'no-store'),) for n in range(args.paths)}
+    apps = (
+        ('bare app', bare_app),
+        ('global headers', HeaderMiddleware(bare_app, HEADERS)),
+        ('path map, miss', HeaderMiddleware(bare_app, HEADERS, paths)),
+    )
+    environs = {'path map, hit': {'PATH_INFO': '/section0/page'}}
+    apps += (('path map, hit', apps[-1][1]),)
+
+    baseline = None
+    for name, app in apps:
+        environ = environs.get(name, {'PATH_INFO': '/'})
+
+        def request(app=app, environ=environ):
+            return app(environ, start_response)
+
+        best = min(timeit.repeat(request, number=args.number, repeat=3)) / args.number
+        if baseline is None:
+            baseline = best
+        print('{0:16} {1:8.0f} ns/request  +{2:6.0f} ns'.format(name, best * 1e9, (best - baseline) * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Compare `str(environment)` with the streaming `Environment.export`.
+
+Usage: ::
+
+    python -m benchmarks.platform_export [--routes N] [--relationships N] [--number N]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import timeit
+
+from dude.platform import build_environment
+
+
+def encode(obj):
+    """Encode `obj` the way Platform.sh does for its json variables."""
+    return base64.b64encode(json.dumps(obj).encode('ascii')).decode('ascii')
+
+
+def make_routes(count):
+    """Return a Platform.sh style routes mapping with `count` routes."""
+    return {
+        'https://www{0}.example.com/'.format(n): {
+            'type': 'upstream',
+            'upstream': 'dude',
+            'original_url': 'https://www{0}.{{default}}/'.format(n),
+            'restrict_robots': True,
+            'cache': {'enabled': True, 'default_ttl': 0, 'cookies': ['*'], 'headers': ['Accept', 'Accept-Language']},
+            'ssi': {'enabled': False},
+            'tls': {'client_authentication': None, 'min_version': None, 'client_certificate_authorities': [],
+                    'strict_transport_security': {'preload': None, 'include_subdomains': None, 'enabled': None}},
+        }
+        for n in range(count)
+    }
+
+
+def make_relationships(count):
+    """Return a Platform.sh style relationships mapping with `count` relationships."""
+    return {
+        'postgres{0}'.format(n): [{
+            'service': 'postgres', 'rel': 'postgresql', 'scheme': 'pgsql', 'username': 'main',
+            'password': 'main', 'host': 'postgres{0}.internal'.format(n), 'port': 5432, 'path': 'main',
+            'ip': '169.254.251.{0}'.format(n % 256), 'cluster': 'torcun5muasla-master-7rqtwti',
+            'query': {'is_master': n == 0},
+        }]
+        for n in range(count)
+    }
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--routes', type=int, default=200)
+    parser.add_argument('--relationships', type=int, default=100)
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ['PLATFORM_APPLICATION_NAME'] = 'dude'
+    os.environ['PLATFORM_ROUTES'] = encode(make_routes(args.routes))
+    os.environ['PLATFORM_RELATIONSHIPS'] = encode(make_relationships(args.relationships))
+    os.environ['PLATFORM_VARIABLES'] = encode({})
+
+    print('routes: {0} bytes, relationships: {1} bytes'.format(
+        len(os.environ['PLATFORM_ROUTES']), len(os.environ['PLATFORM_RELATIONSHIPS'])))
+
+    def run_str():
+        return str(build_environment(cache=False))
+
+    def run_export():
+        build_environment().export(io.StringIO())
+
+    def run_export_canonical():
+        build_environment().export(io.StringIO(), canonical=True)
+
+    for name, func in (('str(environment)', run_str),
+                       ('export()', run_export),
+                       ('export(canonical=True)', run_export_canonical)):
+        best = min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+        print('{0:24} {1:10.1f} us/op'.format(name, best * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Measure the per-request cost of each session backend, and the size of what it sends or stores.
+
+Every backend serves the same three views through the whole app: one that
+never uses the session, one that reads it and one that changes it. The
+session holds a logged-in user and `--flashes` pending flashed messages,
+as after a failed form. Redis is measured when `--redis-url` answers.
+
+Usage: ::
+
+    python -m benchmarks.session_overhead [--flashes N] [--number N] [--redis-url URL]
+"""
+import argparse
+import timeit
+
+from flask import flash, session
+from werkzeug.test import EnvironBuilder
+
+from dude.app import create_app
+
+BACKENDS = ('cookie', 'simple', 'redis')
+
+VIEWS = ('untouched', 'read', 'write')
+
+
+def make_settings(kind, options):
+    """Return a settings object for one backend."""
+    class Settings(object):
+        TESTING = True
+        SECRET_KEY = 'benchmark'
+        CACHE_TYPE = 'simple'
+        CACHE_REDIS_URL = options.redis_url
+        SESSION_TYPE = kind
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        ASSETS_MANIFEST_PATH = None
+        TEMPLATE_BYTECODE_CACHE = None
+        ADMIN_LAZY = True
+        DEBUG_TB_ENABLED = False
+        QUERY_LOG_ENABLED = False
+
+    return Settings
+
+
+def make_app(kind, options):
+    """Return the app with `kind` sessions and the benchmark views."""
+    app = create_app(make_settings(kind, options))
+
+    def setup():
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+        session['_id'] = 'f' * 128
+        for n in range(options.flashes):
+            flash('Password - Field must be between 6 and 40 characters long. ({0})'.format(n), 'warning')
+        return 'ok'
+
+    def untouched():
+        return 'ok'
+
+    def read():
+        return session.get('_user_id', '')
+
+    def write():
+        session['counter'] = session.get('counter', 0) + 1
+        return 'ok'
+
+    for view in (setup, untouched, read, write):
+        app.add_url_rule('/bench/' + view.__name__, view.__name__, view)
+    return app
+
+
+def request(app, path, cookie=None):
+    """Run one request through `app` and return its status and headers."""
+    environ = EnvironBuilder(path=path, headers={'Cookie': cookie} if cookie else {}).get_environ()
+    response = []
+
+    def start_response(status, headers, exc_info=None):
+        response[:] = [status, headers]
+
+    for _ in app(environ, start_response):
+        pass
+    return response
+
+
+def session_cookie(headers):
+    """Return the ``name=value`` of the session cookie set in `headers`."""
+    for name, value in headers:
+        if name == 'Set-Cookie' and value.startswith('session='):
+            return value.split(';', 1)[0]
+    return None
+
+
+def redis_available(url):
+    """Return whether Redis answers at `url`."""
+    import redis
+    try:
+        return redis.StrictRedis.from_url(url, socket_connect_timeout=0.5).ping()
+    except redis.RedisError:
+        return False
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--flashes', type=int, default=3, help='Flashed messages pending in the session')
+    parser.add_argument('--number', type=int, default=2000)
+    parser.add_argument('--redis-url', default='redis://localhost:6379/15')
+    options = parser.parse_args()
+
+    print('{0:8} {1:>10} {2:>10} {3:>10} {4:>8} {5:>8}'.format(
+        'backend', 'untouched', 'read', 'write', 'cookie', 'stored'))
+    for kind in BACKENDS:
+        if kind == 'redis' and not redis_available(options.redis_url):
+            print('{0:8} skipped, nothing answers at {1}'.format(kind, options.redis_url))
+            continue
+        app = make_app(kind, options)
+        cookie = session_cookie(request(app, '/bench/setup')[1])
+        stored = len(cookie) - len('session=')
+        store = getattr(app.session_interface, 'store', None)
+        if store is not None:
+            stored = len(store.load(cookie.split('=', 1)[1])[0])
+
+        results = []
+        for view in VIEWS:
+            def run(app=app, path='/bench/' + view, cookie=cookie):
+                return request(app, path, cookie)
+
+            results.append(min(timeit.repeat(run, number=options.number, repeat=3)) / options.number)
+        print('{0:8} {1:8.1f}us {2:8.1f}us {3:8.1f}us {4:7}B {5:7}B'.format(
+            kind, *([r * 1e6 for r in results] + [len(cookie), stored])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Compare gunicorn worker memory and first-request latency with and without the warm, preloaded master.
+
+Starts gunicorn twice: the old way, each worker building its own app from
+``dude.app:create_app()``, and with ``dude.gunicorn_config``, which builds and
+warms ``dude.wsgi:app`` once in the master. After some traffic it reports
+each worker's RSS, PSS (RSS with shared pages split between the processes
+sharing them) and private memory. Linux only. The shared memory depends on
+``gc.freeze``, so run it on Python 3.7 or later; on 3.6 the preloaded workers
+keep less of it.
+
+Usage: ::
+
+    python -m benchmarks.worker_memory [--workers N] [--requests N]
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import subprocess  # noqa: S404
+import sys
+import tempfile
+import time
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+MODES = (
+    ('create_app per worker', ['dude.app:create_app()']),
+    ('warm preloaded master', ['-c', 'python:dude.gunicorn_config', 'dude.wsgi:app']),
+)
+
+PATHS = ('/', '/about/', '/register/', '/admin/user/', '/admin/role/')
+
+
+def free_port():
+    """Return a TCP port nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(url):
+    """Request `url` and return how long it took."""
+    start = time.perf_counter()
+    try:
+        urlopen(url).read()  # noqa: S310 # always http://127.0.0.1
+    except HTTPError:
+        pass
+    return time.perf_counter() - start
+
+
+def memory(pid):
+    """Return the RSS, PSS and private memory of `pid` in KiB."""
+    fields = {}
+    with open('/proc/{0}/smaps_rollup'.format(pid)) as fp:
+        for line in fp:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields['Rss'], fields['Pss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+
+def children(pid):
+    """Return the ids of the child processes of `pid`."""
+    with open('/proc/{0}/task/{0}/children'.format(pid)) as fp:
+        return [int(child) for child in fp.read().split()]
+
+
+def run(name, args, env, options):
+    """Start gunicorn with `args`, send it traffic and print the memory of its workers."""
+    port = free_port()
+    base = 'http://127.0.0.1:{0}'.format(port)
+    started = time.perf_counter()
+    master = subprocess.Popen(  # noqa: S603
+        [sys.executable, '-m', 'gunicorn', '-w', str(options.workers), '-b', '127.0.0.1:{0}'.format(port)] + args,
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                first = get(base + '/about/')
+                break
+            except OSError:
+                if master.poll() is not None:
+                    raise RuntimeError('gunicorn exited with {0}'.format(master.returncode))
+                time.sleep(0.05)
+        ready = time.perf_counter() - started
+        for _ in range(options.requests):
+            for path in PATHS:
+                get(base + path)
+
+        workers = [memory(pid) for pid in children(master.pid)]
+        rss, pss, private = (sum(values) / len(workers) / 1024 for values in zip(*workers))
+        print('{0:24} {1:7.1f} {2:7.1f} {3:8.1f} {4:10.0f} {5:8.1f}'.format(
+            name, rss, pss, private, first * 1000, ready))
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait()
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=50, help='Rounds of requests to every page')
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='dude-worker-memory-')
+    database = 'sqlite:///{0}'.format(os.path.join(directory, 'dude.db'))
+    settings = os.path.join(directory, 'settings.py')
+    with open(settings, 'w') as fp:
+        fp.write("CACHE_TYPE = 'simple'\nSESSION_TYPE = 'cookie'\n")
+    env = dict(os.environ, SECRET_KEY='benchmark', DATABASE_URL=database, CACHE_REDIS_URL='redis://localhost',
+               DUDE_SETTINGS=settings, FLASK_ENV='production')
+    env.pop('WEB_CONCURRENCY', None)
+
+    try:
+        subprocess.check_call(  # noqa: S603
+            [sys.executable, '-c', 'from dude.app import create_app; from dude.database import db; '
+                                   'app = create_app(); app.app_context().push(); db.create_all()'], env=env)
+
+        print('{0} workers, {1} requests each to {2} pages'.format(options.workers, options.requests, len(PATHS)))
+        print('{0:24} {1:>7} {2:>7} {3:>8} {4:>10} {5:>8}'.format(
+            'per worker (MiB)', 'RSS', 'PSS', 'private', 'first (ms)', 'ready (s)'))
+        for name, args in MODES:
+            run(name, args, env, options)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,189 @@
 """Admin config."""
+import base64
+import datetime as dt
+import json
+
+from flask import g, request
+from flask_admin import Admin
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import func, or_, text, tuple_
+from sqlalchemy.orm import selectinload
 
-from dude.extensions import admin, db
+from dude.extensions import db
 from dude.user.models import Role, User
 
-admin.add_view(ModelView(Role, db.session))
-admin.add_view(ModelView(User, db.session))
+admin = Admin(template_mode='bootstrap3')
+
+_datetime_format = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def approximate_count(session, table):
+    """Return the row count of `table`, estimated from the planner statistics on PostgreSQL."""
+    if session.get_bind().dialect.name == 'postgresql':
+        estimate = session.execute(
+            text('SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)'), {'name': table.name}).scalar()
+        # -1 (or 0 on older servers) until the table has been vacuumed or analyzed
+        if estimate is not None and estimate > 0:
+            return int(estimate)
+    return session.query(func.count()).select_from(table).scalar()
+
+
+def encode_cursor(values):
+    """Return an opaque URL-safe cursor for the keyset `values`."""
+    values = [v.strftime(_datetime_format) if isinstance(v, dt.datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _cursor_value(value, column):
+    if isinstance(column.type, db.DateTime):
+        return dt.datetime.strptime(value, _datetime_format)
+    python_type = column.type.python_type
+    # JSON `true` would pass for an integer
+    if not isinstance(value, python_type) or isinstance(value, bool) and python_type is not bool:
+        raise TypeError('{0!r} is not a {1}'.format(value, python_type.__name__))
+    return value
+
+
+def decode_cursor(cursor, columns):
+    """Return the keyset values in `cursor` for `columns`, or `None` if it's invalid.
+
+    A cursor is only ever one this view encoded, so any value that doesn't
+    have its column's type makes the whole cursor invalid.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [_cursor_value(v, c) for v, c in zip(values, columns)]
+    except (TypeError, ValueError):
+        return None
+
+
+class KeysetModelView(ModelView):
+    """A `ModelView` that pages by keyset instead of by offset, without counting every row.
+
+    When the list is sorted by a column in `keyset_columns` (the default
+    sort is), a page continues from the last row of the previous one
+    (``?after=``) or ends before the first row of the next one (``?before=``),
+    so every page costs the same however deep it is. Other sorts fall back to
+    offset paging. The row count is estimated from the table statistics and
+    skipped when searching or filtering. Search matches the start of the
+    lower-cased `column_searchable_list` columns, which their expression
+    indexes can serve.
+    """
+
+    list_template = 'admin/model/keyset_list.html'
+    simple_list_pager = True
+    can_set_page_size = True
+    column_default_sort = ('id', True)
+
+    #: Maps a sort column to the columns its keyset compares, ending with a unique one
+    keyset_columns = {}
+
+    def _keyset(self, sort_column, sort_desc):
+        if sort_column is None:
+            sort_column, sort_desc = self.column_default_sort
+        columns = self.keyset_columns.get(sort_column)
+        if columns is None:
+            return None, sort_desc
+        return [getattr(self.model, name) for name in columns], sort_desc
+
+    def _apply_search(self, query, count_query, joins, count_joins, search):
+        for term in search.split():
+            prefix = term.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            clause = or_(*(func.lower(field).like(prefix, escape='\\') for field, _ in self._search_fields))
+            query = query.filter(clause)
+            if count_query is not None:
+                count_query = count_query.filter(clause)
+        return query, count_query, joins, count_joins
+
+    def _page_url(self, **cursor):
+        view_args = self._get_list_extra_args()
+        extra_args = {k: v for k, v in view_args.extra_args.items() if k not in ('after', 'before')}
+        extra_args.update(cursor)
+        return self._get_list_url(view_args.clone(page=None, extra_args=extra_args))
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        """Return the approximate row count and one page of rows."""
+        g._keyset_pager = None
+        count = None
+        if not search and not filters:
+            count = approximate_count(self.session, self.model.__table__)
+
+        columns, descending = self._keyset(sort_column, sort_desc)
+        if columns is None:
+            _, query = super(KeysetModelView, self).get_list(
+                page, sort_column, sort_desc, search, filters, execute, page_size)
+            return count, query
+
+        if page_size is None:
+            page_size = self.page_size
+        _, query = super(KeysetModelView, self).get_list(
+            None, sort_column, sort_desc, search, filters, execute=False, page_size=0)
+
+        after = decode_cursor(request.args.get('after', ''), columns)
+        before = None if after is not None else decode_cursor(request.args.get('before', ''), columns)
+        # Paging backwards reads the rows before the cursor in reverse order and flips them back
+        forward = before is None
+        bound = after if forward else before
+        if bound is not None:
+            key, bound = (tuple_(*columns), tuple_(*bound)) if len(columns) > 1 else (columns[0], bound[0])
+            query = query.filter(key < bound if descending == forward else key > bound)
+        query = query.order_by(None).order_by(*(
+            column.desc() if descending == forward else column.asc() for column in columns))
+        if page_size:
+            query = query.limit(page_size + 1)
+        if not execute:
+            return count, query
+
+        rows = query.all()
+        more = bool(page_size) and len(rows) > page_size
+        if more:
+            del rows[page_size:]
+        if not forward:
+            rows.reverse()
+
+        def cursor(row):
+            return encode_cursor([getattr(row, column.key) for column in columns])
+
+        has_previous = rows and (after is not None if forward else more)
+        has_next = rows and (more if forward else True)
+        g._keyset_pager = {
+            'first': self._page_url() if after is not None or before is not None else None,
+            'previous': self._page_url(before=cursor(rows[0])) if has_previous else None,
+            'next': self._page_url(after=cursor(rows[-1])) if has_next else None,
+        }
+        return count, rows
+
+    def keyset_pager(self):
+        """Return the cursors for the page being rendered, or `None` if it's paged by offset."""
+        return g.get('_keyset_pager')
+
+
+class UserAdmin(KeysetModelView):
+    """Users, newest first."""
+
+    column_list = ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_admin', 'roles',
+                   'created_at')
+    column_sortable_list = ('id', 'username', 'email', 'created_at')
+    column_searchable_list = ('username', 'email')
+    column_exclude_list = ('password', 'password_reset_token')
+    form_excluded_columns = ('password', 'password_reset_token')
+    keyset_columns = {'id': ('id',), 'created_at': ('created_at', 'id')}
+
+    def get_query(self):
+        """Load every listed user's roles in one query."""
+        return super(UserAdmin, self).get_query().options(selectinload(User.roles))
+
+
+class RoleAdmin(KeysetModelView):
+    """Roles, newest first."""
+
+    column_list = ('id', 'name', 'user')
+    column_sortable_list = ('id', 'name')
+    column_searchable_list = ('name',)
+    keyset_columns = {'id': ('id',)}
+
+
+admin.add_view(RoleAdmin(Role, db.session))
+admin.add_view(UserAdmin(User, db.session))
@@ -1,46 +1,173 @@
 # -*- coding: utf-8 -*-
 """The app module, containing the app factory function."""
-from flask import Flask, render_template
+import threading
+
+from flask import Flask, abort, render_template, request
+from sqlalchemy.orm import configure_mappers
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from dude import commands, public, user
-from dude.extensions import admin, alembic, bcrypt, cache, csrf_protect, db, debug_toolbar, login_manager
-from dude.middleware import ClacksOverhead
+from dude.extensions import assets, bcrypt, cache, csrf_protect, db, hasher, login_manager, metrics, query_log, timing
+from dude.middleware import HeaderMiddleware
+from dude.sessions import make_session_interface
+from dude.startup import StartupProfile
+from dude.templating import compile_templates, make_bytecode_cache
 
 
 def create_app(config_object='dude.settings'):
     """Return an application, as explained here: http://flask.pocoo.org/docs/patterns/appfactories/.
 
+    Set `DUDE_STARTUP_PROFILE` to have the time each step takes written to stderr.
+
     :param config_object: The configuration object to use.
     """
-    app = Flask(__name__.split('.')[0], instance_relative_config=True)
-    app.config.from_object(config_object)
-    app.config.from_envvar('DUDE_SETTINGS', silent=True)
-    register_middleware(app)
-    register_extensions(app)
-    register_blueprints(app)
-    register_errorhandlers(app)
-    register_shellcontext(app)
-    register_commands(app)
-    register_context_processors(app)
+    with StartupProfile.from_environ() as profile:
+        app = Flask(__name__.split('.')[0], instance_relative_config=True)
+        with profile.step('settings'):
+            app.config.from_object(config_object)
+            app.config.from_envvar('DUDE_SETTINGS', silent=True)
+        with profile.step('middleware'):
+            register_middleware(app)
+        register_extensions(app, profile)
+        with profile.step('templating'):
+            register_templating(app)
+        with profile.step('blueprints'):
+            register_blueprints(app)
+            register_errorhandlers(app)
+            register_shellcontext(app)
+            register_commands(app)
+            register_context_processors(app)
     return app
 
 
 def register_middleware(app):
-    """Register Werkzeug middleware."""
-    app.wsgi_app = ClacksOverhead(app.wsgi_app)
+    """Register Werkzeug middleware.
+
+    With `PROXY_FIX_X_FOR` set to the number of proxies in front of the app,
+    `request.remote_addr` is the client address they forwarded rather than
+    the last proxy's.
+    """
+    proxies = app.config.get('PROXY_FIX_X_FOR', 0)
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies)
+    app.wsgi_app = HeaderMiddleware(
+        app.wsgi_app,
+        app.config.get('RESPONSE_HEADERS', (('X-Clacks-Overhead', 'GNU'),)),
+        app.config.get('RESPONSE_HEADERS_BY_PATH'))
+
+
+def register_extensions(app, profile=None):
+    """Register Flask extensions.
+
+    The admin and the debug toolbar are imported only when they're used; see
+    `register_admin`. Flask-Alembic is only needed by the ``db`` commands.
+    """
+    profile = profile or StartupProfile()
+    extensions = (
+        ('admin', register_admin),
+        ('assets', assets.init_app),
+        ('hasher', hasher.init_app),  # may set BCRYPT_LOG_ROUNDS
+        ('bcrypt', bcrypt.init_app),
+        ('cache', cache.init_app),
+        ('timing', timing.init_app),  # wraps the cache backend
+        ('metrics', metrics.init_app),  # and so does this
+        ('query_log', query_log.init_app),
+        ('db', db.init_app),
+        ('csrf_protect', csrf_protect.init_app),
+        ('login_manager', login_manager.init_app),
+        ('sessions', register_sessions),
+        ('debug_toolbar', register_debug_toolbar),
+    )
+    for name, init_app in extensions:
+        with profile.step(name):
+            init_app(app)
+
+
+def register_admin(app):
+    """Register the admin, or with `ADMIN_LAZY` a stand-in that loads it on the first request to ``/admin/``.
+
+    Flask refuses new routes after the first request in debug mode, so the
+    admin is always loaded up front there.
+    """
+    if not app.config.get('ADMIN_LAZY', False) or app.debug:
+        load_admin(app)
+        return
+
+    lock = threading.Lock()
+
+    def admin_loader(path=None):
+        """Load the admin, then handle the request with the view it now routes to."""
+        with lock:
+            if 'admin' not in app.extensions:
+                load_admin(app)
+        rule, view_args = app.create_url_adapter(request).match(return_rule=True)
+        if rule.endpoint == 'admin_loader':
+            abort(404)
+        request.url_rule, request.view_args = rule, view_args
+        return app.view_functions[rule.endpoint](**view_args)
+
+    app.add_url_rule('/admin/', 'admin_loader', admin_loader, methods=('GET', 'POST'))
+    app.add_url_rule('/admin/<path:path>', 'admin_loader', admin_loader, methods=('GET', 'POST'))
 
 
-def register_extensions(app):
-    """Register Flask extensions."""
-    import dude.admin  # noqa
+def load_admin(app):
+    """Register the admin views, replacing the stand-in `register_admin` may have routed ``/admin/`` to."""
+    from dude.admin import admin
+
     admin.init_app(app)
-    alembic.init_app(app)
-    bcrypt.init_app(app)
-    cache.init_app(app)
-    db.init_app(app)
-    csrf_protect.init_app(app)
-    login_manager.init_app(app)
-    debug_toolbar.init_app(app)
+    if 'admin_loader' in app.view_functions:
+        remove_rules(app, 'admin_loader')
+        del app.view_functions['admin_loader']
+
+
+def remove_rules(app, endpoint):
+    """Remove the URL rules for `endpoint`, which Werkzeug can only do by building a new map."""
+    old = app.url_map
+    url_map = app.url_map_class()
+    url_map.host_matching = old.host_matching
+    url_map.strict_slashes = old.strict_slashes
+    url_map.default_subdomain = old.default_subdomain
+    url_map.converters = dict(old.converters)
+    for rule in old.iter_rules():
+        if rule.endpoint != endpoint:
+            url_map.add(rule.empty())
+    app.url_map = url_map
+
+
+def warm_up(app):
+    """Do the work a new app otherwise leaves to its first requests, and return it.
+
+    Loads the admin, compiles every template, builds the URL map and
+    configures the SQLAlchemy mappers. No connections are opened.
+    """
+    if 'admin' not in app.extensions:
+        load_admin(app)
+    for name, error in compile_templates(app.jinja_env):
+        if error is not None:
+            app.logger.warning('Template %s does not compile: %s', name, error)
+    app.url_map.update()
+    configure_mappers()
+    return app
+
+
+def register_debug_toolbar(app):
+    """Register the debug toolbar if it's enabled, which it never is in production."""
+    if app.config.get('DEBUG_TB_ENABLED', False):
+        from flask_debugtoolbar import DebugToolbarExtension
+
+        DebugToolbarExtension(app)
+
+
+def register_sessions(app):
+    """Keep sessions server-side, unless `SESSION_TYPE` is ``cookie``."""
+    interface = make_session_interface(app.config)
+    if interface is not None:
+        app.session_interface = interface
+
+
+def register_templating(app):
+    """Register the Jinja bytecode cache."""
+    app.jinja_env.bytecode_cache = make_bytecode_cache(app.config)
 
 
 def register_blueprints(app):
@@ -77,11 +204,27 @@ def register_commands(app):
     app.cli.add_command(commands.lint)
     app.cli.add_command(commands.clean)
     app.cli.add_command(commands.urls)
+    app.cli.add_command(commands.platform)
+    app.cli.add_command(commands.assets)
+    app.cli.add_command(commands.hashing)
+    app.cli.add_command(commands.templates)
+    app.cli.add_command(commands.users)
+    app.cli.add_command(commands.db)
 
 
 def register_context_processors(app):
     """Register the Jina2 Context Processors."""
+    def asset_helpers():
+        """Asset URL helpers."""
+        return {
+            'asset_version': assets.version,
+            'static_path': static_path,
+            'stylesheet_tag': assets.stylesheet_tag,
+            'javascript_tag': assets.javascript_tag}
+
+    app.context_processor(asset_helpers)
 
 
 def static_path(path):
     """Return a url to a static file in `/static`."""
+    return assets.url(path)
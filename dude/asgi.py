@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""The ASGI entry point, for serving many slow requests per worker process.
+
+Usage: ::
+
+    uvicorn dude.asgi:app --workers 4
+
+Each worker's event loop accepts connections and hands each request, through
+uvicorn's `WSGIMiddleware`, to one of `ASGI_THREADS` threads running the
+same Flask app as `dude.wsgi`. The default matches `DATABASE_POOL_SIZE` plus `DATABASE_MAX_OVERFLOW`; raise
+them together, or requests will queue for a database connection instead
+of a thread.
+"""
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+from dude.app import create_app, warm_up
+
+_app = warm_up(create_app())
+app = WSGIMiddleware(_app, workers=_app.config.get('ASGI_THREADS', 15))
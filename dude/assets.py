@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Fingerprinted, precompressed static assets."""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+from markupsafe import Markup
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+#: Directory under the static folder that builds are written to
+DIST_DIR = 'dist'
+
+#: Where `flask assets build` writes the manifest unless `ASSETS_MANIFEST_PATH` says otherwise
+DEFAULT_MANIFEST_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'static', DIST_DIR, 'manifest.json')
+
+#: Files worth compressing ahead of time
+COMPRESSIBLE = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.xml')
+
+#: Fingerprinted files never change, so they may be cached for as long as browsers allow
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _fingerprint(path, digest):
+    stem, ext = os.path.splitext(path)
+    return '{0}.{1}{2}'.format(stem, digest, ext)
+
+
+def _write_compressed(path, data):
+    """Write `.gz` and, if `brotli` is installed, `.br` variants of `data` when they are smaller."""
+    variants = [('.gz', gzip.compress(data, 9))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as fp:
+                fp.write(compressed)
+
+
+def build_assets(static_folder, manifest_path):
+    """Copy every file in `static_folder` to a fingerprinted name under `dist/` and write the manifest.
+
+    Text assets are also written gzip (and brotli) compressed next to the
+    copy. The previous build is removed first. Return the manifest.
+    """
+    static_folder = os.path.abspath(static_folder)
+    output = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(output, ignore_errors=True)
+
+    assets = {}
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = sorted(d for d in dirnames if dirpath != static_folder or d != DIST_DIR)
+        for filename in sorted(filenames):
+            source = os.path.join(dirpath, filename)
+            name = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as fp:
+                data = fp.read()
+            target = _fingerprint(name, hashlib.sha256(data).hexdigest()[:12])
+
+            destination = os.path.join(output, target)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with open(destination, 'wb') as fp:
+                fp.write(data)
+            if name.endswith(COMPRESSIBLE):
+                _write_compressed(destination, data)
+            assets[name] = target
+
+    manifest = {'version': hashlib.sha256(json.dumps(assets, sort_keys=True).encode()).hexdigest()[:12],
+                'assets': assets}
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(manifest_path, 'w') as fp:
+        json.dump(manifest, fp, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path):
+    """Read the manifest at `path`; a missing manifest leaves every file unfingerprinted."""
+    try:
+        with open(path or '') as fp:
+            manifest = json.load(fp)
+    except FileNotFoundError:
+        manifest = {}
+    manifest.setdefault('assets', {})
+    return manifest
+
+
+class Assets(object):
+    """Resolve static files to their fingerprinted URLs and serve the precompressed builds.
+
+    The manifest is read from `ASSETS_MANIFEST_PATH` when the app starts; files
+    it doesn't list fall back to the plain `static` endpoint. Built files are
+    served from ``/static/dist/`` with the best encoding the client accepts and
+    a far-future, immutable `Cache-Control`.
+    """
+
+    def __init__(self, app=None):
+        """Initialize the extension."""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Load the manifest and register the `assets` endpoint."""
+        app.extensions['assets'] = load_manifest(app.config.get('ASSETS_MANIFEST_PATH'))
+        app.add_url_rule(
+            '{0}/{1}/<path:filename>'.format(app.static_url_path, DIST_DIR), 'assets', self.send)
+
+    @property
+    def manifest(self):
+        """The manifest loaded for the current app."""
+        return current_app.extensions['assets']
+
+    @property
+    def version(self):
+        """A digest of the current build, or an empty string when nothing has been built."""
+        return self.manifest.get('version', '')
+
+    def url(self, path):
+        """Return the URL of the static file `path`."""
+        target = self.manifest['assets'].get(path)
+        if target is None:
+            return url_for('static', filename=path)
+        return url_for('assets', filename=target)
+
+    def send(self, filename):
+        """Serve a built file, precompressed if the client accepts it."""
+        directory = os.path.join(current_app.static_folder, DIST_DIR)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[encoding] > 0 and os.path.isfile(os.path.join(directory, filename + suffix)):
+                break
+        else:
+            encoding = suffix = None
+
+        response = send_from_directory(directory, filename + (suffix or ''), mimetype=mimetype)
+        response.headers.pop('Content-Disposition', None)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    def stylesheet_tag(self, path):
+        """Return a `<link>` tag for the stylesheet `path`."""
+        return Markup('<link rel="stylesheet" href="{0}">').format(self.url(path))
+
+    def javascript_tag(self, path, **attrs):
+        """Return a `<script>` tag for the script `path`, or nothing if it hasn't been built."""
+        if path not in self.manifest['assets'] and not os.path.isfile(os.path.join(current_app.static_folder, path)):
+            return Markup('')
+        extra = Markup('').join(Markup(' {0}="{1}"').format(key, value) for key, value in sorted(attrs.items()))
+        return Markup('<script src="{0}"{1}></script>').format(self.url(path), extra)
@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 """Click commands."""
 import os
+import sys
+import tempfile
 from glob import glob
-from subprocess import call  # noqa: S404
+from subprocess import Popen, call  # noqa: S404
 
 import click
 from flask import current_app
-from flask.cli import with_appcontext
+from flask.cli import AppGroup, ScriptInfo, with_appcontext
 from werkzeug.exceptions import MethodNotAllowed, NotFound
 
 HERE = os.path.abspath(os.path.dirname(__file__))
@@ -14,11 +16,41 @@ PROJECT_ROOT = os.path.join(HERE, os.pardir)
 TEST_PATH = os.path.join(PROJECT_ROOT, 'tests')
 
 
-@click.command()
-def test():
-    """Run the tests."""
-    import pytest
-    rv = pytest.main([TEST_PATH, '--verbose'])
+#: pytest's exit status when it ran no tests, as a shard may not
+NO_TESTS_COLLECTED = 5
+
+
+@click.command(context_settings={'ignore_unknown_options': True})
+@click.option('-n', '--workers', default='1', show_default=True,
+              help='Processes to run the tests in, each with its own database; "auto" for one per CPU')
+@click.option('--durations', default=10, show_default=True, help='Report the N slowest tests (0 for all)')
+@click.argument('pytest_args', nargs=-1, type=click.UNPROCESSED)
+def test(workers, durations, pytest_args):
+    """Run the tests, optionally split across worker processes.
+
+    Extra arguments are passed on to pytest.
+    """
+    workers = os.cpu_count() or 1 if workers == 'auto' else int(workers)
+    args = [TEST_PATH, '--durations={0}'.format(durations)] + list(pytest_args)
+    if workers <= 1:
+        import pytest
+        exit(pytest.main(args + ['--verbose']))
+
+    outputs = [tempfile.TemporaryFile() for _ in range(workers)]
+    processes = [
+        Popen([sys.executable, '-m', 'pytest', '--shard={0}/{1}'.format(index, workers)] + args,  # noqa: S603
+              stdout=output, stderr=output)
+        for index, output in enumerate(outputs, 1)
+    ]
+    rv = 0
+    for index, (process, output) in enumerate(zip(processes, outputs), 1):
+        status = process.wait()
+        output.seek(0)
+        click.echo('==> worker {0}/{1} exited with {2}'.format(index, workers, status))
+        click.echo(output.read().decode('utf-8', 'replace'))
+        output.close()
+        if status not in (0, NO_TESTS_COLLECTED):
+            rv = rv or status
     exit(rv)
 
 
@@ -61,6 +93,167 @@ def clean():
                 os.remove(full_pathname)
 
 
+@click.group()
+def platform():
+    """Platform.sh environment helpers."""
+
+
+@platform.command()
+@click.option('-o', '--output', type=click.File('w'), default='-',
+              help='File to write to (default: stdout)')
+@click.option('--canonical', default=False, is_flag=True,
+              help='Re-encode json variables with sorted keys')
+def export(output, canonical):
+    """Write the Platform.sh environment as a `.sh` file."""
+    from dude.platform import environment
+    environment.export(output, canonical=canonical)
+
+
+@click.group()
+def assets():
+    """Build static assets."""
+
+
+@assets.command('build')
+@with_appcontext
+def build():
+    """Fingerprint and precompress the static files and write the asset manifest."""
+    from dude.assets import build_assets
+
+    manifest = build_assets(current_app.static_folder, current_app.config['ASSETS_MANIFEST_PATH'])
+    click.echo('Built {0} assets, version {1}'.format(len(manifest['assets']), manifest['version']))
+
+
+@click.group()
+def templates():
+    """Template commands."""
+
+
+@templates.command('compile')
+@click.option('-v', '--verbose', default=False, is_flag=True, help='List each compiled template')
+@with_appcontext
+def compile_(verbose):
+    """Compile every template into the Jinja bytecode cache."""
+    from dude.app import load_admin
+    from dude.templating import compile_templates
+
+    env = current_app.jinja_env
+    if env.bytecode_cache is None:
+        raise click.ClickException('TEMPLATE_BYTECODE_CACHE is not configured')
+    # The admin's templates are only listed once its blueprint is registered
+    if 'admin' not in current_app.extensions:
+        load_admin(current_app._get_current_object())
+
+    compiled = failed = 0
+    for name, error in compile_templates(env):
+        if error is None:
+            compiled += 1
+            if verbose:
+                click.echo(name)
+        else:
+            failed += 1
+            click.echo('{0}: {1}'.format(name, error), err=True)
+    click.echo('Compiled {0} templates'.format(compiled))
+    if failed:
+        raise click.ClickException('{0} templates failed to compile'.format(failed))
+
+
+@click.group()
+def hashing():
+    """Password hashing commands."""
+
+
+@hashing.command('calibrate')
+@with_appcontext
+def calibrate():
+    """Time bcrypt on this machine and save the cost that takes about `BCRYPT_TARGET_MS`."""
+    from dude.hashing import calibrate as calibrate_rounds
+
+    config = current_app.config
+    target = config.get('BCRYPT_TARGET_MS')
+    if not target:
+        click.echo('BCRYPT_TARGET_MS is not set, keeping BCRYPT_LOG_ROUNDS={0}'.format(config['BCRYPT_LOG_ROUNDS']))
+        return
+    click.echo('Calibrated BCRYPT_LOG_ROUNDS={0} for {1}ms'.format(calibrate_rounds(config), target))
+
+
+@click.group()
+def users():
+    """User management commands."""
+
+
+@users.command('rehash-report')
+@with_appcontext
+def rehash_report():
+    """Show the distribution of bcrypt costs among stored password hashes."""
+    from sqlalchemy import func
+
+    from dude.database import db
+    from dude.hashing import hash_log_rounds
+    from dude.user.models import User
+
+    # The cost is the two digits after the `$2b$` prefix
+    prefix = func.substr(User.password, 1, 7).label('prefix')
+    rows = db.session.query(prefix, func.count()).group_by(prefix).all()
+
+    costs = {}
+    for value, count in rows:
+        cost = hash_log_rounds(value) if value is not None else None
+        costs[cost] = costs.get(cost, 0) + count
+
+    total = sum(costs.values())
+    current = current_app.config['BCRYPT_LOG_ROUNDS']
+    click.echo('{:>6}  {:>10}  {:>7}'.format('Cost', 'Users', 'Percent'))
+    click.echo('-' * 27)
+    for cost in sorted(costs, key=lambda c: (c is None, c)):
+        label = 'none' if cost is None else str(cost)
+        marker = '  <- BCRYPT_LOG_ROUNDS' if cost == current else ''
+        click.echo('{:>6}  {:>10}  {:>6.1f}%{}'.format(label, costs[cost], 100.0 * costs[cost] / total, marker))
+
+
+def _report_progress(total, elapsed):
+    click.echo('{0} users in {1:.1f}s ({2:.0f}/s)'.format(total, elapsed, total / elapsed if elapsed else 0), err=True)
+
+
+@users.command('import')
+@click.argument('source', type=click.File('r'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Input format (default: from the file extension, else csv)')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows inserted per transaction')
+@click.option('--hash-workers', default=os.cpu_count() or 1, show_default=True,
+              help='Processes used to hash plaintext passwords')
+@click.option('--copy/--no-copy', 'use_copy', default=None,
+              help='Use COPY to insert rows (default: on PostgreSQL)')
+@with_appcontext
+def import_(source, fmt, batch_size, hash_workers, use_copy):
+    """Import users from a CSV or JSON lines file.
+
+    Each record needs `username` and `email`, and either a plaintext
+    `password` or a bcrypt `password_hash` (as written by `flask users export`).
+    """
+    from dude.user.bulk import guess_format, import_users, read_rows
+
+    fmt = fmt or guess_format(source.name)
+    total = import_users(
+        read_rows(source, fmt), current_app.config['BCRYPT_LOG_ROUNDS'],
+        batch_size=batch_size, hash_workers=hash_workers, use_copy=use_copy, progress=_report_progress)
+    click.echo('Imported {0} users'.format(total))
+
+
+@users.command('export')
+@click.argument('destination', type=click.File('w'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Output format (default: from the file extension, else csv)')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round-trip')
+@with_appcontext
+def export_(destination, fmt, batch_size):
+    """Export users, including password hashes, to a CSV or JSON lines file."""
+    from dude.user.bulk import export_users, guess_format
+
+    fmt = fmt or guess_format(destination.name)
+    export_users(destination, fmt, batch_size=batch_size, progress=_report_progress)
+
+
 @click.command()
 @click.option('--url', default=None,
               help='Url to test (ex. /static/image.png)')
@@ -124,3 +317,29 @@ def urls(url, order):
 
     for row in rows:
         click.echo(str_template.format(*row[:column_length]))
+
+
+class MigrationGroup(AppGroup):
+    """The Flask-Alembic ``db`` commands, imported and set up only when one of them is used."""
+
+    def _commands(self, ctx):
+        from flask_alembic import Alembic
+        from flask_alembic.cli.click import cli
+
+        app = ctx.ensure_object(ScriptInfo).load_app()
+        if 'alembic' not in app.extensions:
+            Alembic(app, command_name=False)
+        return cli
+
+    def list_commands(self, ctx):
+        """List the migration commands."""
+        return self._commands(ctx).list_commands(ctx)
+
+    def get_command(self, ctx, cmd_name):
+        """Return the migration command `cmd_name`."""
+        return self._commands(ctx).get_command(ctx, cmd_name)
+
+
+@click.group(cls=MigrationGroup)
+def db():
+    """Perform database migrations."""
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Database engine configuration, including connection pool options and endpoint failover."""
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+from dude.metrics import pool_checkout_wait
+
+logger = logging.getLogger(__name__)
+
+# Platform.sh uses scheme names SQLAlchemy does not know about
+_schemes = {
+    'pgsql': 'postgresql',
+    'postgres': 'postgresql',
+}
+
+
+def normalize_url(url):
+    """Return `url` with its scheme translated into a SQLAlchemy dialect name."""
+    scheme, sep, rest = url.partition('://')
+    return _schemes.get(scheme, scheme) + sep + rest
+
+
+class FailoverConnector(object):
+    """A DBAPI connection `creator` that fails over between several database endpoints.
+
+    Endpoints are tried in order. An endpoint that fails to connect is skipped
+    for `cooldown` seconds; if every endpoint is cooling down, all of them are
+    tried again before giving up. Combined with `pool_pre_ping`, a dead pooled
+    connection is replaced with one to the next healthy endpoint.
+    """
+
+    def __init__(self, urls, connect_args=None, cooldown=30, clock=time.monotonic):
+        """Initialize the connector with a list of database urls."""
+        self.urls = [normalize_url(url) for url in urls]
+        self.connect_args = connect_args or {}
+        self.cooldown = cooldown
+        self.clock = clock
+        self._engines = None
+        # Pool checkouts call the connector from many threads at once
+        self._lock = threading.Lock()
+        self._down = {}
+
+    def _get_engines(self):
+        # Built lazily so merely importing the settings doesn't load the DBAPI
+        with self._lock:
+            if self._engines is None:
+                self._engines = [create_engine(url, poolclass=NullPool) for url in self.urls]
+            return self._engines
+
+    def _connect(self, engine):
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        cparams.update(self.connect_args)
+        return engine.dialect.connect(*cargs, **cparams)
+
+    def candidates(self):
+        """Return endpoint indexes in the order they should be tried."""
+        now = self.clock()
+        with self._lock:
+            down = dict(self._down)
+        indexes = range(len(self.urls))
+        healthy = [index for index in indexes if down.get(index, 0) <= now]
+        cooling = sorted((index for index in indexes if index not in healthy), key=down.get)
+        return healthy + cooling
+
+    def __call__(self):
+        """Return a new DBAPI connection to the first endpoint that accepts one."""
+        engines = self._get_engines()
+        error = None
+        for index in self.candidates():
+            engine = engines[index]
+            try:
+                connection = self._connect(engine)
+            except engine.dialect.dbapi.Error as e:
+                logger.warning('Database endpoint %r is unavailable: %s', engine.url, e)
+                with self._lock:
+                    self._down[index] = self.clock() + self.cooldown
+                error = e
+                continue
+            with self._lock:
+                self._down.pop(index, None)
+            return connection
+        raise error
+
+
+class MeteredQueuePool(QueuePool):
+    """A `QueuePool` that records how long checkouts wait for a connection."""
+
+    def _do_get(self):
+        if not pool_checkout_wait.registry.enabled:
+            return super(MeteredQueuePool, self)._do_get()
+        start = time.perf_counter()
+        try:
+            return super(MeteredQueuePool, self)._do_get()
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+def engine_options(urls, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800,
+                   pool_pre_ping=True, statement_timeout=None, connect_timeout=None):
+    """Return a `SQLALCHEMY_ENGINE_OPTIONS` dict for the database at `urls`.
+
+    When more than one url is given, connections are made through a
+    `FailoverConnector` over all of them. `statement_timeout` is in
+    milliseconds and `connect_timeout` in seconds; both only apply to
+    PostgreSQL. SQLite doesn't use a sized pool, so no options are returned.
+    """
+    url = make_url(normalize_url(urls[0]))
+    if url.get_backend_name() == 'sqlite':
+        return {}
+
+    options = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+        'pool_pre_ping': pool_pre_ping,
+    }
+
+    connect_args = {}
+    if url.get_backend_name() == 'postgresql':
+        if statement_timeout:
+            connect_args['options'] = '-c statement_timeout={:d}'.format(statement_timeout)
+        if connect_timeout:
+            connect_args['connect_timeout'] = connect_timeout
+
+    if len(urls) > 1:
+        options['creator'] = FailoverConnector(urls, connect_args)
+    elif connect_args:
+        options['connect_args'] = connect_args
+
+    return options
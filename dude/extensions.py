@@ -1,19 +1,24 @@
 # -*- coding: utf-8 -*-
 """Extensions module. Each extension is initialized in the app factory located in app.py."""
-from flask_admin import Admin
-from flask_alembic import Alembic
 from flask_bcrypt import Bcrypt
 from flask_caching import Cache
-from flask_debugtoolbar import DebugToolbarExtension
-from flask_login import LoginManager
-from flask_sqlalchemy import SQLAlchemy
 from flask_wtf.csrf import CSRFProtect
 
-admin = Admin(template_mode='bootstrap3')
-alembic = Alembic()
+from dude.assets import Assets
+from dude.hashing import Hasher
+from dude.metrics import Metrics
+from dude.queries import QueryLog
+from dude.routing import RoutingSQLAlchemy
+from dude.sessions import LoginManager
+from dude.timing import Timing
+
+assets = Assets()
 bcrypt = Bcrypt()
 cache = Cache()
 csrf_protect = CSRFProtect()
-db = SQLAlchemy()
-debug_toolbar = DebugToolbarExtension()
+db = RoutingSQLAlchemy()
+hasher = Hasher()
 login_manager = LoginManager()
+metrics = Metrics()
+query_log = QueryLog()
+timing = Timing()
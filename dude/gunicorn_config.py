@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Gunicorn settings: build the app once in the master and fork workers that share its memory.
+
+Usage: ::
+
+    gunicorn -c python:dude.gunicorn_config dude.wsgi:app
+    gunicorn -c python:dude.gunicorn_config -k uvicorn.workers.UvicornWorker dude.asgi:app
+
+The master imports and warms `dude.wsgi` with the garbage collector
+paused, so the heap isn't fragmented, then freezes everything it allocated
+into the permanent generation. Workers' collections then never write to
+those objects, and their pages stay shared copy-on-write. Freezing needs
+Python 3.7; on older Pythons the master only collects before forking, so
+the workers' collections still touch the shared pages and most of the
+memory savings are lost. The master logs a warning then. Pooled database
+connections are closed around each fork so no two processes ever share
+one.
+"""
+import gc
+import glob
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+preload_app = True
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# gc.freeze is new in Python 3.7
+_freeze = getattr(gc, 'freeze', gc.collect)
+
+gc.disable()
+
+
+def _app(server):
+    # the Flask app itself; HeaderMiddleware wraps only its `wsgi_app`, WSGIMiddleware the whole app
+    from flask import Flask
+
+    app = server.app.wsgi()
+    while not isinstance(app, Flask):
+        app = app.app
+    return app
+
+
+def on_starting(server):
+    """Empty `METRICS_DIR` of the files of a previous run's workers."""
+    directory = _app(server).config.get('METRICS_DIR')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+
+
+def when_ready(server):
+    """Freeze the warmed-up app into the permanent generation and resume collecting."""
+    if not hasattr(gc, 'freeze'):
+        server.log.warning('gc.freeze needs Python 3.7; the workers will not keep sharing the app memory')
+    gc.collect()
+    _freeze()
+    gc.enable()
+
+
+def pre_fork(server, worker):
+    """Close the master's pooled connections and freeze anything it allocated since."""
+    from dude.extensions import db
+
+    db.dispose_engines(_app(server))
+    _freeze()
+
+
+def post_fork(server, worker):
+    """Start the worker with no pooled connections and no metrics of the master's."""
+    from dude.extensions import db
+    from dude.metrics import registry
+
+    db.dispose_engines(_app(server))
+    registry.reset()
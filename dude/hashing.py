@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""A bounded worker pool for password hashing."""
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import bcrypt
+from flask import current_app
+from werkzeug.exceptions import ServiceUnavailable
+
+from dude.timing import timed
+
+#: Where `flask hashing calibrate` saves its result unless `BCRYPT_CALIBRATION_PATH` says otherwise
+DEFAULT_CALIBRATION_PATH = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)), os.pardir, '.bcrypt_calibration.json')
+
+
+def calibrate_log_rounds(target, minimum=4, maximum=16, probe=8):
+    """Return the bcrypt cost whose hash time on this machine is closest to `target` seconds.
+
+    A hash is timed at cost `probe` and extrapolated, since each extra round
+    doubles the work. The result is clamped to `minimum` and `maximum`.
+    """
+    salt = bcrypt.gensalt(probe)
+    elapsed = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        bcrypt.hashpw(b'calibration', salt)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    rounds = probe + int(round(math.log(target / elapsed, 2)))
+    return max(minimum, min(maximum, rounds))
+
+
+def save_calibration(path, target_ms, log_rounds):
+    """Save the cost calibrated for `target_ms` to `path`."""
+    with open(path, 'w') as f:
+        json.dump({'target_ms': target_ms, 'log_rounds': log_rounds}, f)
+
+
+def load_calibration(path, target_ms):
+    """Return the cost saved in `path`, or `None` if there is none or it was calibrated for another target."""
+    try:
+        with open(path) as f:
+            calibration = json.load(f)
+    except (OSError, TypeError, ValueError):
+        return None
+    if not isinstance(calibration, dict) or calibration.get('target_ms') != target_ms:
+        return None
+    return calibration.get('log_rounds')
+
+
+def calibrate(config):
+    """Calibrate the cost for `BCRYPT_TARGET_MS` on this machine, save it if possible and return it."""
+    target = config['BCRYPT_TARGET_MS']
+    rounds = calibrate_log_rounds(
+        target / 1000.0,
+        minimum=config.get('BCRYPT_MIN_LOG_ROUNDS', 10),
+        maximum=config.get('BCRYPT_MAX_LOG_ROUNDS', 16),
+    )
+    try:
+        save_calibration(config.get('BCRYPT_CALIBRATION_PATH') or DEFAULT_CALIBRATION_PATH, target, rounds)
+    except OSError:
+        pass  # a read-only checkout; the next start calibrates again
+    return rounds
+
+
+def hash_log_rounds(pw_hash):
+    """Return the cost a bcrypt hash was created with, or None if it isn't a bcrypt hash."""
+    if isinstance(pw_hash, str):
+        pw_hash = pw_hash.encode('ascii')
+    parts = bytes(pw_hash or b'').split(b'$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class HashingQueueFull(ServiceUnavailable):
+    """Raised when too many password hashes are already running or queued."""
+
+    description = 'The server is too busy to check passwords right now. Please try again shortly.'
+
+    def __init__(self, retry_after=1):
+        """Create the exception with a `Retry-After` hint in seconds."""
+        super(HashingQueueFull, self).__init__()
+        self.retry_after = retry_after
+
+    def get_headers(self, *args, **kwargs):
+        """Add a `Retry-After` header to the response."""
+        headers = super(HashingQueueFull, self).get_headers(*args, **kwargs)
+        return headers + [('Retry-After', str(self.retry_after))]
+
+
+class _HasherState(object):
+    """The per-application executor and admission counter."""
+
+    executors = {
+        'thread': ThreadPoolExecutor,
+        'process': ProcessPoolExecutor,
+        'inline': None,
+    }
+
+    def __init__(self, kind, workers, queue_depth, timeout, retry_after):
+        if kind not in self.executors:
+            raise ValueError('HASHING_EXECUTOR must be one of {}'.format(', '.join(sorted(self.executors))))
+        self.kind = kind
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.capacity = workers + queue_depth
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self.rejected = 0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get_executor(self):
+        # Created lazily, and again after a fork, so workers never share a pool with the master
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = self.executors[self.kind](max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingQueueFull(self.retry_after)
+
+        if self.kind == 'inline':
+            try:
+                return func(*args)
+            finally:
+                self.slots.release()
+
+        future = None
+        try:
+            future = self.get_executor().submit(func, *args)
+        finally:
+            if future is None:
+                self.slots.release()
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result(self.timeout)
+
+
+class Hasher(object):
+    """Run password hashing functions on a bounded pool of workers.
+
+    `HASHING_EXECUTOR` is ``thread`` (bcrypt releases the GIL), ``process`` or
+    ``inline``. At most `HASHING_WORKERS` hashes run at once and at most
+    `HASHING_QUEUE_DEPTH` more wait for a worker; anything beyond that is
+    rejected immediately with `HashingQueueFull`, a 503 response.
+
+    If `BCRYPT_TARGET_MS` is set, `BCRYPT_LOG_ROUNDS` is read from what
+    ``flask hashing calibrate`` saved to `BCRYPT_CALIBRATION_PATH`, but never
+    below `BCRYPT_MIN_LOG_ROUNDS`. With nothing saved yet it's calibrated
+    here and saved, once per server since gunicorn preloads the app.
+    Initialize this before Flask-Bcrypt.
+    """
+
+    def __init__(self, app=None):
+        """Initialize the extension."""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the worker pool and bcrypt cost for `app`."""
+        target = app.config.get('BCRYPT_TARGET_MS')
+        if target:
+            rounds = load_calibration(app.config.get('BCRYPT_CALIBRATION_PATH') or DEFAULT_CALIBRATION_PATH, target)
+            if rounds is None:
+                rounds = calibrate(app.config)
+                app.logger.info('Calibrated BCRYPT_LOG_ROUNDS=%d for %dms', rounds, target)
+            app.config['BCRYPT_LOG_ROUNDS'] = max(app.config.get('BCRYPT_MIN_LOG_ROUNDS', 10),
+                                                  min(app.config.get('BCRYPT_MAX_LOG_ROUNDS', 16), rounds))
+
+        app.config.setdefault('HASHING_EXECUTOR', 'thread')
+        app.config.setdefault('HASHING_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('HASHING_QUEUE_DEPTH', app.config['HASHING_WORKERS'] * 4)
+        app.config.setdefault('HASHING_TIMEOUT', None)
+        app.config.setdefault('HASHING_RETRY_AFTER', 1)
+        app.extensions['hasher'] = _HasherState(
+            app.config['HASHING_EXECUTOR'],
+            app.config['HASHING_WORKERS'],
+            app.config['HASHING_QUEUE_DEPTH'],
+            app.config['HASHING_TIMEOUT'],
+            app.config['HASHING_RETRY_AFTER'],
+        )
+
+    def run(self, func, *args):
+        """Call `func(*args)` on the worker pool and return its result."""
+        with timed('bcrypt'):
+            return current_app.extensions['hasher'].run(func, *args)
+
+    @property
+    def rejected(self):
+        """The number of hashes rejected because the queue was full."""
+        return current_app.extensions['hasher'].rejected
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Prometheus metrics, collected without locks and merged across worker processes."""
+import atexit
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+#: Latency buckets in seconds
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, _escape(value)) for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric(object):
+    """A named metric with a fixed set of label names."""
+
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        """Create the metric and add it to `registry`."""
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _key(self, labels):
+        return self.name, tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Add `amount` to the counter for `labels`."""
+        if not self.registry.enabled:
+            return
+        values = self.registry.shard()
+        key = self._key(labels)
+        values[key] = values.get(key, 0) + amount
+
+    def merge(self, total, value):
+        """Return `total` with `value` added."""
+        return value if total is None else total + value
+
+    def samples(self, labelvalues, value):
+        """Yield the exposition samples for one set of label values."""
+        yield self.name, zip(self.labelnames, labelvalues), value
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Create the histogram with the given upper bucket bounds."""
+        self.buckets = tuple(sorted(buckets))
+        super(Histogram, self).__init__(registry, name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        """Count one observation of `value` for `labels`."""
+        if not self.registry.enabled:
+            return
+        values = self.registry.shard()
+        key = self._key(labels)
+        # one count per bucket, then the +Inf bucket, then the sum
+        slot = values.get(key)
+        if slot is None:
+            slot = values[key] = [0] * (len(self.buckets) + 2)
+        slot[bisect_left(self.buckets, value)] += 1
+        slot[-1] += value
+
+    def merge(self, total, value):
+        """Return `total` with `value` added."""
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, labelvalues, value):
+        """Yield the exposition samples for one set of label values."""
+        labels = tuple(zip(self.labelnames, labelvalues))
+        count = 0
+        for bound, hits in zip(self.buckets + (float('inf'),), value):
+            count += hits
+            yield self.name + '_bucket', labels + (('le', _format_value(bound)),), count
+        yield self.name + '_sum', labels, value[-1]
+        yield self.name + '_count', labels, count
+
+
+class Registry(object):
+    """Metrics whose values are kept per thread, so recording never takes a lock.
+
+    Each thread updates only its own `dict`; collecting sums every thread's
+    values. With a `directory`, each process also writes its totals to its own
+    file there, every few seconds and on exit, and collecting merges every
+    process's file, so any gunicorn worker can answer a scrape for all
+    of them. Nothing is recorded until the registry is `enabled`.
+    """
+
+    def __init__(self):
+        """Create an empty registry."""
+        self.metrics = {}
+        self.enabled = False
+        self.reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def register(self, metric):
+        """Add `metric`."""
+        self.metrics[metric.name] = metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return a new `Counter`."""
+        return Counter(self, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Return a new `Histogram`."""
+        return Histogram(self, name, documentation, labelnames, buckets)
+
+    def shard(self):
+        """Return the current thread's values."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            self._shards.append(values)
+            return values
+
+    def reset(self):
+        """Forget every recorded value, as in a newly forked worker."""
+        self._local = threading.local()
+        self._shards = []
+        self._flushed = 0.0
+
+    def snapshot(self):
+        """Return this process's values, merged across threads."""
+        totals = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.items()):
+                totals[key] = self.metrics[key[0]].merge(totals.get(key), value)
+        return totals
+
+    def flush(self, directory):
+        """Write this process's values to `directory`."""
+        records = [[name, list(labels), value] for (name, labels), value in self.snapshot().items()]
+        fd, path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(records, fp)
+        os.replace(path, os.path.join(directory, '{0}.json'.format(os.getpid())))
+        self._flushed = time.monotonic()
+
+    def maybe_flush(self, directory, interval):
+        """Flush to `directory` if the last flush was more than `interval` seconds ago."""
+        if time.monotonic() - self._flushed >= interval:
+            self.flush(directory)
+
+    def collect(self, directory=None):
+        """Return the values of every process writing to `directory`, or just this one."""
+        if directory is None:
+            return self.snapshot()
+
+        self.flush(directory)
+        totals = {}
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as fp:
+                    records = json.load(fp)
+            except (OSError, ValueError):
+                continue  # a worker that went away mid-write
+            for name, labels, value in records:
+                metric = self.metrics.get(name)
+                if metric is not None:
+                    key = name, tuple(labels)
+                    totals[key] = metric.merge(totals.get(key), value)
+        return totals
+
+    def render(self, totals):
+        """Return `totals` in the Prometheus text format."""
+        lines = []
+        for name in sorted(self.metrics):
+            metric = self.metrics[name]
+            lines.append('# HELP {0} {1}'.format(name, metric.documentation))
+            lines.append('# TYPE {0} {1}'.format(name, metric.kind))
+            for (_, labelvalues), value in sorted((k, v) for k, v in totals.items() if k[0] == name):
+                for sample, labels, sample_value in metric.samples(labelvalues, value):
+                    lines.append('{0}{1} {2}'.format(
+                        sample, _format_labels(tuple(labels)), _format_value(sample_value)))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    'dude_requests_total', 'Requests handled, by endpoint, method and status.', ('endpoint', 'method', 'status'))
+request_duration = registry.histogram(
+    'dude_request_duration_seconds', 'Time spent handling requests, by endpoint.', ('endpoint',))
+pool_checkout_wait = registry.histogram(
+    'dude_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled database connection.',
+    buckets=(.0001, .001, .005, .01, .05, .1, .5, 1, 5, 30))
+cache_requests = registry.counter(
+    'dude_cache_requests_total', 'Cache lookups, by result.', ('result',))
+logins_total = registry.counter(
+    'dude_logins_total', 'Login attempts, by result.', ('result',))
+
+
+class MeteredCache(object):
+    """Wrap a cache backend, counting lookup hits and misses."""
+
+    def __init__(self, backend):
+        """Wrap `backend`."""
+        self.backend = backend
+
+    def __getattr__(self, name):
+        """Pass anything not counted straight through."""
+        return getattr(self.backend, name)
+
+    def get(self, key):
+        """Get `key`, counting a hit or miss."""
+        value = self.backend.get(key)
+        cache_requests.inc(result='miss' if value is None else 'hit')
+        return value
+
+    def get_many(self, *keys):
+        """Get `keys`, counting a hit or miss for each."""
+        values = self.backend.get_many(*keys)
+        hits = sum(value is not None for value in values)
+        if hits:
+            cache_requests.inc(hits, result='hit')
+        if len(keys) - hits:
+            cache_requests.inc(len(keys) - hits, result='miss')
+        return values
+
+
+class Metrics(object):
+    """Collect request, database pool, cache and login metrics and serve them at `/metrics`.
+
+    Enabled with `METRICS_ENABLED`. Scrapes must send `METRICS_TOKEN` as a
+    bearer token; without one the endpoint isn't served. Under gunicorn set
+    `METRICS_DIR` to a directory shared by the workers and emptied when the
+    server starts, so a scrape of any worker reports all of them.
+    """
+
+    def __init__(self, app=None):
+        """Initialize the extension."""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Set up metrics for `app` if they're enabled."""
+        if not app.config.get('METRICS_ENABLED', False):
+            return
+
+        registry.enabled = True
+        directory = app.config.get('METRICS_DIR')
+        interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(registry.flush, directory)
+
+        caches = app.extensions.get('cache', {})
+        for key, backend in caches.items():
+            if not isinstance(backend, MeteredCache):
+                caches[key] = MeteredCache(backend)
+
+        @app.before_request
+        def start_request_timer():
+            g._metrics_start = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop('_metrics_start', None)
+            if start is not None:
+                endpoint = request.endpoint or 'unmatched'
+                request_duration.observe(time.perf_counter() - start, endpoint=endpoint)
+                requests_total.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+                if directory:
+                    registry.maybe_flush(directory, interval)
+            return response
+
+        token = app.config.get('METRICS_TOKEN')
+        if not token:
+            app.logger.warning('METRICS_TOKEN is not set, so /metrics is not served')
+            return
+        expected = 'Bearer {0}'.format(token).encode('utf-8')
+
+        def export_metrics():
+            if not hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'), expected):
+                return Response('Unauthorized\n', 401, {'WWW-Authenticate': 'Bearer realm="metrics"'})
+            return Response(registry.render(registry.collect(directory or None)), content_type=CONTENT_TYPE)
+
+        app.add_url_rule('/metrics', 'metrics', export_metrics)
@@ -1,24 +1,67 @@
 """Dude Middleware."""
+import re
 
 
-class ClacksOverhead(object):
-    """Inject HTTP headers into your response."""
+class HeaderMiddleware(object):
+    """Inject HTTP headers into your response.
 
-    def __init__(self, app, *headers, **kwargs):
+    `headers` are added to every response and `paths` maps path prefixes to
+    extra headers for the responses under them; the longest matching prefix
+    wins. A header the application already set is left alone. Every header
+    list is built once, up front, and no per-request state is kept on the
+    middleware, so one instance serves concurrent requests safely.
+    """
+
+    def __init__(self, app, headers=(), paths=None):
         """Initialize the header injector."""
         self.app = app
-        self.headers = (headers or (
-            ('X-Clacks-Overhead', 'GNU'),
-        )) + tuple(kwargs.items())
+        self.headers = tuple(headers)
+        self._default = self._entry(self.headers)
+        prefixes = sorted(paths or {}, key=len, reverse=True)
+        self._entries = tuple(self._entry(self.headers + tuple(paths[prefix])) for prefix in prefixes)
+        # One alternation, longest prefix first, so a lookup is a single match
+        self._prefixes = re.compile('|'.join('({0})'.format(re.escape(prefix)) for prefix in prefixes)) \
+            if prefixes else None
 
-        self.__start_response = None
+    @staticmethod
+    def _entry(headers):
+        return headers, frozenset(name.lower() for name, _ in headers)
+
+    def _lookup(self, path):
+        if self._prefixes is not None:
+            match = self._prefixes.match(path)
+            if match is not None:
+                return self._entries[match.lastindex - 1]
+        return self._default
+
+    def headers_for(self, path):
+        """Return the headers added to responses for `path`."""
+        return self._lookup(path)[0]
 
     def __call__(self, environ, start_response):
         """Handle our part of the request."""
-        self.__start_response = start_response
-        return self.app(environ, self.start_response)
+        extra, names = self._lookup(environ.get('PATH_INFO', ''))
+        if not extra:
+            return self.app(environ, start_response)
+
+        def inject_headers(status, headers, exc_info=None):
+            for name, _ in headers:
+                if name.lower() in names:
+                    present = {name.lower() for name, _ in headers}
+                    headers.extend(header for header in extra if header[0].lower() not in present)
+                    break
+            else:
+                headers.extend(extra)
+            return start_response(status, headers, exc_info)
 
-    def start_response(self, status, headers, exc_info=None):
-        """Handle our part of the response."""
-        headers.extend(self.headers)
-        return self.__start_response(status, headers, exc_info)
+        return self.app(environ, inject_headers)
+
+
+class ClacksOverhead(HeaderMiddleware):
+    """Inject `X-Clacks-Overhead` and any other given headers into your response."""
+
+    def __init__(self, app, *headers, **kwargs):
+        """Initialize the header injector."""
+        super(ClacksOverhead, self).__init__(app, (headers or (
+            ('X-Clacks-Overhead', 'GNU'),
+        )) + tuple(kwargs.items()))
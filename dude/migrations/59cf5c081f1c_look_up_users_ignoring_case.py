@@ -0,0 +1,39 @@
+"""Look up users by username and email ignoring case.
+
+Replaces the plain email index with unique indexes on ``lower(username)`` and
+``lower(email)``. The upgrade fails if two users' usernames or emails differ
+only in case; rename one of them first.
+
+Revision ID: 59cf5c081f1c
+Revises: fcb8e9d8223a
+Create Date: 2026-10-18 14:58:33.129794
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '59cf5c081f1c'
+down_revision = 'fcb8e9d8223a'
+branch_labels = ()
+depends_on = None
+
+
+def _lower(column):
+    # text_pattern_ops lets PostgreSQL use the index for prefix matches too
+    ops = ' text_pattern_ops' if op.get_bind().dialect.name == 'postgresql' else ''
+    return sa.text('lower({0}){1}'.format(column, ops))
+
+
+def upgrade():
+    """Add the case-insensitive indexes."""
+    op.create_index('ix_users_username_lower', 'users', [_lower('username')], unique=True)
+    op.create_index('ix_users_email_lower', 'users', [_lower('email')], unique=True)
+    op.drop_index('ix_users_email', table_name='users')
+
+
+def downgrade():
+    """Restore the plain email index."""
+    op.create_index('ix_users_email', 'users', ['email'], unique=False)
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.drop_index('ix_users_username_lower', table_name='users')
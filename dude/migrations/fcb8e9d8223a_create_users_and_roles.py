@@ -0,0 +1,55 @@
+"""Create users and roles.
+
+Revision ID: fcb8e9d8223a
+Revises:
+Create Date: 2026-10-18 14:57:52.559929
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'fcb8e9d8223a'
+down_revision = None
+branch_labels = ('default',)
+depends_on = None
+
+
+def upgrade():
+    """Create the tables."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.Unicode(length=128), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('email_verified', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('modified_at', sa.DateTime(), nullable=False),
+        sa.Column('password', sa.Binary(), nullable=True),
+        sa.Column('password_set_at', sa.DateTime(), nullable=True),
+        sa.Column('password_reset_at', sa.DateTime(), nullable=True),
+        sa.Column('password_reset_token', sa.Binary(), nullable=True),
+        sa.Column('first_name', sa.Unicode(length=50), nullable=True),
+        sa.Column('last_name', sa.Unicode(length=50), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=False)
+    op.create_table(
+        'roles',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+
+
+def downgrade():
+    """Drop the tables."""
+    op.drop_table('roles')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
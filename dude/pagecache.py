@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Whole-page response caching for anonymous visitors."""
+import calendar
+import hashlib
+import time
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+from dude.extensions import assets, cache
+
+#: Rendered in place of the CSRF token and swapped for the visitor's own token when served
+CSRF_PLACEHOLDER = '__dude_csrf_token__'
+
+#: Session keys that don't make a visitor's pages differ from anyone else's
+_anonymous_session_keys = frozenset(('csrf_token', '_fresh', '_id', '_permanent'))
+
+
+def _cacheable_request():
+    if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # Token requests are logged in without anything in the session
+    if 'Authorization' in request.headers:
+        return False
+    return _anonymous_session_keys.issuperset(session.keys()) and not current_user.is_authenticated
+
+
+def _cache_key():
+    # Pages link fingerprinted assets, so a new build starts a new set of pages
+    return 'page/{0}/{1}?{2}|{3}'.format(
+        assets.version, request.path, request.query_string.decode('latin-1'), request.accept_languages.best or '')
+
+
+def _csrf_field_name():
+    return current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')
+
+
+def _render(view, args, kwargs):
+    """Call `view` with the CSRF token replaced by `CSRF_PLACEHOLDER` and return the response.
+
+    Flask-WTF memoizes the token on `g`, so seeding `g` keeps the real token,
+    and the session write that comes with it, out of the rendered page.
+    """
+    field_name = _csrf_field_name()
+    seeded = field_name not in g
+    if seeded:
+        setattr(g, field_name, CSRF_PLACEHOLDER)
+    try:
+        return make_response(view(*args, **kwargs))
+    finally:
+        if seeded:
+            g.pop(field_name, None)
+
+
+def _make_entry(response):
+    if response.status_code != 200 or response.direct_passthrough or session.modified:
+        return None
+    if 'Set-Cookie' in response.headers:
+        return None
+    body = response.get_data()
+    return {
+        'body': body,
+        'content_type': response.headers.get('Content-Type'),
+        'digest': hashlib.sha1(body).hexdigest()[:16],
+        'modified': int(time.time()),
+        'csrf': CSRF_PLACEHOLDER.encode('ascii') in body,
+    }
+
+
+def _not_modified(entry):
+    if not entry['csrf']:
+        if request.if_none_match:
+            return request.if_none_match.contains(entry['digest'])
+        since = request.if_modified_since
+        return since is not None and calendar.timegm(since.utctimetuple()) >= entry['modified']
+
+    # The visitor's copy holds a token issued at the time in its ETag, bound to
+    # the session it was served with; only reuse it while that token is valid.
+    if _csrf_field_name() not in session:
+        return False
+    limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    now = time.time()
+    for etag in request.if_none_match.as_set(include_weak=True):
+        digest, _, issued = etag.partition('.')
+        if digest == entry['digest'] and issued.isdigit() and (limit is None or now - int(issued) < limit / 2):
+            return True
+    return False
+
+
+def _serve(entry, status):
+    if entry['csrf']:
+        etag = '{0}.{1}'.format(entry['digest'], int(time.time()))
+    else:
+        etag = entry['digest']
+
+    if _not_modified(entry):
+        response = current_app.response_class(status=304)
+    else:
+        body = entry['body']
+        if entry['csrf']:
+            body = body.replace(CSRF_PLACEHOLDER.encode('ascii'), generate_csrf().encode('ascii'))
+        response = current_app.response_class(body, content_type=entry['content_type'])
+
+    response.set_etag(etag)
+    response.last_modified = entry['modified']
+    response.cache_control.no_cache = True
+    if entry['csrf']:
+        response.cache_control.private = True
+    response.vary.update(('Cookie', 'Accept-Language'))
+    response.headers['X-Page-Cache'] = status
+    return response
+
+
+def cached_page(view):
+    """Cache the responses of `view` for anonymous GET requests.
+
+    Pages are keyed on asset build, path, query string and preferred language, and kept for
+    `RESPONSE_CACHE_TIMEOUT` seconds. Requests from logged-in visitors, with an
+    ``Authorization`` header or with pending flashed messages, and responses that touch the session, set
+    cookies or aren't a plain 200, bypass the cache. Cached responses carry an
+    ETag and Last-Modified and answer conditional requests with a 304.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _cacheable_request():
+            return view(*args, **kwargs)
+
+        key = _cache_key()
+        entry = cache.get(key)
+        if entry is not None:
+            return _serve(entry, 'hit')
+
+        response = _render(view, args, kwargs)
+        entry = _make_entry(response)
+        if entry is None:
+            if not response.direct_passthrough:
+                data = response.get_data()
+                if CSRF_PLACEHOLDER.encode('ascii') in data:
+                    response.set_data(data.replace(CSRF_PLACEHOLDER.encode('ascii'), generate_csrf().encode('ascii')))
+            return response
+
+        cache.set(key, entry, timeout=current_app.config.get('RESPONSE_CACHE_TIMEOUT', 300))
+        return _serve(entry, 'miss')
+
+    return wrapper
@@ -4,6 +4,7 @@ import base64
 import json
 import os
 import shlex
+from collections import namedtuple
 from functools import partial
 from itertools import chain, tee
 
@@ -32,6 +33,9 @@ _known_attrs = (
     'variables',
 )
 
+CacheInfo = namedtuple('CacheInfo', ('hits', 'decodes', 'size'))
+RelationshipIndex = namedtuple('RelationshipIndex', ('services', 'relationship_urls', 'service_urls'))
+
 
 def decode_json(data):
     """Decode a base64 encoded json string."""
@@ -77,6 +81,7 @@ def make_netloc(data):
         ':' if port else '',
         port or ''
     )
+    return netloc
 
 
 def make_url(data):
@@ -96,6 +101,36 @@ def make_url(data):
     return urlunsplit(comps)
 
 
+def index_relationships(relationships):
+    """Build a `RelationshipIndex` from a decoded `PLATFORM_RELATIONSHIPS` mapping.
+
+    The index maps service types to their endpoints and both relationship names
+    and service types to pre-rendered urls. All values are tuples, in the order
+    the endpoints appear in `relationships`. Endpoints that cannot be rendered
+    into a url (see `make_netloc`) are indexed by service but have no url.
+    """
+    services = {}
+    relationship_urls = {}
+    service_urls = {}
+
+    for name, endpoints in relationships.items():
+        urls = relationship_urls.setdefault(name, [])
+        for endpoint in endpoints:
+            service = endpoint.get('service')
+            services.setdefault(service, []).append(endpoint)
+            try:
+                url = make_url(endpoint)
+            except ValueError:
+                continue
+            urls.append(url)
+            service_urls.setdefault(service, []).append(url)
+
+    def freeze(mapping):
+        return {key: tuple(value) for key, value in mapping.items()}
+
+    return RelationshipIndex(freeze(services), freeze(relationship_urls), freeze(service_urls))
+
+
 class attrdict(dict):  # noqa: N801 # PascalCase warning
     """A `dict` that exposes its keys as attributes."""
 
@@ -119,26 +154,35 @@ class attrdict(dict):  # noqa: N801 # PascalCase warning
 class EnvDescriptor(object):
     """A Member Descriptor to fetch an environment variable."""
 
-    def __init__(self, variable, convert=None):
+    def __init__(self, variable, convert=None, cache=False):
         """Initialize the descriptor with a variable name and converter function.
 
         The default `convert` function decodes the byte string from the operating
         system into a str.
+
+        If `cache` is true, the converted value is memoized on the instance and
+        only recomputed when the raw bytes in the environment change.
         """
         self.variable = os.fsencode(variable)
         self.convert = convert or os.fsdecode
+        self.cache = cache
 
     def __get__(self, inst, owner=None):
         """Get the `self.variable` from the environment and apply the converter."""
+        if inst is None:
+            return self
+
         rv = os.getenvb(self.variable)
         if rv:
+            if self.cache:
+                return inst._cached(self.variable, rv, self.convert)
             return self.convert(rv)
 
 
 class Environment(object):
     """A mixin class for the environment returned from `build_environment`."""
 
-    __slots__ = ('_keys')
+    __slots__ = ('_keys', '_cache', '_hits', '_decodes', '_index')
 
     def __init__(self, keys):
         """Initialize the environment object.
@@ -147,6 +191,38 @@ class Environment(object):
         speed up other string formatting functions.
         """
         self._keys = keys
+        self._cache = {}
+        self._hits = 0
+        self._decodes = 0
+        self._index = (None, None)
+
+    def _cached(self, variable, raw, convert):
+        """Return the converted value of `variable`, decoding `raw` only if it changed.
+
+        Cached values are shared between callers; do not mutate them.
+        """
+        try:
+            cached_raw, value = self._cache[variable]
+        except KeyError:
+            pass
+        else:
+            if cached_raw is raw or cached_raw == raw:
+                self._hits += 1
+                return value
+
+        value = convert(raw)
+        self._decodes += 1
+        self._cache[variable] = (raw, value)
+        return value
+
+    def refresh(self):
+        """Drop all memoized values so the next access decodes from the environment again."""
+        self._cache.clear()
+        self._index = (None, None)
+
+    def cache_info(self):
+        """Return a `CacheInfo` with the number of cache hits, decodes and cached variables."""
+        return CacheInfo(self._hits, self._decodes, len(self._cache))
 
     def __getattr__(self, name):
         """Do not raise an AttributeError if the `name` is in our list of known attrs."""
@@ -183,35 +259,77 @@ class Environment(object):
         items = map('declare -x {}={};\n'.format, keys, values)
         return ''.join(items)
 
+    def export(self, fp, canonical=False):
+        """Stream the environment as a `.sh` file to the text file object `fp`.
+
+        Values are written from the raw environment bytes, so base64-json
+        variables are passed through without being decoded. With `canonical`,
+        json variables are re-encoded with sorted keys, matching `str(self)`.
+        Variables that have been unset since the environment was built are
+        skipped.
+        """
+        owner = type(self)
+        for key in self._keys:
+            raw = os.getenvb(os.fsencode(key))
+            if raw is None:
+                continue
+
+            descriptor = getattr(owner, make_name(key), None)
+            if canonical and isinstance(descriptor, EnvDescriptor) and descriptor.convert is not os.fsdecode:
+                value = json.dumps(getattr(self, make_name(key)), sort_keys=True, separators=(',', ':'))
+                value = base64.b64encode(value.encode('ascii')).decode('ascii')
+            else:
+                value = os.fsdecode(raw)
+
+            fp.write('declare -x {}={};\n'.format(key, shlex.quote(value)))
+
     def get_relationship(self, name):
         """Return the raw list of relationships for `name`."""
         if self.relationships:
             return self.relationships[name]
 
+    def relationship_index(self):
+        """Return the `RelationshipIndex` for the current relationships, or None.
+
+        The index is rebuilt only when the decoded relationships change, which
+        with the decode cache enabled means when `PLATFORM_RELATIONSHIPS` changes.
+        """
+        relationships = self.relationships
+        if not relationships:
+            return None
+
+        source, index = self._index
+        if source is not relationships:
+            index = index_relationships(relationships)
+            self._index = (relationships, index)
+        return index
+
     def get_service(self, service):
         """Return an iterator of relationships of type `service`."""
-        if self.relationships:
-            for value in self.relationships.values():
-                for svc in value:
-                    if svc.service == service:
-                        yield svc
+        index = self.relationship_index()
+        return iter(index.services.get(service, ()) if index else ())
 
     def get_relationship_urls(self, name):
         """Return an iterator of urls to the relationship named `name`."""
-        return map(make_url, self.get_relationship(name) or ())
+        index = self.relationship_index()
+        return iter(index.relationship_urls[name] if index else ())
 
     def get_service_urls(self, service):
         """Return an iterator of urls to the service of type `service`."""
-        return map(make_url, self.get_service(service))
+        index = self.relationship_index()
+        return iter(index.service_urls.get(service, ()) if index else ())
 
 
-def build_environment(*extra_keys, **kwargs):
+def build_environment(*extra_keys, cache=True, **kwargs):
     """Build an object with the Platform.sh environment variables as properties.
 
     The function accepts extra environment variables as positional parameters.
     The function also decodes base64-json encoded variables provided as keyword
     arguments. JSON objects are decoded into `attrdict` objects.
 
+    Unless `cache` is false, base64-json variables are decoded once and memoized
+    until their raw value changes or `Environment.refresh` is called.
+
     Example:
 
         >>> import os
@@ -243,7 +361,7 @@ def build_environment(*extra_keys, **kwargs):
 
     props = {
         make_name(key):
-        EnvDescriptor(key, decode_json if key in is_json else None)
+        EnvDescriptor(key, decode_json, cache) if key in is_json else EnvDescriptor(key)
         for key in keys
     }
 
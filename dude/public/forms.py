@@ -4,6 +4,8 @@ from flask_wtf import FlaskForm
 from wtforms import PasswordField, StringField
 from wtforms.validators import DataRequired
 
+from dude.metrics import logins_total
+from dude.throttle import LoginThrottled, login_throttle
 from dude.user.models import User
 
 
@@ -24,16 +26,29 @@ class LoginForm(FlaskForm):
         if not initial_validation:
             return False
 
-        self.user = User.query.filter_by(username=self.username.data).first()
+        # Throttled attempts are rejected before any query or hashing
+        try:
+            login_throttle.check(self.username.data)
+        except LoginThrottled:
+            logins_total.inc(result='throttled')
+            raise
+
+        self.user = User.get_by_username(self.username.data)
         if not self.user:
+            login_throttle.fail(self.username.data)
+            logins_total.inc(result='unknown_user')
             self.username.errors.append('Unknown username')
             return False
 
         if not self.user.check_password(self.password.data):
+            login_throttle.fail(self.username.data)
+            logins_total.inc(result='bad_password')
             self.password.errors.append('Invalid password')
             return False
 
-        if not self.user.active:
+        if not self.user.is_active:
+            logins_total.inc(result='inactive')
             self.username.errors.append('User not activated')
             return False
+        logins_total.inc(result='success')
         return True
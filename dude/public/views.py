@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 """Public section, including homepage and signup."""
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required, login_user, logout_user
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
 
-from dude.extensions import login_manager
+from dude.extensions import csrf_protect, db, login_manager
+from dude.pagecache import cached_page
 from dude.public.forms import LoginForm
+from dude.user.cache import user_cache
 from dude.user.forms import RegisterForm
 from dude.user.models import User
+from dude.user.tokens import issue_token, load_token, request_token
 from dude.utils import flash_errors
 
 blueprint = Blueprint('public', __name__, static_folder='../static')
@@ -15,10 +20,20 @@ blueprint = Blueprint('public', __name__, static_folder='../static')
 @login_manager.user_loader
 def load_user(user_id):
     """Load user by ID."""
-    return User.get_by_id(int(user_id))
+    return user_cache.load(user_id)
+
+
+@login_manager.request_loader
+def load_user_from_token(request):
+    """Load the user from an ``Authorization: Bearer`` token, with `AUTH_TOKENS_ENABLED`."""
+    if not current_app.config.get('AUTH_TOKENS_ENABLED', False):
+        return None
+    token = request_token(request)
+    return None if token is None else load_token(token)
 
 
 @blueprint.route('/', methods=['GET', 'POST'])
+@cached_page
 def home():
     """Home page."""
     form = LoginForm(request.form)
@@ -27,7 +42,7 @@ def home():
         if form.validate_on_submit():
             login_user(form.user)
             flash('You are logged in.', 'success')
-            redirect_url = request.args.get('next') or url_for('user.members')
+            redirect_url = request.args.get('next') or url_for('users.members')
             return redirect(redirect_url)
         else:
             flash_errors(form)
@@ -43,20 +58,55 @@ def logout():
     return redirect(url_for('public.home'))
 
 
+@blueprint.route('/token/', methods=['POST'])
+@csrf_protect.exempt
+def token():
+    """Issue an auth token for HTTP Basic credentials, or a fresh one for a valid token.
+
+    Only the ``Authorization`` header is read, never the session cookie, so
+    there is nothing for a cross-site request to forge.
+    """
+    if not current_app.config.get('AUTH_TOKENS_ENABLED', False):
+        abort(404)
+
+    auth = request.authorization
+    if auth is not None and auth.type == 'basic':
+        form = LoginForm(MultiDict({'username': auth.username, 'password': auth.password}), meta={'csrf': False})
+        user = form.user if form.validate() else None
+    else:
+        bearer = request_token(request)
+        user = None if bearer is None else load_token(bearer)
+
+    if user is None:
+        response = jsonify(error='invalid credentials')
+        response.status_code = 401
+        response.headers['WWW-Authenticate'] = 'Basic realm="dude"'
+        return response
+    return jsonify(token=issue_token(user), expires_in=current_app.config.get('AUTH_TOKEN_MAX_AGE', 900))
+
+
 @blueprint.route('/register/', methods=['GET', 'POST'])
+@cached_page
 def register():
     """Register new user."""
     form = RegisterForm(request.form)
     if form.validate_on_submit():
-        User.create(username=form.username.data, email=form.email.data, password=form.password.data, active=True)
-        flash('Thank you for registering. You can now log in.', 'success')
-        return redirect(url_for('public.home'))
-    else:
-        flash_errors(form)
+        try:
+            User.create(username=form.username.data, email=form.email.data, password=form.password.data,
+                        is_active=True)
+        except IntegrityError:
+            # registered by someone else since the form was validated
+            db.session.rollback()
+            form.check_unique()
+        else:
+            flash('Thank you for registering. You can now log in.', 'success')
+            return redirect(url_for('public.home'))
+    flash_errors(form)
     return render_template('public/register.html', form=form)
 
 
 @blueprint.route('/about/')
+@cached_page
 def about():
     """About page."""
     form = LoginForm(request.form)
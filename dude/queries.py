@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Slow query logging, repeated query (N+1) detection and per-endpoint query budgets."""
+import json
+import logging
+import re
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_savepoints = re.compile(r'\s*(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.IGNORECASE)
+_placeholder_lists = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)|\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)+\s*\)')
+
+#: Counters opened by `count_queries`, innermost last
+_counters = []
+
+#: Set once an app enables the query log; until then the listeners are not installed
+_installed = False
+
+
+def statement_shape(statement):
+    """Return `statement` with literals and expanded `IN` lists collapsed, for grouping."""
+    shape = _literals.sub('?', statement)
+    shape = _placeholder_lists.sub('(?)', shape)
+    return ' '.join(shape.split())
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when an endpoint runs more queries than its budget allows."""
+
+
+class RequestQueries(object):
+    """The statements run while handling one request."""
+
+    __slots__ = ('count', 'shapes')
+
+    def __init__(self):
+        """Start with no queries."""
+        self.count = 0
+        self.shapes = {}
+
+    def add(self, statement):
+        """Count `statement`."""
+        self.count += 1
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def repeated(self, threshold):
+        """Return ``(shape, count)`` for every shape run at least `threshold` times, most first."""
+        return sorted(((shape, count) for shape, count in self.shapes.items() if count >= threshold),
+                      key=lambda item: -item[1])
+
+
+class QueryCounter(object):
+    """The statements run inside a `count_queries` block."""
+
+    def __init__(self):
+        """Start with no statements."""
+        self.statements = []
+
+    @property
+    def count(self):
+        """The number of statements run."""
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries():
+    """Count the statements run on any engine inside the block.
+
+    Usage: ::
+
+        with count_queries() as queries:
+            testapp.get('/users/')
+        assert queries.count <= 3
+    """
+    _install()
+    counter = QueryCounter()
+    _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        _counters.remove(counter)
+
+
+@contextmanager
+def query_budget(limit):
+    """Fail with `QueryBudgetExceeded` if the block runs more than `limit` statements."""
+    with count_queries() as queries:
+        yield queries
+    if queries.count > limit:
+        raise QueryBudgetExceeded('{0} queries run, budget is {1}:\n{2}'.format(
+            queries.count, limit, '\n'.join(queries.statements)))
+
+
+def _origin():
+    if not has_request_context():
+        return {'endpoint': None}
+    endpoint = request.endpoint
+    view = current_app.view_functions.get(endpoint)
+    return {
+        'endpoint': endpoint,
+        'view': '{0}.{1}'.format(view.__module__, view.__qualname__) if view is not None else None,
+        'method': request.method,
+        'path': request.path,
+    }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._dude_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _savepoints.match(statement):
+        return  # transaction control, not a query
+    for counter in _counters:
+        counter.statements.append(statement)
+
+    if not has_request_context() or '_query_log' not in g:
+        return
+    config = current_app.config
+    g._query_log.add(statement)
+
+    start = getattr(context, '_dude_query_start', None)
+    if start is None:
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+    if elapsed >= config.get('SLOW_QUERY_THRESHOLD_MS', 200):
+        record = _origin()
+        record.update(event='slow_query', duration_ms=round(elapsed, 3), statement=statement)
+        logger.warning(json.dumps(record, sort_keys=True))
+
+
+def _install():
+    global _installed
+    if not _installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _installed = True
+
+
+class QueryLog(object):
+    """Log slow queries and repeated statements, and hold endpoints to a query budget.
+
+    Enabled with `QUERY_LOG_ENABLED`. Queries taking longer than
+    `SLOW_QUERY_THRESHOLD_MS` are logged to ``dude.queries`` with the view
+    that ran them. A statement shape run `N_PLUS_ONE_THRESHOLD` or more
+    times in one request is logged as a likely N+1. `QUERY_BUDGETS` maps
+    endpoints to the most queries they may run; going over is logged, or
+    raises `QueryBudgetExceeded` when `QUERY_BUDGET_STRICT` (the default
+    while testing).
+    """
+
+    def __init__(self, app=None):
+        """Initialize the extension."""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Set up the query log for `app` if it's enabled."""
+        if not app.config.get('QUERY_LOG_ENABLED', False):
+            return
+        _install()
+
+        @app.before_request
+        def start_query_log():
+            g._query_log = RequestQueries()
+
+        @app.after_request
+        def check_query_log(response):
+            queries = g.pop('_query_log', None)
+            if queries is None:
+                return response
+            config = current_app.config
+
+            for shape, count in queries.repeated(config.get('N_PLUS_ONE_THRESHOLD', 5)):
+                record = _origin()
+                record.update(event='repeated_query', count=count, statement=shape)
+                logger.warning(json.dumps(record, sort_keys=True))
+
+            budget = config.get('QUERY_BUDGETS', {}).get(request.endpoint)
+            if budget is not None and queries.count > budget:
+                message = '{0} ran {1} queries, budget is {2}'.format(request.endpoint, queries.count, budget)
+                if config.get('QUERY_BUDGET_STRICT', app.testing):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+
+        @app.teardown_request
+        def clear_query_log(exc):
+            g.pop('_query_log', None)
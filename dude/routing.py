@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Read-replica routing for the Flask-SQLAlchemy session."""
+import random
+from contextlib import contextmanager
+
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.sql.selectable import SelectBase
+
+from dude.engine import FailoverConnector
+
+REPLICA_BIND = 'replica{0}'
+
+
+class RoutingSession(SignallingSession):
+    """A session that sends plain SELECTs to a read replica.
+
+    Everything else goes to the primary: writes, ``SELECT ... FOR UPDATE``,
+    textual statements and models with a ``__bind_key__``. Once the session
+    has flushed, or `use_primary` was called, every later statement also
+    goes to the primary, so a request reads its own writes; `using_primary`
+    does the same for a block of statements. Flask-SQLAlchemy
+    scopes the session to the app context, which makes this per-request.
+    """
+
+    def __init__(self, db, **options):
+        """Create the session; the replica is picked on its first read."""
+        super(RoutingSession, self).__init__(db, **options)
+        self._db = db
+        self._primary_only = False
+        self._primary_depth = 0
+        self._replica = None
+
+    def use_primary(self):
+        """Send every further statement in this session to the primary."""
+        self._primary_only = True
+
+    @contextmanager
+    def using_primary(self):
+        """Send the statements run inside the block to the primary."""
+        self._primary_depth += 1
+        try:
+            yield self
+        finally:
+            self._primary_depth -= 1
+
+    def _get_replica(self):
+        if self._replica is None:
+            binds = self._db.get_replica_binds(self.app)
+            if not binds:
+                return None
+            self._replica = self._db.get_engine(self.app, bind=random.choice(binds))
+        return self._replica
+
+    def get_bind(self, mapper=None, clause=None):
+        """Return the replica engine for plain reads, otherwise defer to `SignallingSession`."""
+        if self._primary_only or self._primary_depth or self._flushing or not isinstance(clause, SelectBase):
+            return super(RoutingSession, self).get_bind(mapper, clause)
+
+        if getattr(clause, '_for_update_arg', None) is not None:
+            return super(RoutingSession, self).get_bind(mapper, clause)
+
+        if mapper is not None:
+            try:
+                # SA >= 1.3
+                persist_selectable = mapper.persist_selectable
+            except AttributeError:
+                # SA < 1.3
+                persist_selectable = mapper.mapped_table
+            if persist_selectable.info.get('bind_key') is not None:
+                return super(RoutingSession, self).get_bind(mapper, clause)
+
+        return self._get_replica() or super(RoutingSession, self).get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _stick_to_primary(session, flush_context, instances):
+    """Keep reads on the primary once the session has written anything."""
+    session.use_primary()
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """A `SQLAlchemy` extension whose session routes reads to `SQLALCHEMY_REPLICA_URIS`.
+
+    Each replica is registered as a ``replicaN`` bind. Without replicas the
+    session behaves like the stock Flask-SQLAlchemy session.
+    """
+
+    def init_app(self, app):
+        """Register the replica binds and initialize the extension."""
+        replicas = app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for index, uri in enumerate(replicas):
+            binds.setdefault(REPLICA_BIND.format(index), uri)
+        app.config['SQLALCHEMY_BINDS'] = binds or None
+        super(RoutingSQLAlchemy, self).init_app(app)
+
+    def get_replica_binds(self, app=None):
+        """Return the bind keys of the configured replicas."""
+        app = self.get_app(app)
+        return [REPLICA_BIND.format(index) for index in range(len(app.config['SQLALCHEMY_REPLICA_URIS']))]
+
+    def use_primary(self):
+        """Send every further statement in the current session to the primary."""
+        self.session().use_primary()
+
+    def using_primary(self):
+        """Send the statements run inside the block to the primary, in the current session."""
+        return self.session().using_primary()
+
+    def dispose_engines(self, app=None):
+        """Close the pooled connections of the primary and every bind, as around a fork."""
+        app = self.get_app(app)
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+            self.get_engine(app, bind=bind).dispose()
+
+    def create_session(self, options):
+        """Create a session factory for `RoutingSession`."""
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        """Create an engine, ignoring a primary `FailoverConnector` for other urls."""
+        creator = engine_opts.get('creator')
+        if isinstance(creator, FailoverConnector) and all(make_url(url) != sa_url for url in creator.urls):
+            engine_opts = dict(engine_opts)
+            del engine_opts['creator']
+        return super(RoutingSQLAlchemy, self).create_engine(sa_url, engine_opts)
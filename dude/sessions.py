@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Server-side sessions: the cookie carries only a random id, the data is kept in Redis."""
+import marshal
+import re
+import secrets
+import threading
+import time
+from collections.abc import MutableMapping
+
+import flask_login
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+
+_session_ids = re.compile(r'^[A-Za-z0-9_-]{32}$')
+
+#: Tags the payload with the format it was written in
+_MARSHAL, _JSON = b'm', b'j'
+
+_tagged_json = TaggedJSONSerializer()
+
+
+def dumps(data):
+    """Return the session `data` as compact bytes.
+
+    Sessions hold plain strings, numbers, lists and tuples, which `marshal`
+    writes far faster and smaller than JSON. Anything it can't (`Markup`,
+    dates) falls back to Flask's tagged JSON.
+    """
+    try:
+        return _MARSHAL + marshal.dumps(data, 4)
+    except ValueError:
+        return _JSON + _tagged_json.dumps(data).encode('utf-8')
+
+
+def loads(payload):
+    """Return the session data in `payload`, or `None` if it can't be read."""
+    try:
+        if payload[:1] == _MARSHAL:
+            data = marshal.loads(payload[1:])
+        elif payload[:1] == _JSON:
+            data = _tagged_json.loads(payload[1:].decode('utf-8'))
+        else:
+            return None
+    except (EOFError, TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class RedisSessionStore(object):
+    """Sessions kept in Redis under `prefix` plus the session id."""
+
+    def __init__(self, client, prefix='session/'):
+        """Store sessions with the redis `client`."""
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, sid):
+        """Return the payload saved for `sid` and the seconds it has left, or ``(None, None)``."""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self.prefix + sid)
+        pipe.ttl(self.prefix + sid)
+        payload, ttl = pipe.execute()
+        if payload is None:
+            return None, None
+        return payload, ttl if ttl is not None and ttl >= 0 else None
+
+    def save(self, sid, payload, ttl, replaces=None):
+        """Save `payload` for `sid` for `ttl` seconds, dropping the session `replaces` in the same round trip."""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.prefix + sid, payload, ex=ttl)
+        if replaces is not None:
+            pipe.delete(self.prefix + replaces)
+        pipe.execute()
+
+    def touch(self, sid, ttl):
+        """Restart the expiry of `sid` at `ttl` seconds."""
+        self.client.expire(self.prefix + sid, ttl)
+
+    def delete(self, sid):
+        """Drop the session `sid`."""
+        self.client.delete(self.prefix + sid)
+
+
+class SimpleSessionStore(object):
+    """Sessions kept in this process, for development and tests."""
+
+    def __init__(self, threshold=500):
+        """Start empty, pruning expired sessions once there are more than `threshold`."""
+        self.threshold = threshold
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """Return the payload saved for `sid` and the seconds it has left, or ``(None, None)``."""
+        payload, expires = self._sessions.get(sid, (None, 0))
+        ttl = int(expires - time.time())
+        if payload is None or ttl < 0:
+            return None, None
+        return payload, ttl
+
+    def save(self, sid, payload, ttl, replaces=None):
+        """Save `payload` for `sid` for `ttl` seconds, dropping the session `replaces`."""
+        now = time.time()
+        with self._lock:
+            if len(self._sessions) > self.threshold:
+                for key, (_, expires) in list(self._sessions.items()):
+                    if expires <= now:
+                        del self._sessions[key]
+            self._sessions[sid] = (payload, now + ttl)
+            if replaces is not None:
+                self._sessions.pop(replaces, None)
+
+    def touch(self, sid, ttl):
+        """Restart the expiry of `sid` at `ttl` seconds."""
+        with self._lock:
+            if sid in self._sessions:
+                self._sessions[sid] = (self._sessions[sid][0], time.time() + ttl)
+
+    def delete(self, sid):
+        """Drop the session `sid`."""
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class ServerSideSession(SessionMixin, MutableMapping):
+    """A session whose data is only fetched from the store the first time it's used."""
+
+    def __init__(self, store, sid=None):
+        """Refer to the session `sid` in `store`, or to a new one."""
+        self.store = store
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.ttl = None
+        self.user_id = None
+        self._data = None
+
+    @property
+    def data(self):
+        """The session's data, loaded on first use."""
+        if self._data is None:
+            self.accessed = True
+            data = None
+            if self.sid is not None:
+                payload, self.ttl = self.store.load(self.sid)
+                if payload is not None:
+                    data = loads(payload)
+            if data is None:
+                # Never reuse an id the store doesn't know; it may have been planted
+                self.new = True
+                data = {}
+            self._data = data
+            self.user_id = data.get('_user_id')
+        return self._data
+
+    def __getitem__(self, key):
+        """Return the value of `key`."""
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        """Set `key`, marking the session modified."""
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        """Remove `key`, marking the session modified."""
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        """Iterate over the keys."""
+        return iter(self.data)
+
+    def __len__(self):
+        """Return the number of keys."""
+        return len(self.data)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keep sessions in a store, with only their id in the cookie.
+
+    A request that never reads the session never touches the store, and one
+    that only reads it does one round trip. The session is written back only
+    when it changed, with an expiry of `PERMANENT_SESSION_LIFETIME` from its
+    last use. Unchanged sessions have that expiry pushed back at most every
+    `refresh_interval` seconds. Logging in or out moves the session to a new
+    id.
+    """
+
+    def __init__(self, store, refresh_interval=300):
+        """Keep sessions in `store`."""
+        self.store = store
+        self.refresh_interval = refresh_interval
+
+    def open_session(self, app, request):
+        """Return the session named by the request's cookie, without loading it."""
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid is not None and not _session_ids.match(sid):
+            sid = None
+        return ServerSideSession(self.store, sid)
+
+    def save_session(self, app, session, response):
+        """Write the session back if it changed, and set or clear its cookie."""
+        if not session.accessed:
+            return
+        response.vary.add('Cookie')
+
+        name = app.session_cookie_name
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = int(app.permanent_session_lifetime.total_seconds())
+        if session.modified or session.new:
+            replaces = None
+            if session.new or session.get('_user_id') != session.user_id:
+                replaces = None if session.new else session.sid
+                session.sid = secrets.token_urlsafe(24)
+            self.store.save(session.sid, dumps(dict(session)), lifetime, replaces=replaces)
+        elif session.ttl is None or lifetime - session.ttl >= self.refresh_interval:
+            self.store.touch(session.sid, lifetime)
+            if not session.permanent:
+                return
+        else:
+            return
+
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path, secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+class LoginManager(flask_login.LoginManager):
+    """A `flask_login.LoginManager` that doesn't load the session just to look for remember cookie changes."""
+
+    def _update_remember_cookie(self, response):
+        # Only logging in or out asks for a change, and both load the session
+        if not getattr(session, 'accessed', True) and \
+                not current_app.config.get('REMEMBER_COOKIE_REFRESH_EACH_REQUEST'):
+            return response
+        return super(LoginManager, self)._update_remember_cookie(response)
+
+
+def make_session_interface(config):
+    """Return the session interface selected by `SESSION_TYPE`, or `None` for Flask's signed cookies.
+
+    ``redis`` keeps sessions in `CACHE_REDIS_URL` under `SESSION_KEY_PREFIX`;
+    ``simple`` keeps them in the process, which only suits one process.
+    """
+    kind = config.get('SESSION_TYPE')
+    if not kind or kind == 'cookie':
+        return None
+
+    if kind == 'redis':
+        import redis
+        client = redis.StrictRedis.from_url(config['CACHE_REDIS_URL'])
+        store = RedisSessionStore(client, prefix=config.get('SESSION_KEY_PREFIX', 'session/'))
+    elif kind == 'simple':
+        store = SimpleSessionStore()
+    else:
+        raise ValueError('Unknown SESSION_TYPE {0!r}'.format(kind))
+    return ServerSideSessionInterface(store, config.get('SESSION_REFRESH_INTERVAL', 300))
@@ -9,6 +9,9 @@ environment variables.
 from environs import Env
 
 import dude.platform
+from dude.assets import DEFAULT_MANIFEST_PATH
+from dude.engine import engine_options, normalize_url
+from dude.hashing import DEFAULT_CALIBRATION_PATH
 
 env = Env()
 env.read_env()
@@ -21,19 +24,81 @@ else:
     SECRET_KEY = env.str('SECRET_KEY')
 
 if plat.relationships:
-    SQLALCHEMY_DATABASE_URI = next(plat.get_service_urls('postgres'))
+    replica_relationship = env.str('DATABASE_REPLICA_RELATIONSHIP', default='replica')
+    DATABASE_REPLICA_URLS = list(plat.relationship_index().relationship_urls.get(replica_relationship, ()))
+    DATABASE_URLS = [url for url in plat.get_service_urls('postgres') if url not in DATABASE_REPLICA_URLS]
     CACHE_REDIS_URL = next(plat.get_service_urls('redis'))
 else:
-    SQLALCHEMY_DATABASE_URI = env.str('DATABASE_URL')
+    DATABASE_REPLICA_URLS = env.list('DATABASE_REPLICA_URLS', default=[])
+    DATABASE_URLS = [env.str('DATABASE_URL')] + env.list('DATABASE_FAILOVER_URLS', default=[])
     CACHE_REDIS_URL = env.str('CACHE_REDIS_URL')
 
+DATABASE_URLS = [normalize_url(url) for url in DATABASE_URLS]
+SQLALCHEMY_REPLICA_URIS = [normalize_url(url) for url in DATABASE_REPLICA_URLS]
+SQLALCHEMY_DATABASE_URI = DATABASE_URLS[0]
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+    DATABASE_URLS,
+    pool_size=env.int('DATABASE_POOL_SIZE', default=5),
+    max_overflow=env.int('DATABASE_MAX_OVERFLOW', default=10),
+    pool_timeout=env.int('DATABASE_POOL_TIMEOUT', default=30),
+    pool_recycle=env.int('DATABASE_POOL_RECYCLE', default=1800),
+    pool_pre_ping=env.bool('DATABASE_POOL_PRE_PING', default=True),
+    statement_timeout=env.int('DATABASE_STATEMENT_TIMEOUT', default=0),
+    connect_timeout=env.int('DATABASE_CONNECT_TIMEOUT', default=5),
+)
+
 ENV = env.str('FLASK_ENV', default='production')
 DEBUG = ENV == 'development'
 
 BCRYPT_HANDLE_LONG_PASSWORDS = True
 BCRYPT_LOG_ROUNDS = env.int('BCRYPT_LOG_ROUNDS', default=13)
+BCRYPT_TARGET_MS = env.int('BCRYPT_TARGET_MS', default=None)
+BCRYPT_MIN_LOG_ROUNDS = env.int('BCRYPT_MIN_LOG_ROUNDS', default=10)
+BCRYPT_CALIBRATION_PATH = env.str('BCRYPT_CALIBRATION_PATH', default=DEFAULT_CALIBRATION_PATH)
+HASHING_EXECUTOR = env.str('HASHING_EXECUTOR', default='thread')
+HASHING_WORKERS = env.int('HASHING_WORKERS', default=2)
+HASHING_QUEUE_DEPTH = env.int('HASHING_QUEUE_DEPTH', default=8)
 CACHE_TYPE = 'redis'  # Can be "memcached", "redis", etc.
+SESSION_TYPE = env.str('SESSION_TYPE', default='redis')  # or "simple", or "cookie" for Flask's signed cookies
+SESSION_REFRESH_INTERVAL = env.int('SESSION_REFRESH_INTERVAL', default=300)
+RESPONSE_CACHE_ENABLED = env.bool('RESPONSE_CACHE_ENABLED', default=True)
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=300)
+TEMPLATE_BYTECODE_CACHE = env.str('TEMPLATE_BYTECODE_CACHE', default='filesystem')
+TEMPLATE_BYTECODE_CACHE_DIR = env.str('TEMPLATE_BYTECODE_CACHE_DIR', default=None)
+TEMPLATE_BYTECODE_CACHE_TIMEOUT = env.int('TEMPLATE_BYTECODE_CACHE_TIMEOUT', default=None)
+USER_CACHE_ENABLED = env.bool('USER_CACHE_ENABLED', default=True)
+USER_CACHE_TIMEOUT = env.int('USER_CACHE_TIMEOUT', default=300)
 DEBUG_TB_ENABLED = DEBUG
+ADMIN_LAZY = env.bool('ADMIN_LAZY', default=not DEBUG)
+ASGI_THREADS = env.int('ASGI_THREADS', default=15)
+AUTH_TOKENS_ENABLED = env.bool('AUTH_TOKENS_ENABLED', default=False)
+AUTH_TOKEN_MAX_AGE = env.int('AUTH_TOKEN_MAX_AGE', default=900)
+LOGIN_THROTTLE_WINDOW = env.int('LOGIN_THROTTLE_WINDOW', default=300)
+LOGIN_THROTTLE_USERNAME_LIMIT = env.int('LOGIN_THROTTLE_USERNAME_LIMIT', default=10)
+LOGIN_THROTTLE_IP_LIMIT = env.int('LOGIN_THROTTLE_IP_LIMIT', default=50)
+# The proxies whose X-Forwarded-For is trusted; Platform.sh has one router in front of the app
+PROXY_FIX_X_FOR = env.int('PROXY_FIX_X_FOR', default=1 if plat.relationships else 0)
 DEBUG_TB_INTERCEPT_REDIRECTS = False
+SERVER_TIMING_ENABLED = env.bool('SERVER_TIMING_ENABLED', default=False)
+SERVER_TIMING_SAMPLE_RATE = env.float('SERVER_TIMING_SAMPLE_RATE', default=1.0)
+SERVER_TIMING_HEADER = env.bool('SERVER_TIMING_HEADER', default=True)
+SERVER_TIMING_LOG = env.bool('SERVER_TIMING_LOG', default=True)
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=False)
+METRICS_DIR = env.str('METRICS_DIR', default=None)
+METRICS_TOKEN = env.str('METRICS_TOKEN', default=None)
+METRICS_FLUSH_INTERVAL = env.int('METRICS_FLUSH_INTERVAL', default=5)
+QUERY_LOG_ENABLED = env.bool('QUERY_LOG_ENABLED', default=True)
+SLOW_QUERY_THRESHOLD_MS = env.int('SLOW_QUERY_THRESHOLD_MS', default=200)
+N_PLUS_ONE_THRESHOLD = env.int('N_PLUS_ONE_THRESHOLD', default=5)
+RESPONSE_HEADERS = (
+    ('X-Clacks-Overhead', 'GNU'),
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'SAMEORIGIN'),
+    ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+)
+RESPONSE_HEADERS_BY_PATH = {
+    '/admin/': (('Cache-Control', 'no-store'), ('X-Robots-Tag', 'noindex')),
+    '/users/': (('Cache-Control', 'no-store'),),
+}
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-WEBPACK_MANIFEST_PATH = 'webpack/manifest.json'
+ASSETS_MANIFEST_PATH = env.str('ASSETS_MANIFEST_PATH', default=DEFAULT_MANIFEST_PATH)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Startup profiling: how long each step of `create_app` takes, and how much of that is imports."""
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+#: Set to profile `create_app`; the report goes to stderr
+PROFILE_ENVVAR = 'DUDE_STARTUP_PROFILE'
+
+
+class StartupProfile(object):
+    """Time the named steps of building an app, separating out the time spent importing.
+
+    Usage: ::
+
+        with StartupProfile.from_environ() as profile:
+            with profile.step('settings'):
+                app.config.from_object(config_object)
+
+    While enabled, `__import__` is wrapped to time imports and the report
+    is written to stderr at the end. Disabled, it does nothing.
+    """
+
+    def __init__(self, enabled=False, stream=None):
+        """Create the profile."""
+        self.enabled = enabled
+        self.stream = stream
+        self.steps = []
+        self._original_import = None
+        self._importing = 0
+        self._import_time = 0.0
+        self._start = None
+        self.total = 0.0
+
+    @classmethod
+    def from_environ(cls):
+        """Return a profile that's enabled if `DUDE_STARTUP_PROFILE` is set."""
+        return cls(enabled=bool(os.environ.get(PROFILE_ENVVAR)))
+
+    def __enter__(self):
+        """Start profiling."""
+        if self.enabled:
+            self._start = time.perf_counter()
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop profiling and write the report."""
+        if self.enabled:
+            builtins.__import__ = self._original_import
+            self.total = time.perf_counter() - self._start
+            (self.stream or sys.stderr).write(self.report() + '\n')
+
+    def _import(self, *args, **kwargs):
+        if self._importing:
+            return self._original_import(*args, **kwargs)
+        self._importing += 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(*args, **kwargs)
+        finally:
+            self._import_time += time.perf_counter() - start
+            self._importing -= 1
+
+    @contextmanager
+    def step(self, name):
+        """Time the block as the step `name`."""
+        if not self.enabled:
+            yield
+            return
+        import_time, modules = self._import_time, len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append(
+                (name, time.perf_counter() - start, self._import_time - import_time, len(sys.modules) - modules))
+
+    def report(self):
+        """Return the steps as a table."""
+        lines = ['{0:<16} {1:>9} {2:>10} {3:>8}'.format('startup step', 'total ms', 'import ms', 'modules')]
+        for name, elapsed, import_time, modules in self.steps:
+            lines.append('{0:<16} {1:9.1f} {2:10.1f} {3:8d}'.format(name, elapsed * 1000, import_time * 1000, modules))
+        lines.append('{0:<16} {1:9.1f} {2:10.1f}'.format('total', self.total * 1000, self._import_time * 1000))
+        return '\n'.join(lines)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Jinja bytecode caching."""
+import os
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache, MemcachedBytecodeCache
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_CACHE_DIR = os.path.join(HERE, os.pardir, '.jinja_cache')
+
+
+class AtomicFileSystemBytecodeCache(FileSystemBytecodeCache):
+    """A `FileSystemBytecodeCache` that never exposes a half-written file, and tolerates not being able to write.
+
+    Each file is written under a temporary name and moved into place, so a
+    worker never loads another's partial write. Failing to write, as on a
+    read-only mount that wasn't compiled at build time, only means the
+    template is compiled again next time.
+    """
+
+    def dump_bytecode(self, bucket):
+        """Store the bucket's bytecode, if the directory can be written."""
+        filename = self._get_cache_filename(bucket)
+        try:
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(filename), prefix='.tmp-')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(temp, filename)
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+
+def make_bytecode_cache(config):
+    """Return the Jinja bytecode cache selected by `TEMPLATE_BYTECODE_CACHE`, or `None`.
+
+    ``filesystem`` keeps compiled templates in `TEMPLATE_BYTECODE_CACHE_DIR`,
+    which can be filled at build time with `flask templates compile`.
+    ``redis`` shares them through `CACHE_REDIS_URL` for
+    `TEMPLATE_BYTECODE_CACHE_TIMEOUT` seconds.
+    """
+    kind = config.get('TEMPLATE_BYTECODE_CACHE')
+    if not kind:
+        return None
+
+    if kind == 'filesystem':
+        directory = config.get('TEMPLATE_BYTECODE_CACHE_DIR') or DEFAULT_CACHE_DIR
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            # A read-only checkout that was never compiled; templates still work
+            return None
+        return AtomicFileSystemBytecodeCache(directory)
+
+    if kind == 'redis':
+        import redis
+        client = redis.StrictRedis.from_url(config['CACHE_REDIS_URL'])
+        return MemcachedBytecodeCache(client, prefix='jinja/', timeout=config.get('TEMPLATE_BYTECODE_CACHE_TIMEOUT'))
+
+    raise ValueError('Unknown TEMPLATE_BYTECODE_CACHE {0!r}'.format(kind))
+
+
+def compile_templates(env, extensions=('html', 'txt', 'xml')):
+    """Load every template in `env` through its bytecode cache.
+
+    Yield ``(name, error)`` for each template; `error` is `None` once it has
+    been compiled and stored.
+    """
+    for name in env.list_templates(extensions=extensions):
+        try:
+            env.get_template(name)
+        except Exception as e:  # noqa: B902 # report and keep going
+            yield name, e
+        else:
+            yield name, None
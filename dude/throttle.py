@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Login throttling backed by the shared cache."""
+import time
+
+from flask import current_app, request
+from werkzeug.exceptions import TooManyRequests
+
+from dude.extensions import cache
+
+
+class LoginThrottled(TooManyRequests):
+    """Raised when a login is attempted too often for a username or client address."""
+
+    description = 'Too many login attempts. Please wait a minute and try again.'
+
+    def __init__(self, retry_after):
+        """Create the exception with a `Retry-After` hint in seconds."""
+        super(LoginThrottled, self).__init__()
+        self.retry_after = retry_after
+
+    def get_headers(self, *args, **kwargs):
+        """Add a `Retry-After` header to the response."""
+        headers = super(LoginThrottled, self).get_headers(*args, **kwargs)
+        return headers + [('Retry-After', str(self.retry_after))]
+
+
+class SlidingWindowLimiter(object):
+    """Approximate a sliding window counter with two fixed windows.
+
+    The count for the previous window is weighted by how much of it still
+    overlaps the sliding window, which needs only two cache keys per
+    identifier. Counters expire on their own after two windows.
+    """
+
+    def __init__(self, prefix, clock=time.time):
+        """Initialize the limiter; keys are namespaced under `prefix`."""
+        self.prefix = prefix
+        self.clock = clock
+
+    def _keys(self, ident, window, now):
+        index = int(now // window)
+        key = '{0}/{1}/{2}'.format(self.prefix, ident, '{0}')
+        return key.format(index), key.format(index - 1), (now % window) / window
+
+    def count(self, ident, window):
+        """Return the estimated number of hits for `ident` in the last `window` seconds."""
+        current_key, previous_key, elapsed = self._keys(ident, window, self.clock())
+        current, previous = cache.get_many(current_key, previous_key)
+        return (current or 0) + (previous or 0) * (1 - elapsed)
+
+    def hit(self, ident, window):
+        """Record a hit for `ident`."""
+        current_key, _, _ = self._keys(ident, window, self.clock())
+        # `add` only sets the expiry when the key is new; the increment keeps it
+        cache.add(current_key, 0, timeout=2 * window)
+        cache.cache.inc(current_key)
+
+
+class LoginThrottle(object):
+    """Limit failed logins per username and per client address.
+
+    Configured with `LOGIN_THROTTLE_WINDOW` (seconds),
+    `LOGIN_THROTTLE_USERNAME_LIMIT` and `LOGIN_THROTTLE_IP_LIMIT`; disable with
+    `LOGIN_THROTTLE_ENABLED = False`.
+    """
+
+    def __init__(self, clock=time.time):
+        """Initialize the throttle."""
+        self.usernames = SlidingWindowLimiter('login/username', clock)
+        self.addresses = SlidingWindowLimiter('login/ip', clock)
+
+    @staticmethod
+    def _idents(username):
+        return (username or '').strip().lower(), request.remote_addr or 'unknown'
+
+    def check(self, username):
+        """Raise `LoginThrottled` if `username` or the client address is over its limit."""
+        config = current_app.config
+        if not config.get('LOGIN_THROTTLE_ENABLED', True):
+            return
+
+        window = config.get('LOGIN_THROTTLE_WINDOW', 300)
+        username, address = self._idents(username)
+        if (self.usernames.count(username, window) >= config.get('LOGIN_THROTTLE_USERNAME_LIMIT', 10)
+                or self.addresses.count(address, window) >= config.get('LOGIN_THROTTLE_IP_LIMIT', 50)):
+            raise LoginThrottled(window)
+
+    def fail(self, username):
+        """Record a failed login for `username` from the client address."""
+        config = current_app.config
+        if not config.get('LOGIN_THROTTLE_ENABLED', True):
+            return
+
+        window = config.get('LOGIN_THROTTLE_WINDOW', 300)
+        username, address = self._idents(username)
+        self.usernames.hit(username, window)
+        self.addresses.hit(address, window)
+
+
+login_throttle = LoginThrottle()
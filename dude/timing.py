@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Per-request timing of the hot paths, reported as `Server-Timing` and log lines."""
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+#: Metrics in `Server-Timing` order, with their descriptions
+METRICS = (
+    ('db', 'SQL queries'),
+    ('bcrypt', 'Password hashing'),
+    ('cache', 'Cache calls'),
+    ('template', 'Template rendering'),
+)
+
+#: Set once an app enables timing; until then `timed` does nothing at all
+_installed = False
+
+
+class Timings(object):
+    """The counts and durations collected for one request."""
+
+    __slots__ = ('start', 'metrics', 'templates')
+
+    def __init__(self):
+        """Start timing the request."""
+        self.start = time.perf_counter()
+        self.metrics = {}
+        self.templates = []
+
+    def add(self, name, elapsed):
+        """Count one call to `name` that took `elapsed` seconds."""
+        metric = self.metrics.get(name)
+        if metric is None:
+            self.metrics[name] = [1, elapsed]
+        else:
+            metric[0] += 1
+            metric[1] += elapsed
+
+    def header(self, total):
+        """Return the `Server-Timing` header value for a request that took `total` seconds."""
+        parts = []
+        for name, description in METRICS:
+            if name in self.metrics:
+                count, elapsed = self.metrics[name]
+                parts.append('{0};dur={1:.2f};desc="{2} ({3})"'.format(name, elapsed * 1000, description, count))
+        parts.append('total;dur={0:.2f}'.format(total * 1000))
+        return ', '.join(parts)
+
+    def record(self, total):
+        """Return the timings as a flat `dict` of counts and milliseconds."""
+        record = {'total_ms': round(total * 1000, 3)}
+        for name, (count, elapsed) in self.metrics.items():
+            record[name + '_count'] = count
+            record[name + '_ms'] = round(elapsed * 1000, 3)
+        return record
+
+
+def current_timings():
+    """Return the `Timings` being collected for this request, or `None`."""
+    if not _installed or not has_request_context():
+        return None
+    return g.get('_timings')
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to metric `name` for the current request."""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_timings() is not None:
+        context._dude_timing_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_dude_timing_start', None)
+    if start is not None:
+        timings = current_timings()
+        if timings is not None:
+            timings.add('db', time.perf_counter() - start)
+
+
+def _before_render_template(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings.templates.append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None and timings.templates:
+        timings.add('template', time.perf_counter() - timings.templates.pop())
+
+
+class TimedCache(object):
+    """Wrap a cache backend, timing its calls as the ``cache`` metric."""
+
+    def __init__(self, backend):
+        """Wrap `backend`."""
+        self.backend = backend
+
+    def __getattr__(self, name):
+        """Pass anything not timed straight through."""
+        return getattr(self.backend, name)
+
+
+def _timed_method(name):
+    def method(self, *args, **kwargs):
+        with timed('cache'):
+            return getattr(self.backend, name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+for _name in ('get', 'get_many', 'get_dict', 'has', 'set', 'set_many', 'add', 'delete', 'delete_many', 'inc', 'dec'):
+    setattr(TimedCache, _name, _timed_method(_name))
+
+
+class Timing(object):
+    """Time SQL queries, password hashing, cache calls and template rendering per request.
+
+    Enabled with `SERVER_TIMING_ENABLED`; a `SERVER_TIMING_SAMPLE_RATE` fraction
+    of requests is timed. The results are sent as a `Server-Timing` header
+    (`SERVER_TIMING_HEADER`) and logged as a json line to ``dude.timing``
+    (`SERVER_TIMING_LOG`). When disabled, nothing is hooked up.
+    """
+
+    def __init__(self, app=None):
+        """Initialize the extension."""
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Set up timing for `app` if it's enabled."""
+        if not app.config.get('SERVER_TIMING_ENABLED', False):
+            return
+
+        global _installed
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _installed = True
+        before_render_template.connect(_before_render_template, app)
+        template_rendered.connect(_template_rendered, app)
+
+        caches = app.extensions.get('cache', {})
+        for key, backend in caches.items():
+            if not isinstance(backend, TimedCache):
+                caches[key] = TimedCache(backend)
+
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
+
+        rate = app.config.get('SERVER_TIMING_SAMPLE_RATE', 1.0)
+        send_header = app.config.get('SERVER_TIMING_HEADER', True)
+        log = app.config.get('SERVER_TIMING_LOG', True)
+
+        @app.before_request
+        def start_timing():
+            if rate >= 1 or random.random() < rate:  # noqa: S311 # sampling, not security
+                g._timings = Timings()
+
+        @app.after_request
+        def report_timing(response):
+            timings = g.pop('_timings', None)
+            if timings is None:
+                return response
+            total = time.perf_counter() - timings.start
+            if send_header:
+                response.headers.add('Server-Timing', timings.header(total))
+            if log:
+                record = timings.record(total)
+                record.update(method=request.method, path=request.path, endpoint=request.endpoint,
+                              status=response.status_code)
+                logger.info(json.dumps(record, sort_keys=True))
+            return response
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Bulk import and export of users."""
+import csv
+import datetime as dt
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from dude.database import db
+from dude.extensions import bcrypt
+
+from .models import User, now
+
+#: Columns written by `import_users`, in COPY order
+IMPORT_COLUMNS = (
+    'username', 'email', 'email_verified', 'first_name', 'last_name', 'is_active', 'is_admin',
+    'password', 'password_set_at', 'created_at', 'modified_at',
+)
+
+#: Fields written by `export_users`; `password_hash` can be imported again as is
+EXPORT_FIELDS = (
+    'id', 'username', 'email', 'email_verified', 'first_name', 'last_name', 'is_active', 'is_admin',
+    'password_hash', 'password_set_at', 'created_at', 'modified_at',
+)
+
+_true = ('1', 'true', 't', 'yes', 'y', 'on')
+
+
+def guess_format(filename):
+    """Return ``jsonl`` for `.jsonl`/`.ndjson` files and ``csv`` otherwise."""
+    return 'jsonl' if filename.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_rows(fp, fmt):
+    """Yield one `dict` per record in the text file `fp`."""
+    if fmt == 'jsonl':
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        for row in csv.DictReader(fp):
+            yield row
+
+
+def _bool(value, default=False):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in _true
+
+
+def _bytes(value):
+    if value is None or value == '':
+        return None
+    return value.encode('ascii') if isinstance(value, str) else bytes(value)
+
+
+def _datetime(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, dt.datetime):
+        return value
+    # As written by `datetime.isoformat`; `fromisoformat` needs Python 3.7
+    value = value.strip().replace('T', ' ')
+    return dt.datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f' if '.' in value else '%Y-%m-%d %H:%M:%S')
+
+
+def _text(value):
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).decode('ascii')
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def to_mapping(row, timestamp):
+    """Return the column values for an import `row`, with every default filled in.
+
+    The plaintext `password`, if any, is returned separately so it can be hashed
+    in bulk; a `password_hash` is stored as is. Exported `created_at`,
+    `modified_at` and `password_set_at` are kept; missing ones become
+    `timestamp`.
+    """
+    password_hash = _bytes(row.get('password_hash'))
+    password = row.get('password') or None
+    mapping = {
+        'username': row['username'],
+        'email': row['email'],
+        'email_verified': _bool(row.get('email_verified')),
+        'first_name': row.get('first_name') or None,
+        'last_name': row.get('last_name') or None,
+        'is_active': _bool(row.get('is_active'), True),
+        'is_admin': _bool(row.get('is_admin')),
+        'password': password_hash,
+        'password_set_at': (_datetime(row.get('password_set_at')) or timestamp) if password_hash or password else None,
+        'created_at': _datetime(row.get('created_at')) or timestamp,
+        'modified_at': _datetime(row.get('modified_at')) or timestamp,
+    }
+    return mapping, password
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy_mappings(session, mappings):
+    """Insert `mappings` with PostgreSQL's COPY."""
+    def value(column, mapping):
+        v = mapping[column]
+        if v is None:
+            return None
+        if column == 'password':
+            return '\\x' + v.hex()
+        if isinstance(v, bool):
+            return 't' if v else 'f'
+        return _text(v)
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for mapping in mappings:
+        writer.writerow([value(column, mapping) for column in IMPORT_COLUMNS])
+    buf.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert('COPY {0} ({1}) FROM STDIN WITH (FORMAT csv)'.format(
+            User.__tablename__, ', '.join(IMPORT_COLUMNS)), buf)
+    finally:
+        cursor.close()
+
+
+def import_users(rows, rounds, batch_size=1000, hash_workers=1, use_copy=None, progress=None):
+    """Insert users from `rows` in batches of `batch_size` and return the number inserted.
+
+    Plaintext passwords are hashed with `rounds` on `hash_workers` processes.
+    `use_copy` defaults to using COPY on PostgreSQL and `bulk_insert_mappings`
+    elsewhere. Each batch is committed on its own; `progress` is called with the
+    running total and elapsed seconds after each one.
+    """
+    session = db.session
+    if use_copy is None:
+        use_copy = session.get_bind().dialect.name == 'postgresql'
+
+    hash_password = partial(bcrypt.generate_password_hash, rounds=rounds)
+    executor = ProcessPoolExecutor(hash_workers) if hash_workers > 1 else None
+    start = time.perf_counter()
+    total = 0
+    try:
+        for batch in _batches(rows, batch_size):
+            timestamp = now()
+            mappings, passwords = map(list, zip(*(to_mapping(row, timestamp) for row in batch)))
+            pending = [(mapping, password) for mapping, password in zip(mappings, passwords) if password]
+            if pending:
+                plaintext = [password for _, password in pending]
+                if executor is not None:
+                    chunksize = max(1, len(plaintext) // (hash_workers * 4))
+                    hashes = executor.map(hash_password, plaintext, chunksize=chunksize)
+                else:
+                    hashes = map(hash_password, plaintext)
+                for (mapping, _), pw_hash in zip(pending, hashes):
+                    mapping['password'] = pw_hash
+
+            if use_copy:
+                _copy_mappings(session, mappings)
+            else:
+                session.bulk_insert_mappings(User, mappings)
+            session.commit()
+
+            total += len(mappings)
+            if progress is not None:
+                progress(total, time.perf_counter() - start)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return total
+
+
+def export_users(fp, fmt, batch_size=1000, progress=None):
+    """Stream every user to the text file `fp` and return the number written."""
+    query = User.query.order_by(User.id).yield_per(batch_size)
+    if fmt == 'csv':
+        writer = csv.DictWriter(fp, EXPORT_FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            fp.write(json.dumps(record, separators=(',', ':')))
+            fp.write('\n')
+
+    start = time.perf_counter()
+    total = 0
+    for user in query:
+        record = {field: _text(getattr(user, field)) for field in EXPORT_FIELDS if field != 'password_hash'}
+        record['password_hash'] = _text(user.password)
+        write(record)
+        total += 1
+        if progress is not None and total % batch_size == 0:
+            progress(total, time.perf_counter() - start)
+
+    if progress is not None and total % batch_size:
+        progress(total, time.perf_counter() - start)
+    return total
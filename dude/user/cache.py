@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""A cache of user snapshots for the login manager's user loader."""
+import zlib
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from dude.database import db
+from dude.extensions import cache
+
+from .models import User
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'invalidations'))
+
+# Secrets are never cached; they are loaded from the database on first access
+_excluded = ('password', 'password_reset_token')
+
+
+class UserCache(object):
+    """Cache `User` rows as compact tuples of column values.
+
+    A cached user is rebuilt into a detached instance and merged into the
+    session without a query. Entries expire after `USER_CACHE_TIMEOUT` seconds
+    and are dropped whenever a user is updated or deleted.
+    """
+
+    def __init__(self, model):
+        """Initialize the cache for `model`."""
+        self.model = model
+        self.columns = tuple(c.key for c in model.__table__.columns if c.key not in _excluded)
+        # The column list is part of the key so a schema change never restores a stale layout
+        self.prefix = 'user/{0:x}/'.format(zlib.crc32(','.join(self.columns).encode('ascii')))
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def key(self, user_id):
+        """Return the cache key for `user_id`."""
+        return '{0}{1}'.format(self.prefix, user_id)
+
+    @property
+    def enabled(self):
+        """Whether the cache is enabled for the current app."""
+        return current_app.config.get('USER_CACHE_ENABLED', True)
+
+    def snapshot(self, user):
+        """Return the cached representation of `user`."""
+        return tuple(getattr(user, column) for column in self.columns)
+
+    def restore(self, snapshot):
+        """Rebuild a session-bound user from `snapshot` without querying the database."""
+        user = self.model.__mapper__.class_manager.new_instance()
+        for column, value in zip(self.columns, snapshot):
+            set_committed_value(user, column, value)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def load(self, user_id):
+        """Return the user with `user_id` from the cache, falling back to the database."""
+        if not self.enabled:
+            return self.model.get_by_id(user_id)
+
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        snapshot = cache.get(self.key(user_id))
+        if snapshot is not None:
+            self.hits += 1
+            return self.restore(snapshot)
+
+        self.misses += 1
+        # A lagging replica could return the row from before the write that invalidated it
+        with db.using_primary():
+            user = self.model.get_by_id(user_id)
+        if user is not None:
+            timeout = current_app.config.get('USER_CACHE_TIMEOUT', 300)
+            cache.set(self.key(user_id), self.snapshot(user), timeout=timeout)
+        return user
+
+    def values(self, user_id, columns):
+        """Return the values of `columns` for `user_id` without building a user, or `None` if there's no such user.
+
+        A cached snapshot answers without a query; otherwise the user is
+        loaded, and cached, as `load` would.
+        """
+        if self.enabled:
+            try:
+                user_id = int(user_id)
+            except (TypeError, ValueError):
+                return None
+            snapshot = cache.get(self.key(user_id))
+            if snapshot is not None:
+                self.hits += 1
+                return tuple(snapshot[self.columns.index(column)] for column in columns)
+        user = self.load(user_id)
+        if user is None:
+            return None
+        return tuple(getattr(user, column) for column in columns)
+
+    def invalidate(self, user_id):
+        """Drop the cached snapshot for `user_id`."""
+        self.invalidations += 1
+        cache.delete(self.key(user_id))
+
+    def cache_info(self):
+        """Return a `CacheInfo` with the number of hits, misses and invalidations."""
+        return CacheInfo(self.hits, self.misses, self.invalidations)
+
+
+user_cache = UserCache(User)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    """Drop the snapshot now and again once the transaction has committed."""
+    user_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('invalidated_users', set()).add(target.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_users(session):
+    """Drop snapshots a concurrent request may have cached from pre-commit data."""
+    for user_id in session.info.pop('invalidated_users', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_invalidated_users(session):
+    """Nothing was written, so there is nothing left to invalidate."""
+    session.info.pop('invalidated_users', None)
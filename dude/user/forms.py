@@ -25,12 +25,13 @@ class RegisterForm(FlaskForm):
         initial_validation = super(RegisterForm, self).validate()
         if not initial_validation:
             return False
-        user = User.query.filter_by(username=self.username.data).first()
-        if user:
+        return self.check_unique()
+
+    def check_unique(self):
+        """Check that neither the username nor the email is registered yet."""
+        username_taken, email_taken = User.registered(self.username.data, self.email.data)
+        if username_taken:
             self.username.errors.append('Username already registered')
-            return False
-        user = User.query.filter_by(email=self.email.data).first()
-        if user:
+        if email_taken:
             self.email.errors.append('Email already registered')
-            return False
-        return True
+        return not (username_taken or email_taken)
@@ -2,13 +2,25 @@
 """User models."""
 import datetime as dt
 
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import func, or_
 
 from dude.database import Column, Model, SurrogatePK, db, reference_col, relationship
-from dude.extensions import bcrypt
+from dude.extensions import bcrypt, hasher
+from dude.hashing import HashingQueueFull, hash_log_rounds
 
 now = dt.datetime.utcnow
 
+_unix_epoch = dt.datetime(1970, 1, 1)
+
+
+def password_epoch(password_set_at):
+    """Return `password_set_at` in whole microseconds since 1970, or 0 if the password was never set."""
+    if password_set_at is None:
+        return 0
+    return (password_set_at - _unix_epoch) // dt.timedelta(microseconds=1)
+
 
 class Role(SurrogatePK, Model):
     """A role for a user."""
@@ -32,7 +44,7 @@ class User(UserMixin, SurrogatePK, Model):
 
     __tablename__ = 'users'
     username = Column(db.Unicode(128), unique=True, nullable=False)
-    email = Column(db.String(255), unique=False, nullable=False, index=True)
+    email = Column(db.String(255), nullable=False)
     email_verified = Column(db.Boolean, nullable=False, default=False)
     created_at = Column(db.DateTime, nullable=False, default=now)
     modified_at = Column(db.DateTime, nullable=False, default=now, onupdate=now)
@@ -50,6 +62,16 @@ class User(UserMixin, SurrogatePK, Model):
     is_active = Column(db.Boolean, nullable=False, default=False)
     is_admin = Column(db.Boolean, nullable=False, default=False)
 
+    # usernames and emails are unique and looked up ignoring case; text_pattern_ops lets
+    # PostgreSQL use the same indexes for the admin's prefix search
+    __table_args__ = (
+        db.Index('ix_users_username_lower', func.lower(username).label('username_lower'), unique=True,
+                 postgresql_ops={'username_lower': 'text_pattern_ops'}),
+        db.Index('ix_users_email_lower', func.lower(email).label('email_lower'), unique=True,
+                 postgresql_ops={'email_lower': 'text_pattern_ops'}),
+        SurrogatePK.__table_args__,
+    )
+
     def __init__(self, username, email, password=None, **kwargs):
         """Create instance."""
         db.Model.__init__(self, username=username, email=email, **kwargs)
@@ -58,14 +80,66 @@ class User(UserMixin, SurrogatePK, Model):
         else:
             self.password = None
 
+    @classmethod
+    def get_by_username(cls, username):
+        """Get the user named `username`, ignoring case."""
+        return cls.query.filter(func.lower(cls.username) == func.lower(username)).first()
+
+    @classmethod
+    def get_by_email(cls, email):
+        """Get the user with `email`, ignoring case."""
+        return cls.query.filter(func.lower(cls.email) == func.lower(email)).first()
+
+    @classmethod
+    def registered(cls, username, email):
+        """Return whether `username` and whether `email` belong to a user, ignoring case, in one query."""
+        username_taken = func.lower(cls.username) == func.lower(username)
+        email_taken = func.lower(cls.email) == func.lower(email)
+        # each matches at most one user, so at most two rows come back
+        rows = db.session.query(username_taken, email_taken).filter(or_(username_taken, email_taken)).limit(2).all()
+        return any(row[0] for row in rows), any(row[1] for row in rows)
+
     def set_password(self, password):
         """Set password."""
-        self.password = bcrypt.generate_password_hash(password)
+        self.password = self._hash_password(password)
         self.password_set_at = now()
 
+    @staticmethod
+    def _hash_password(password):
+        return hasher.run(bcrypt.generate_password_hash, password, current_app.config['BCRYPT_LOG_ROUNDS'])
+
     def check_password(self, value):
-        """Check password."""
-        return bcrypt.check_password_hash(self.password, value)
+        """Check password.
+
+        On success, a hash created with a lower cost than `BCRYPT_LOG_ROUNDS`
+        is replaced with a fresh one and saved. This doesn't count as setting
+        the password, so `password_set_at` is left alone.
+        """
+        if not hasher.run(bcrypt.check_password_hash, self.password, value):
+            return False
+
+        if self.password_needs_rehash():
+            try:
+                self.password = self._hash_password(value)
+            except HashingQueueFull:
+                pass  # try again on the next login rather than failing this one
+            else:
+                self.save()
+        return True
+
+    def password_needs_rehash(self):
+        """Return whether the password hash was created with a lower cost than configured.
+
+        Hashes stronger than configured are kept, so lowering the cost never
+        weakens them.
+        """
+        rounds = hash_log_rounds(self.password)
+        return rounds is None or rounds < current_app.config['BCRYPT_LOG_ROUNDS']
+
+    @property
+    def password_epoch(self):
+        """When the password was last set; auth tokens issued for an earlier epoch are void."""
+        return password_epoch(self.password_set_at)
 
     @property
     def full_name(self):
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Short-lived signed auth tokens, which authenticate a request without loading its user."""
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from .cache import user_cache
+from .models import password_epoch
+
+#: The user columns a token vouches for, checked against the user cache on every request
+_stamp_columns = ('is_active', 'is_admin', 'password_set_at')
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='dude.auth-token')
+
+
+def issue_token(user):
+    """Return a signed token for `user`, valid for `AUTH_TOKEN_MAX_AGE` seconds."""
+    return _serializer().dumps([user.id, user.is_active, user.is_admin, user.password_epoch])
+
+
+def load_token(token):
+    """Return the `TokenUser` that `token` was issued to, or `None` if it's invalid, expired or revoked.
+
+    The token's flags and password epoch must still match the user's, as
+    held by the user cache, so deactivating a user or changing their
+    password or admin flag voids every token issued before.
+    """
+    try:
+        user_id, is_active, is_admin, epoch = _serializer().loads(
+            token, max_age=current_app.config.get('AUTH_TOKEN_MAX_AGE', 900))
+    except (BadSignature, TypeError, ValueError):
+        return None
+
+    current = user_cache.values(user_id, _stamp_columns)
+    if current is None or not is_active:
+        return None
+    if current[:2] != (is_active, is_admin) or password_epoch(current[2]) != epoch:
+        return None
+    return TokenUser(user_id, is_admin, epoch)
+
+
+def request_token(request):
+    """Return the token in the request's ``Authorization: Bearer`` header, or `None`."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return token.strip()
+
+
+class TokenUser(object):
+    """The user an auth token was issued to, known only by what the token carries.
+
+    Anything else is read from the full `User`, loaded through the user
+    cache the first time it's needed.
+    """
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, is_admin, password_epoch):  # noqa: A002 # as on User
+        """Create the user from a token's claims."""
+        self.id = id
+        self.is_admin = is_admin
+        self.password_epoch = password_epoch
+
+    def get_id(self):
+        """Return the id, as Flask-Login expects."""
+        return str(self.id)
+
+    @property
+    def user(self):
+        """The full `User`."""
+        user = self.__dict__.get('_user')
+        if user is None:
+            user = self.__dict__['_user'] = user_cache.load(self.id)
+        return user
+
+    def __getattr__(self, name):
+        """Read anything the token doesn't carry from the full user."""
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __repr__(self):
+        """Represent instance as a unique string."""
+        return '<TokenUser({0!r})>'.format(self.id)
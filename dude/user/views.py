@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """User views."""
-from flask import Blueprint, render_template
-from flask_login import login_required
+from flask import Blueprint, jsonify, render_template
+from flask_login import current_user, login_required
 
 blueprint = Blueprint('users', __name__, url_prefix='/users', static_folder='../static')
 
@@ -11,3 +11,10 @@ blueprint = Blueprint('users', __name__, url_prefix='/users', static_folder='../
 def members():
     """List members."""
     return render_template('users/members.html')
+
+
+@blueprint.route('/me/')
+@login_required
+def me():
+    """Describe the current user, for JSON clients."""
+    return jsonify(id=current_user.id, is_admin=current_user.is_admin)
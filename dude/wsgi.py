@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""The WSGI entry point for production servers.
+
+Usage: ::
+
+    gunicorn -c python:dude.gunicorn_config dude.wsgi:app
+
+The app is built and warmed up on import, so with ``preload_app`` the
+gunicorn master does it once and every worker starts ready to serve.
+"""
+from dude.app import create_app, warm_up
+
+app = warm_up(create_app())
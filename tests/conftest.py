@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 """Defines fixtures available to all tests."""
+import os
+import shutil
+import tempfile
 
 import pytest
+from sqlalchemy import event
 from webtest import TestApp
 
 from dude.app import create_app
@@ -10,6 +14,40 @@ from dude.database import db as _db
 from .factories import UserFactory
 
 
+def pytest_addoption(parser):
+    """Add the ``--shard`` option."""
+    parser.addoption('--shard', metavar='K/N', default=None,
+                     help='Run only the K-th of N equal slices of the tests (K counts from 1).')
+
+
+def pytest_configure(config):
+    """Give this process a database of its own, unless `TEST_DATABASE_URL` says otherwise.
+
+    SQLite gets a file in a temporary directory; PostgreSQL gets a schema
+    named after the process.
+    """
+    url = os.environ.get('TEST_DATABASE_URL')
+    if url is None:
+        directory = tempfile.mkdtemp(prefix='dude-tests-')
+        config.add_cleanup(lambda: shutil.rmtree(directory, ignore_errors=True))
+        os.environ['TEST_DATABASE_URL'] = 'sqlite:///{0}'.format(os.path.join(directory, 'tests.db'))
+    elif url.startswith('postgres'):
+        os.environ.setdefault('TEST_DATABASE_SCHEMA', 'test_{0}'.format(os.getpid()))
+
+
+def pytest_collection_modifyitems(config, items):
+    """Keep every N-th test, starting at the K-th, when run with ``--shard K/N``."""
+    shard = config.getoption('shard')
+    if not shard:
+        return
+    index, count = (int(part) for part in shard.split('/'))
+    if not 1 <= index <= count:
+        raise pytest.UsageError('--shard must be K/N with 1 <= K <= N, not {0}'.format(shard))
+    selected = items[index - 1::count]
+    config.hook.pytest_deselected(items=[item for item in items if item not in selected])
+    items[:] = selected
+
+
 @pytest.fixture
 def app():
     """An application for the tests."""
@@ -28,18 +66,70 @@ def testapp(app):
     return TestApp(app)
 
 
+@pytest.fixture(scope='session')
+def database():
+    """Create the schema, once per test process."""
+    _app = create_app('tests.settings')
+    schema = _app.config.get('TEST_DATABASE_SCHEMA')
+    with _app.app_context():
+        if schema:
+            _db.engine.execute('CREATE SCHEMA IF NOT EXISTS "{0}"'.format(schema))
+        _db.create_all()
+        _db.engine.dispose()
+
+    yield
+
+    with _app.app_context():
+        if schema:
+            _db.engine.execute('DROP SCHEMA "{0}" CASCADE'.format(schema))
+        else:
+            _db.drop_all()
+        _db.engine.dispose()
+
+
 @pytest.fixture
-def db(app):
-    """A database for the tests."""
+def db(app, database):
+    """A database for the tests; everything a test writes is rolled back afterwards.
+
+    Sessions run inside a transaction that's never committed. Each session
+    works in a savepoint, so the code under test can commit and roll back
+    as usual.
+    """
     _db.app = app
-    with app.app_context():
-        _db.create_all()
+    engine = _db.engine
+    connection = engine.connect()
+    if engine.dialect.name == 'sqlite':
+        # pysqlite's own transaction handling breaks savepoints
+        connection.connection.connection.isolation_level = None
+        transaction = connection.begin()
+        connection.execute('BEGIN')
+    else:
+        transaction = connection.begin()
+
+    def restart_savepoint(session, ended):
+        if ended.nested and not ended._parent.nested:
+            session.expire_all()
+            session.begin_nested()
+
+    def create_session():
+        session = session_factory(bind=connection, binds={})
+        session.begin_nested()
+        event.listen(session, 'after_transaction_end', restart_savepoint)
+        return session
+
+    _db.session.remove()
+    session_factory = _db.session.session_factory
+    _db.session.registry.createfunc = create_session
 
     yield _db
 
-    # Explicitly close DB connection
-    _db.session.close()
-    _db.drop_all()
+    _db.session.remove()
+    _db.session.registry.createfunc = session_factory
+    transaction.rollback()
+    # don't hand the connection back to the pool as it was tampered with
+    connection.invalidate()
+    connection.close()
+    engine.dispose()
 
 
 @pytest.fixture
@@ -23,7 +23,7 @@ class UserFactory(BaseFactory):
     username = Sequence(lambda n: 'user{0}'.format(n))
     email = Sequence(lambda n: 'user{0}@example.com'.format(n))
     password = PostGenerationMethodCall('set_password', 'example')
-    active = True
+    is_active = True
 
     class Meta:
         """Factory configuration."""
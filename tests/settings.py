@@ -1,11 +1,30 @@
 """Settings module for test app."""
+import os
+
 ENV = 'development'
 TESTING = True
-SQLALCHEMY_DATABASE_URI = 'sqlite://'
+# tests/conftest.py gives each test process a database of its own
+SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+TEST_DATABASE_SCHEMA = os.environ.get('TEST_DATABASE_SCHEMA')
+if TEST_DATABASE_SCHEMA:
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'options': '-csearch_path={0}'.format(TEST_DATABASE_SCHEMA)}}
 SECRET_KEY = 'not-so-secret-in-tests'
 BCRYPT_LOG_ROUNDS = 4  # For faster tests; needs at least 4 to avoid "ValueError: Invalid rounds"
 DEBUG_TB_ENABLED = False
+ADMIN_LAZY = True
 CACHE_TYPE = 'simple'  # Can be "memcached", "redis", etc.
+SESSION_TYPE = 'simple'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-WEBPACK_MANIFEST_PATH = 'webpack/manifest.json'
+ASSETS_MANIFEST_PATH = None
 WTF_CSRF_ENABLED = False  # Allows form testing
+PROXY_FIX_X_FOR = 1
+QUERY_LOG_ENABLED = True
+QUERY_BUDGETS = {  # fails any test that goes over
+    'public.home': 2,
+    'public.register': 4,
+    'users.members': 2,
+    'users.me': 1,
+    'public.token': 2,
+    'user.index_view': 3,
+    'role.index_view': 3,
+}
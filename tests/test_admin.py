@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Admin view tests."""
+import re
+
+import pytest
+
+from dude.admin import encode_cursor
+from dude.user.models import Role, User
+
+_username = re.compile(r'<td class="col-username">\s*(\S+)\s*</td>')
+
+
+def usernames(res):
+    """Return the usernames listed on an admin page."""
+    return _username.findall(res.text)
+
+
+@pytest.fixture
+def many_users(db):
+    """25 users, each with a role."""
+    users = [User(username='walter{0:02d}'.format(n), email='walter{0:02d}@example.com'.format(n))
+             for n in range(25)]
+    db.session.add_all(users)
+    db.session.add_all(Role(name='role{0:02d}'.format(n), user=user) for n, user in enumerate(users))
+    db.session.commit()
+    return users
+
+
+class TestUserAdmin:
+    """The keyset-paginated user list."""
+
+    def test_pages(self, many_users, testapp):
+        """Pages follow each other by cursor, newest first."""
+        res = testapp.get('/admin/user/')
+        first = usernames(res)
+        assert first == ['walter{0:02d}'.format(n) for n in range(24, 4, -1)]
+        assert 'Role(role24)' in res
+        assert 'List (25)' in res
+
+        res = res.click('Next')
+        assert usernames(res) == ['walter{0:02d}'.format(n) for n in range(4, -1, -1)]
+        assert 'Next &rsaquo;</a></li>' in res and 'class="disabled"><a href="javascript:void(0)">Next' in res
+
+        res = res.click('Previous')
+        assert usernames(res) == first
+
+    def test_created_at(self, many_users, testapp):
+        """Sorting by creation time pages by (created_at, id)."""
+        res = testapp.get('/admin/user/', {'sort': 8, 'page_size': 10})
+        assert usernames(res) == ['walter{0:02d}'.format(n) for n in range(10)]
+        res = res.click('Next')
+        assert usernames(res) == ['walter{0:02d}'.format(n) for n in range(10, 20)]
+
+    def test_malformed_cursor(self, many_users, testapp):
+        """A cursor that was tampered with shows the first page."""
+        first = usernames(testapp.get('/admin/user/'))
+        for cursor in ('%%%', encode_cursor([{'id': 1}]), encode_cursor(['1']), encode_cursor([True]),
+                       encode_cursor([1, 2])):
+            assert usernames(testapp.get('/admin/user/', {'after': cursor})) == first
+        res = testapp.get('/admin/user/', {'sort': 8, 'page_size': 10, 'before': encode_cursor([1, 'x'])})
+        assert usernames(res) == ['walter{0:02d}'.format(n) for n in range(10)]
+
+    def test_search(self, many_users, testapp):
+        """Search matches the start of the username or email, ignoring case."""
+        res = testapp.get('/admin/user/', {'search': 'WALTER1'})
+        assert usernames(res) == ['walter{0:02d}'.format(n) for n in range(19, 9, -1)]
+        assert usernames(testapp.get('/admin/user/', {'search': 'alter'})) == []
+
+    def test_offset_fallback(self, many_users, testapp):
+        """Sorts without a keyset page by offset."""
+        res = testapp.get('/admin/user/', {'sort': 1, 'page': 1})
+        assert usernames(res) == ['walter{0:02d}'.format(n) for n in range(20, 25)]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Static asset tests."""
+import gzip
+
+from dude.app import static_path
+from dude.assets import build_assets, load_manifest
+
+
+class TestAssets:
+    """Fingerprinted static assets."""
+
+    def test_unbuilt(self, app):
+        """Without a manifest files are served from `/static` as they are."""
+        assert static_path('css/style.css') == '/static/css/style.css'
+
+    def test_build(self, app, testapp, tmpdir):
+        """Built files are linked by fingerprint and served precompressed and immutable."""
+        static = tmpdir.mkdir('static')
+        static.mkdir('css').join('style.css').write('body { padding-top: 60px; }\n' * 20)
+        manifest_path = str(tmpdir.join('manifest.json'))
+        manifest = build_assets(str(static), manifest_path)
+        target = manifest['assets']['css/style.css']
+        assert target.startswith('css/style.') and target.endswith('.css')
+        assert static.join('dist', target + '.gz').check()
+
+        app.static_folder = str(static)
+        app.extensions['assets'] = load_manifest(manifest_path)
+        url = '/static/dist/' + target
+        assert static_path('css/style.css') == url
+        assert url in testapp.get('/about/')
+
+        # WebTest decodes responses itself, so use the raw test client
+        client = app.test_client()
+        res = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert res.headers['Content-Encoding'] == 'gzip'
+        assert res.headers['Content-Type'].startswith('text/css')
+        assert 'immutable' in res.headers['Cache-Control']
+        assert gzip.decompress(res.data).startswith(b'body')
+
+        res = client.get(url, headers={'Accept-Encoding': 'identity'})
+        assert 'Content-Encoding' not in res.headers
+        assert res.data.startswith(b'body')
+
+        # An encoding with q=0 is one the client refuses
+        res = client.get(url, headers={'Accept-Encoding': 'gzip;q=0, identity'})
+        assert 'Content-Encoding' not in res.headers
+        assert res.data.startswith(b'body')
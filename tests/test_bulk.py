@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Bulk user import and export tests."""
+import datetime as dt
+import json
+
+from dude.commands import users
+from dude.hashing import hash_log_rounds
+from dude.user.models import User
+
+
+class TestImportExport:
+    """The `flask users import` and `flask users export` commands."""
+
+    def test_import_csv(self, db, app, tmpdir):
+        """Users are imported from CSV with their passwords hashed."""
+        source = tmpdir.join('users.csv')
+        source.write('username,email,password,is_admin\n'
+                     'walter,walter@example.com,shomer,\n'
+                     'donny,donny@example.com,bowling,true\n'
+                     'maude,maude@example.com,,\n')
+        result = app.test_cli_runner().invoke(
+            users, ['import', str(source), '--batch-size', '2', '--hash-workers', '2'])
+        assert result.exit_code == 0, result.output
+        assert 'Imported 3 users' in result.output
+
+        walter = User.query.filter_by(username='walter').one()
+        assert walter.check_password('shomer')
+        assert walter.is_active is True
+        assert walter.password_set_at is not None
+        assert User.query.filter_by(username='donny').one().is_admin is True
+        assert User.query.filter_by(username='maude').one().password is None
+
+    def test_roundtrip_jsonl(self, db, app, tmpdir):
+        """Exported users import again with their password hashes and dates intact."""
+        exported = User.create(username='foo', email='foo@bar.com', password='foobarbaz123', first_name='Foo')
+        exported.update(created_at=dt.datetime(2019, 1, 2, 3, 4, 5), password_set_at=dt.datetime(2019, 6, 7, 8, 9, 10, 11))
+        dates = (exported.created_at, exported.modified_at, exported.password_set_at)
+        destination = tmpdir.join('users.jsonl')
+        runner = app.test_cli_runner()
+        result = runner.invoke(users, ['export', str(destination)])
+        assert result.exit_code == 0, result.output
+
+        records = [json.loads(line) for line in destination.readlines()]
+        assert len(records) == 1
+        assert hash_log_rounds(records[0]['password_hash']) == 4
+
+        User.query.delete()
+        db.session.commit()
+        result = runner.invoke(users, ['import', str(destination), '--hash-workers', '1'])
+        assert result.exit_code == 0, result.output
+        user = User.query.one()
+        assert user.first_name == 'Foo'
+        assert (user.created_at, user.modified_at, user.password_set_at) == dates
+        assert user.check_password('foobarbaz123')
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Database engine configuration tests."""
+import sqlite3
+import threading
+
+import pytest
+
+from dude.engine import FailoverConnector, engine_options, normalize_url
+
+
+class FakeClock(object):
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        """Start at zero."""
+        self.now = 0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+def test_normalize_url():
+    """Platform.sh schemes are translated to SQLAlchemy dialects."""
+    assert normalize_url('pgsql://main:main@db:5432/main') == 'postgresql://main:main@db:5432/main'
+    assert normalize_url('sqlite://') == 'sqlite://'
+
+
+class TestEngineOptions:
+    """Engine options derived from configuration."""
+
+    def test_sqlite_has_no_pool_options(self):
+        """SQLite doesn't get a sized pool."""
+        assert engine_options(['sqlite://']) == {}
+
+    def test_postgres_pool_options(self):
+        """Pool sizing and timeouts are passed through."""
+        options = engine_options(['pgsql://main:main@db:5432/main'], pool_size=3, max_overflow=1,
+                                 statement_timeout=5000, connect_timeout=2)
+        assert options['pool_size'] == 3
+        assert options['max_overflow'] == 1
+        assert options['pool_pre_ping'] is True
+        assert options['connect_args'] == {'options': '-c statement_timeout=5000', 'connect_timeout': 2}
+        assert 'creator' not in options
+
+    def test_multiple_endpoints_use_failover(self):
+        """Several endpoints are wrapped in a failover connector."""
+        options = engine_options(['pgsql://db1/main', 'pgsql://db2/main'], statement_timeout=5000)
+        assert isinstance(options['creator'], FailoverConnector)
+        assert options['creator'].urls == ['postgresql://db1/main', 'postgresql://db2/main']
+        assert options['creator'].connect_args == {'options': '-c statement_timeout=5000'}
+
+
+class TestFailoverConnector:
+    """Connection failover between endpoints."""
+
+    def test_fails_over_and_recovers(self, tmpdir):
+        """A failing endpoint is skipped until its cooldown elapses."""
+        good = 'sqlite:///{}'.format(tmpdir.join('good.db'))
+        bad = 'sqlite:///{}'.format(tmpdir.join('missing', 'bad.db'))
+        clock = FakeClock()
+        connector = FailoverConnector([bad, good], cooldown=10, clock=clock)
+
+        assert isinstance(connector(), sqlite3.Connection)
+        assert connector.candidates() == [1, 0]
+
+        clock.now = 11
+        assert connector.candidates() == [0, 1]
+
+    def test_raises_when_all_endpoints_fail(self, tmpdir):
+        """The last error is raised when no endpoint accepts a connection."""
+        bad = 'sqlite:///{}'.format(tmpdir.join('missing', 'bad.db'))
+        connector = FailoverConnector([bad, bad])
+        with pytest.raises(sqlite3.OperationalError):
+            connector()
+
+    def test_concurrent_connects(self, tmpdir):
+        """Threads connecting at once all fail over to the healthy endpoint."""
+        good = 'sqlite:///{}'.format(tmpdir.join('good.db'))
+        bad = 'sqlite:///{}'.format(tmpdir.join('missing', 'bad.db'))
+        connector = FailoverConnector([bad, good], cooldown=60)
+        connections = []
+
+        def connect():
+            connections.append(connector())
+
+        threads = [threading.Thread(target=connect) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(connections) == 8
+        assert all(isinstance(connection, sqlite3.Connection) for connection in connections)
+        assert connector.candidates() == [1, 0]
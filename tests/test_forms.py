@@ -23,6 +23,15 @@ class TestRegisterForm:
         assert form.validate() is False
         assert 'Email already registered' in form.email.errors
 
+    def test_validate_registered_ignoring_case(self, user):
+        """Usernames and emails are compared ignoring case, and both errors are shown."""
+        form = RegisterForm(username=user.username.upper(), email=user.email.upper(),
+                            password='example', confirm='example')
+
+        assert form.validate() is False
+        assert 'Username already registered' in form.username.errors
+        assert 'Email already registered' in form.email.errors
+
     def test_validate_success(self, db):
         """Register with success."""
         form = RegisterForm(username='newusername', email='new@test.test',
@@ -41,6 +50,14 @@ class TestLoginForm:
         assert form.validate() is True
         assert form.user == user
 
+    def test_validate_username_ignores_case(self, user):
+        """Log in with the username in a different case."""
+        user.set_password('example')
+        user.save()
+        form = LoginForm(username=user.username.upper(), password='example')
+        assert form.validate() is True
+        assert form.user == user
+
     def test_validate_unknown_username(self, db):
         """Unknown username."""
         form = LoginForm(username='unknown', password='example')
@@ -58,7 +75,7 @@ class TestLoginForm:
 
     def test_validate_inactive_user(self, user):
         """Inactive user."""
-        user.active = False
+        user.is_active = False
         user.set_password('example')
         user.save()
         # Correct username and password, but user is not activated
@@ -104,7 +104,7 @@ class TestRegistering:
 
     def test_sees_error_message_if_user_already_registered(self, user, testapp):
         """Show error if user already registered."""
-        user = UserFactory(active=True)  # A registered user
+        user = UserFactory(is_active=True)  # A registered user
         user.save()
         # Goes to registration page
         res = testapp.get(url_for('public.register'))
@@ -118,3 +118,23 @@ class TestRegistering:
         res = form.submit()
         # sees error
         assert 'Username already registered' in res
+
+    def test_sees_error_message_if_registered_meanwhile(self, user, testapp, monkeypatch):
+        """Show error if the username is taken between validating and saving."""
+        res = testapp.get(url_for('public.register'))
+        form = res.forms['registerForm']
+        form['username'] = user.username
+        form['email'] = 'foo@bar.com'
+        form['password'] = 'secret'
+        form['confirm'] = 'secret'
+        registered = User.registered
+        answers = [(False, False)]
+
+        def registered_once(username, email):
+            # the check before saving misses the user; the unique index catches it
+            return answers.pop() if answers else registered(username, email)
+
+        monkeypatch.setattr(User, 'registered', registered_once)
+        res = form.submit()
+        assert 'Username already registered' in res
+        assert User.query.count() == 1
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Password hashing pool tests."""
+import json
+import threading
+
+import pytest
+
+from dude import hashing
+from dude.commands import hashing as hashing_commands
+from dude.commands import users
+from dude.extensions import bcrypt, hasher
+from dude.hashing import HashingQueueFull, calibrate_log_rounds, hash_log_rounds
+from dude.user.models import User
+
+
+class TestHasher:
+    """Bounded hashing pool."""
+
+    def test_runs_on_worker(self, app):
+        """Functions run on a pool thread and return their result."""
+        assert hasher.run(threading.current_thread) is not threading.current_thread()
+
+    def test_inline(self, app):
+        """The inline executor runs in the calling thread."""
+        app.config['HASHING_EXECUTOR'] = 'inline'
+        hasher.init_app(app)
+        assert hasher.run(threading.current_thread) is threading.current_thread()
+
+    def test_rejects_when_full(self, app):
+        """Work beyond the workers and queue depth is rejected immediately."""
+        app.config.update(HASHING_WORKERS=1, HASHING_QUEUE_DEPTH=0)
+        hasher.init_app(app)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=app.extensions['hasher'].run, args=(block, ))
+        thread.start()
+        started.wait(5)
+        try:
+            with pytest.raises(HashingQueueFull) as excinfo:
+                hasher.run(len, 'x')
+            assert hasher.rejected == 1
+            assert ('Retry-After', '1') in excinfo.value.get_headers()
+        finally:
+            release.set()
+            thread.join()
+        assert hasher.run(len, 'x') == 1
+
+    def test_login_returns_503_when_full(self, user, testapp, app):
+        """A login that cannot be hashed fails fast with a 503."""
+        app.config.update(HASHING_WORKERS=0, HASHING_QUEUE_DEPTH=0)
+        hasher.init_app(app)
+        res = testapp.get('/')
+        form = res.forms['loginForm']
+        form['username'] = user.username
+        form['password'] = 'myprecious'
+        res = form.submit(status=503)
+        assert res.headers['Retry-After'] == '1'
+
+
+class TestCost:
+    """Bcrypt cost calibration and rehashing."""
+
+    def test_hash_log_rounds(self, app):
+        """The cost is read from the hash."""
+        assert hash_log_rounds(bcrypt.generate_password_hash('x', 5)) == 5
+        assert hash_log_rounds(None) is None
+        assert hash_log_rounds(b'not a hash') is None
+
+    def test_calibrate_is_clamped(self):
+        """Calibration stays within the configured bounds."""
+        assert calibrate_log_rounds(1e-9, minimum=6) == 6
+        assert calibrate_log_rounds(1e9, maximum=12) == 12
+
+    def test_rehash_on_login(self, db, app):
+        """A successful check replaces a hash with a different cost."""
+        user = User.create(username='foo', email='foo@bar.com', password='foobarbaz123')
+        set_at = user.password_set_at
+        app.config['BCRYPT_LOG_ROUNDS'] = 5
+        assert user.check_password('foobarbaz123') is True
+        assert hash_log_rounds(user.password) == 5
+        assert user.password_set_at == set_at
+        assert user.check_password('foobarbaz123') is True
+
+    def test_no_rehash_to_lower_cost(self, db, app):
+        """A hash stronger than configured is kept."""
+        app.config['BCRYPT_LOG_ROUNDS'] = 5
+        user = User.create(username='foo', email='foo@bar.com', password='foobarbaz123')
+        app.config['BCRYPT_LOG_ROUNDS'] = 4
+        assert user.password_needs_rehash() is False
+        assert user.check_password('foobarbaz123') is True
+        assert hash_log_rounds(user.password) == 5
+
+    def test_calibration_is_saved(self, app, tmpdir, monkeypatch):
+        """`flask hashing calibrate` times bcrypt once; starting the app only reads the result."""
+        path = str(tmpdir.join('calibration.json'))
+        app.config.update(BCRYPT_TARGET_MS=1, BCRYPT_MIN_LOG_ROUNDS=4, BCRYPT_CALIBRATION_PATH=path)
+        result = app.test_cli_runner().invoke(hashing_commands, ['calibrate'])
+        assert result.exit_code == 0, result.output
+        with open(path) as f:
+            saved = json.load(f)
+        assert saved['target_ms'] == 1
+
+        def never(*args, **kwargs):
+            raise AssertionError('calibrated at startup')
+
+        monkeypatch.setattr(hashing, 'calibrate_log_rounds', never)
+        app.config['BCRYPT_LOG_ROUNDS'] = 13
+        hasher.init_app(app)
+        assert app.config['BCRYPT_LOG_ROUNDS'] == saved['log_rounds']
+
+    def test_uncalibrated_target(self, app, tmpdir):
+        """Without a calibration for the target, starting the app calibrates and saves one."""
+        path = tmpdir.join('calibration.json')
+        app.config.update(BCRYPT_TARGET_MS=1, BCRYPT_MIN_LOG_ROUNDS=4, BCRYPT_CALIBRATION_PATH=str(path))
+        app.config['BCRYPT_LOG_ROUNDS'] = 13
+        hasher.init_app(app)
+        assert app.config['BCRYPT_LOG_ROUNDS'] == json.loads(path.read())['log_rounds'] < 13
+
+    def test_calibrate_without_target(self, app):
+        """`flask hashing calibrate` does nothing, successfully, when no target is set."""
+        result = app.test_cli_runner().invoke(hashing_commands, ['calibrate'])
+        assert result.exit_code == 0, result.output
+        assert 'BCRYPT_TARGET_MS is not set' in result.output
+
+    def test_no_rehash_on_failure(self, db, app):
+        """A failed check leaves the hash alone."""
+        user = User.create(username='foo', email='foo@bar.com', password='foobarbaz123')
+        app.config['BCRYPT_LOG_ROUNDS'] = 5
+        assert user.check_password('wrong') is False
+        assert hash_log_rounds(user.password) == 4
+
+    def test_rehash_report(self, db, app):
+        """The report counts users per cost."""
+        User.create(username='foo', email='foo@bar.com', password='foobarbaz123')
+        User.create(username='bar', email='bar@bar.com')
+        result = app.test_cli_runner().invoke(users, ['rehash-report'])
+        assert result.exit_code == 0, result.output
+        lines = result.output.splitlines()
+        assert any(line.split()[:3] == ['4', '1', '50.0%'] for line in lines)
+        assert any(line.split()[:2] == ['none', '1'] for line in lines)
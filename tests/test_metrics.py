@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Metrics tests."""
+import json
+import threading
+
+import pytest
+
+from dude.app import create_app
+from dude.database import db
+from dude.metrics import Registry, registry
+
+from .test_timing import TimingSettings
+
+
+class MetricsSettings(TimingSettings):
+    """Test settings with metrics on."""
+
+    SERVER_TIMING_ENABLED = False
+    METRICS_ENABLED = True
+    METRICS_TOKEN = 'scrape'
+
+
+#: What Prometheus sends with ``authorization: {credentials: scrape}``
+SCRAPE = {'Authorization': 'Bearer scrape'}
+
+
+@pytest.fixture
+def metrics_app():
+    """An application with metrics enabled and nothing recorded yet."""
+    registry.reset()
+    app = create_app(MetricsSettings)
+    yield app
+    registry.enabled = False
+    registry.reset()
+
+
+class TestRegistry:
+    """Lock-free metric collection."""
+
+    def test_threads(self):
+        """Values recorded on many threads add up."""
+        reg = Registry()
+        reg.enabled = True
+        counter = reg.counter('hits_total', 'Hits.', ('kind',))
+
+        def record():
+            for _ in range(1000):
+                counter.inc(kind='a')
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert reg.snapshot() == {('hits_total', ('a',)): 8000}
+
+    def test_histogram(self):
+        """Histogram buckets are cumulative."""
+        reg = Registry()
+        reg.enabled = True
+        histogram = reg.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value)
+        text = reg.render(reg.snapshot())
+        assert 'latency_seconds_bucket{le="0.1"} 2.0' in text
+        assert 'latency_seconds_bucket{le="1.0"} 3.0' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4.0' in text
+        assert 'latency_seconds_count 4.0' in text
+        assert 'latency_seconds_sum 5.65' in text
+
+    def test_processes(self, tmpdir):
+        """Collecting merges the values every process wrote to the directory."""
+        reg = Registry()
+        reg.enabled = True
+        counter = reg.counter('hits_total', 'Hits.')
+        counter.inc(2)
+        tmpdir.join('1.json').write(json.dumps([['hits_total', [], 3], ['gone_total', [], 1]]))
+        assert reg.collect(str(tmpdir)) == {('hits_total', ()): 5}
+
+    def test_disabled(self):
+        """Nothing is recorded until the registry is enabled."""
+        reg = Registry()
+        reg.counter('hits_total', 'Hits.').inc()
+        reg.histogram('latency_seconds', 'Latency.').observe(1)
+        assert reg.snapshot() == {}
+
+
+class TestMetricsEndpoint:
+    """The `/metrics` endpoint."""
+
+    def test_disabled(self, testapp):
+        """There is no endpoint unless metrics are enabled."""
+        testapp.get('/metrics', status=404)
+        assert registry.enabled is False
+
+    def test_token_required(self, metrics_app):
+        """Scrapes without the token are refused."""
+        client = metrics_app.test_client()
+        assert client.get('/metrics').status_code == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        assert client.get('/metrics', headers=SCRAPE).status_code == 200
+
+    def test_no_token(self):
+        """Without a configured token there is no endpoint."""
+        class Settings(MetricsSettings):
+            METRICS_TOKEN = None
+
+        try:
+            assert create_app(Settings).test_client().get('/metrics').status_code == 404
+        finally:
+            registry.enabled = False
+
+    def test_requests(self, metrics_app):
+        """Requests, cache lookups and logins are exported."""
+        client = metrics_app.test_client()
+        client.get('/about/')
+        client.get('/about/')
+        with metrics_app.app_context():
+            db.create_all()
+            client.post('/', data={'username': 'nobody', 'password': 'nothing'})
+
+        res = client.get('/metrics', headers=SCRAPE)
+        assert res.content_type.startswith('text/plain; version=0.0.4')
+        text = res.get_data(as_text=True)
+        assert 'dude_requests_total{endpoint="public.about",method="GET",status="200"} 2.0' in text
+        assert 'dude_request_duration_seconds_count{endpoint="public.about"} 2.0' in text
+        assert 'dude_cache_requests_total{result="hit"}' in text
+        assert 'dude_logins_total{result="unknown_user"} 1.0' in text
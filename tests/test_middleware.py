@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Middleware tests."""
+import asyncio
+import threading
+
+from uvicorn.middleware.wsgi import WSGIMiddleware
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from dude.middleware import ClacksOverhead, HeaderMiddleware
+
+
+def make_app(headers=()):
+    """Return a WSGI app that responds with `headers`, naming the path in the body."""
+    def app(environ, start_response):
+        return Response(environ['PATH_INFO'], headers=list(headers))(environ, start_response)
+    return app
+
+
+class TestHeaderMiddleware:
+    """Header injection."""
+
+    def test_clacks(self):
+        """The default header is still added."""
+        res = Client(ClacksOverhead(make_app()), Response).get('/')
+        assert res.headers['X-Clacks-Overhead'] == 'GNU'
+
+    def test_paths(self):
+        """The longest matching prefix adds its headers to the global ones."""
+        wrapped = HeaderMiddleware(make_app(), [('X-Global', '1')], {
+            '/a/': [('Cache-Control', 'no-store')],
+            '/a/b/': [('Cache-Control', 'public')],
+        })
+        client = Client(wrapped, Response)
+        assert 'Cache-Control' not in client.get('/').headers
+        assert client.get('/a/').headers['Cache-Control'] == 'no-store'
+        res = client.get('/a/b/c')
+        assert res.headers['Cache-Control'] == 'public'
+        assert res.headers['X-Global'] == '1'
+
+    def test_app_headers_win(self):
+        """Headers the application set are not duplicated or overridden."""
+        wrapped = HeaderMiddleware(make_app([('cache-control', 'private')]), [('Cache-Control', 'no-store')])
+        res = Client(wrapped, Response).get('/')
+        assert res.headers.getlist('Cache-Control') == ['private']
+
+    def test_concurrent(self):
+        """Concurrent requests each get their own response headers."""
+        barrier = threading.Barrier(8)
+
+        def app(environ, start_response):
+            barrier.wait()
+            return make_app([('X-Path', environ['PATH_INFO'])])(environ, start_response)
+
+        wrapped = ClacksOverhead(app)
+        results = {}
+
+        def request(n):
+            res = Client(wrapped, Response).get('/{0}'.format(n))
+            results[n] = (res.headers['X-Path'], res.headers.getlist('X-Clacks-Overhead'))
+
+        threads = [threading.Thread(target=request, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == {n: ('/{0}'.format(n), ['GNU']) for n in range(8)}
+
+
+def call_asgi(adapter, scope, messages):
+    """Run `adapter` for `scope`, feeding it `messages`, and return what it sent."""
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(adapter(scope, receive, send))
+    finally:
+        loop.close()
+    return sent
+
+
+def http_scope(method='GET', path='/', query_string=b'', headers=()):
+    """Return an http connection scope."""
+    return {'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http', 'path': path,
+            'root_path': '', 'query_string': query_string, 'headers': list(headers),
+            'server': ('testserver', 8000), 'client': ('127.0.0.1', 1234)}
+
+
+class TestASGI:
+    """Serving the app over ASGI, as `dude.asgi` does."""
+
+    def test_flask(self, app):
+        """A page of the app is served through uvicorn's `WSGIMiddleware`."""
+        sent = call_asgi(WSGIMiddleware(app, workers=1), http_scope(path='/about/'), [{'type': 'http.request'}])
+        assert sent[0]['status'] == 200
+        assert (b'x-clacks-overhead', b'GNU') in [(name.lower(), value) for name, value in sent[0]['headers']]
+        assert b'</html>' in b''.join(message.get('body', b'') for message in sent)
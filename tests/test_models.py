@@ -3,7 +3,9 @@
 import datetime as dt
 
 import pytest
+from sqlalchemy.exc import IntegrityError
 
+from dude.database import db
 from dude.user.models import Role, User
 
 from .factories import UserFactory
@@ -42,7 +44,7 @@ class TestUser:
         assert bool(user.email)
         assert bool(user.created_at)
         assert user.is_admin is False
-        assert user.active is True
+        assert user.is_active is True
         assert user.check_password('myprecious')
 
     def test_check_password(self):
@@ -65,3 +67,30 @@ class TestUser:
         user.roles.append(role)
         user.save()
         assert role in user.roles
+
+    def test_lookups_ignore_case(self):
+        """Usernames and emails are found whatever their case."""
+        user = User.create(username='Walter', email='Walter@Example.com')
+        assert User.get_by_username('wALTER') == user
+        assert User.get_by_email('walter@example.COM') == user
+        assert User.get_by_username('walt') is None
+
+    def test_registered(self):
+        """One query tells which of a username and email are taken."""
+        User.create(username='walter', email='walter@example.com')
+        User.create(username='donny', email='donny@example.com')
+        assert User.registered('WALTER', 'DONNY@example.com') == (True, True)
+        assert User.registered('Walter', 'new@example.com') == (True, False)
+        assert User.registered('new', 'walter@EXAMPLE.com') == (False, True)
+        assert User.registered('new', 'new@example.com') == (False, False)
+
+    @pytest.mark.parametrize('other', [
+        {'username': 'WALTER', 'email': 'other@example.com'},
+        {'username': 'other', 'email': 'WALTER@example.com'},
+    ])
+    def test_unique_ignoring_case(self, other):
+        """The database rejects a username or email that differs only in case."""
+        User.create(username='walter', email='walter@example.com')
+        with pytest.raises(IntegrityError):
+            User.create(**other)
+        db.session.rollback()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Page cache tests."""
+from flask import render_template_string, url_for
+
+from dude.pagecache import CSRF_PLACEHOLDER
+
+
+class TestPageCache:
+    """Whole-page caching of public pages."""
+
+    def test_anonymous_hit(self, testapp):
+        """A second anonymous request is served from the cache."""
+        res = testapp.get('/about/')
+        assert res.headers['X-Page-Cache'] == 'miss'
+        res = testapp.get('/about/')
+        assert res.headers['X-Page-Cache'] == 'hit'
+        assert 'Cookie' in res.headers['Vary']
+
+    def test_csrf_token_filled_in(self, app, testapp):
+        """The token placeholder is replaced with the visitor's own token."""
+        app.config['WTF_CSRF_ENABLED'] = True
+        testapp.get('/')
+        res = testapp.get('/')
+        assert res.headers['X-Page-Cache'] == 'hit'
+        assert CSRF_PLACEHOLDER not in res
+        assert res.forms['loginForm']['csrf_token'].value
+
+    def test_not_modified(self, testapp):
+        """A revalidation with the served ETag gets a 304."""
+        testapp.get('/about/')
+        res = testapp.get('/about/')
+        res = testapp.get('/about/', headers={'If-None-Match': res.headers['ETag']}, status=304)
+        assert res.headers['X-Page-Cache'] == 'hit'
+
+    def test_bypass_logged_in(self, user, testapp):
+        """Logged in visitors never see a cached page."""
+        res = testapp.get('/')
+        form = res.forms['loginForm']
+        form['username'] = user.username
+        form['password'] = 'myprecious'
+        form.submit().follow()
+        res = testapp.get('/about/')
+        assert 'X-Page-Cache' not in res.headers
+        assert 'Logged in as {}'.format(user.username) in res
+
+    def test_login_from_cached_page(self, user, app, testapp):
+        """A login form taken from a cached page can still be submitted."""
+        app.config['WTF_CSRF_ENABLED'] = True
+        testapp.get('/')
+        res = testapp.get('/')
+        assert res.headers['X-Page-Cache'] == 'hit'
+        form = res.forms['loginForm']
+        form['username'] = user.username
+        form['password'] = 'myprecious'
+        res = form.submit().follow()
+        assert url_for('public.logout') in res
+
+
+class TestFragmentCache:
+    """Template fragments cached with ``{% cache %}``."""
+
+    def test_served_from_cache(self, app):
+        """A cached fragment is rendered once and then read from the cache."""
+        calls = []
+
+        def expensive():
+            calls.append(1)
+            return 'rendered {0}'.format(len(calls))
+
+        source = "{% cache 60, 'fragment' %}{{ expensive() }}{% endcache %}"
+        assert render_template_string(source, expensive=expensive) == 'rendered 1'
+        assert render_template_string(source, expensive=expensive) == 'rendered 1'
+        assert len(calls) == 1
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Query log tests."""
+import json
+import logging
+
+import pytest
+
+from dude.queries import QueryBudgetExceeded, count_queries, query_budget, statement_shape
+from dude.user.models import Role, User
+
+from .factories import UserFactory
+
+
+def logged(caplog, event):
+    """Return the records logged to `dude.queries` for `event`."""
+    records = (json.loads(r.getMessage()) for r in caplog.records if r.name == 'dude.queries')
+    return [record for record in records if record.get('event') == event]
+
+
+class TestQueryLog:
+    """Slow and repeated query detection."""
+
+    def test_shape(self):
+        """Literals and expanded IN lists don't make statements different."""
+        assert statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?) AND name = 'x'") == \
+            statement_shape('SELECT * FROM t WHERE id IN (?, ?) AND name = 5')
+
+    def test_repeated(self, app, db, testapp, caplog):
+        """A statement run once per row is logged with the view that ran it."""
+        app.config['N_PLUS_ONE_THRESHOLD'] = 3
+        users = UserFactory.create_batch(3)
+        db.session.commit()
+        for n, user in enumerate(users):
+            Role.create(name='role{0}'.format(n), user=user)
+        db.session.expire_all()
+
+        @app.route('/roles-n-plus-one')
+        def roles():
+            return ','.join(role.user.username for role in Role.query.all())
+
+        with caplog.at_level(logging.WARNING, logger='dude.queries'):
+            testapp.get('/roles-n-plus-one')
+        [record] = logged(caplog, 'repeated_query')
+        assert record['count'] == 3
+        assert record['endpoint'] == 'roles'
+        assert record['view'].startswith('tests.test_queries.') and record['view'].endswith('.roles')
+
+    def test_slow(self, app, db, testapp, caplog):
+        """Queries over the threshold are logged."""
+        app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        with caplog.at_level(logging.WARNING, logger='dude.queries'):
+            testapp.post('/', {'username': 'nobody', 'password': 'x'})
+        [record] = logged(caplog, 'slow_query')
+        assert record['endpoint'] == 'public.home'
+        assert record['statement'].startswith('SELECT')
+
+
+class TestQueryBudget:
+    """Query budgets."""
+
+    def test_block(self, db):
+        """`query_budget` fails a block that runs too many queries."""
+        with query_budget(1):
+            User.query.all()
+        with pytest.raises(QueryBudgetExceeded):
+            with query_budget(1):
+                User.query.all()
+                Role.query.all()
+
+    def test_endpoint(self, app, user, testapp):
+        """An endpoint over its budget fails the test."""
+        app.config['QUERY_BUDGETS'] = {'public.home': 0}
+        with count_queries() as queries:
+            with pytest.raises(QueryBudgetExceeded):
+                testapp.post('/', {'username': user.username, 'password': 'myprecious'})
+        assert queries.count >= 1
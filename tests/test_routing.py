@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Read-replica routing tests."""
+import pytest
+
+from dude.app import create_app
+from dude.database import db
+from dude.user.cache import user_cache
+from dude.user.models import User
+
+
+@pytest.fixture
+def routed_app(tmpdir):
+    """An application with a primary and a replica database that are not in sync."""
+    class Settings(object):
+        TESTING = True
+        SECRET_KEY = 'not-so-secret-in-tests'
+        BCRYPT_LOG_ROUNDS = 4
+        CACHE_TYPE = 'simple'
+        DEBUG_TB_ENABLED = False
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///{}'.format(tmpdir.join('primary.db'))
+        SQLALCHEMY_REPLICA_URIS = ['sqlite:///{}'.format(tmpdir.join('replica.db'))]
+
+    app = create_app(Settings)
+    with app.app_context():
+        db.create_all()
+        db.Model.metadata.create_all(bind=db.get_engine(app, bind='replica0'))
+        User('primary', 'primary@example.com').save()
+        db.session.remove()
+
+        yield app
+
+        db.session.remove()
+
+
+class TestRoutingSession:
+    """Routing of statements between primary and replica."""
+
+    def test_reads_go_to_replica(self, routed_app):
+        """A fresh session reads from the replica."""
+        assert User.query.filter_by(username='primary').first() is None
+
+    def test_reads_after_write_go_to_primary(self, routed_app):
+        """Once the session has written, reads stay on the primary."""
+        User('other', 'other@example.com').save()
+        assert User.query.filter_by(username='primary').first() is not None
+
+    def test_use_primary(self, routed_app):
+        """Reads can be forced to the primary."""
+        db.use_primary()
+        assert User.query.filter_by(username='primary').first() is not None
+
+    def test_using_primary(self, routed_app):
+        """Reads inside a `using_primary` block go to the primary, and later ones to the replica again."""
+        with db.using_primary():
+            assert User.query.filter_by(username='primary').first() is not None
+        assert User.query.filter_by(username='primary').first() is None
+
+    def test_user_cache_misses_read_primary(self, routed_app):
+        """The user cache never fills from a replica that may be behind."""
+        user = user_cache.load(1)
+        assert user is not None and user.username == 'primary'
+        db.session.remove()
+        assert user_cache.load(1).username == 'primary'
+        assert User.query.filter_by(username='primary').first() is None
+
+    def test_without_replicas(self, db):
+        """Without replicas everything goes to the primary."""
+        assert db.get_replica_binds() == []
+        User('foo', 'foo@example.com').save()
+        db.session.remove()
+        assert User.query.filter_by(username='foo').first() is not None
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Server-side session tests."""
+import pytest
+from markupsafe import Markup
+
+from dude.sessions import RedisSessionStore, ServerSideSessionInterface, SimpleSessionStore, dumps, loads
+
+
+def log_in(testapp, user):
+    """Log `user` in through the login form."""
+    form = testapp.get('/').forms['loginForm']
+    form['username'] = user.username
+    form['password'] = 'myprecious'
+    form.submit().follow()
+
+
+class RecordingStore(SimpleSessionStore):
+    """A store that remembers which of its methods were called."""
+
+    def __init__(self):
+        """Start with no calls."""
+        super(RecordingStore, self).__init__()
+        self.calls = []
+
+    def load(self, sid):
+        """Record the load."""
+        self.calls.append('load')
+        return super(RecordingStore, self).load(sid)
+
+    def save(self, sid, payload, ttl, replaces=None):
+        """Record the save."""
+        self.calls.append('save')
+        return super(RecordingStore, self).save(sid, payload, ttl, replaces)
+
+    def touch(self, sid, ttl):
+        """Record the touch."""
+        self.calls.append('touch')
+        return super(RecordingStore, self).touch(sid, ttl)
+
+
+@pytest.fixture
+def store(app):
+    """Keep the app's sessions in a `RecordingStore`."""
+    store = RecordingStore()
+    app.session_interface = ServerSideSessionInterface(store, refresh_interval=300)
+    return store
+
+
+class TestSerialization:
+    """The stored session format."""
+
+    def test_round_trip(self):
+        """Flashed messages keep their tuples."""
+        data = {'_user_id': '1', '_fresh': True, '_flashes': [('warning', 'Username - Unknown username')]}
+        payload = dumps(data)
+        assert payload[:1] == b'm'
+        assert loads(payload) == data
+
+    def test_markup(self):
+        """Values marshal can't write fall back to tagged JSON."""
+        payload = dumps({'_flashes': [('info', Markup('<b>Hi</b>'))]})
+        assert payload[:1] == b'j'
+        assert loads(payload)['_flashes'][0][1] == Markup('<b>Hi</b>')
+
+    def test_unreadable(self):
+        """A damaged payload reads as no session."""
+        assert loads(b'm\xff') is None
+        assert loads(b'x{}') is None
+        assert loads(dumps({'a': 1})[:-2]) is None
+
+
+class TestServerSideSessions:
+    """Sessions kept in the store, with only their id in the cookie."""
+
+    def test_cookie_holds_id(self, user, testapp, store):
+        """The cookie names the session, whose data is in the store."""
+        log_in(testapp, user)
+        sid = testapp.cookies['session']
+        assert len(sid) == 32
+        payload, ttl = store.load(sid)
+        assert loads(payload)['_user_id'] == str(user.id)
+        assert ttl > 0
+
+    def test_lazy(self, app, store):
+        """A request that never uses the session never touches the store."""
+        with app.test_client() as client:
+            client.set_cookie('localhost', 'session', 'a' * 32)
+            response = client.get('/static/css/style.css')
+        assert response.status_code == 200
+        assert store.calls == []
+        assert 'Set-Cookie' not in response.headers
+
+    def test_read_only(self, user, testapp, store):
+        """Using a session without changing it loads it and writes nothing."""
+        log_in(testapp, user)
+        del store.calls[:]
+        res = testapp.get('/users/')
+        assert 'Set-Cookie' not in res.headers
+        assert store.calls == ['load']
+
+    def test_sliding_expiry(self, user, app, testapp, store):
+        """An unchanged session has its expiry pushed back once it's older than the refresh interval."""
+        log_in(testapp, user)
+        del store.calls[:]
+        app.session_interface.refresh_interval = 0
+        testapp.get('/users/')
+        assert store.calls == ['load', 'touch']
+
+    def test_login_changes_id(self, user, testapp, store):
+        """Logging in and out moves the session to a new id and drops the old one."""
+        testapp.post('/', {'username': user.username, 'password': 'wrong'})
+        anonymous = testapp.cookies['session']
+        log_in(testapp, user)
+        logged_in = testapp.cookies['session']
+        assert logged_in != anonymous
+        assert store.load(anonymous) == (None, None)
+        testapp.get('/logout/')
+        assert testapp.cookies['session'] != logged_in
+        assert store.load(logged_in) == (None, None)
+
+    def test_unknown_id(self, user, app, store):
+        """An id the store doesn't know is never adopted."""
+        with app.test_client() as client:
+            client.set_cookie('localhost', 'session', 'a' * 32)
+            client.post('/', data={'username': user.username, 'password': 'myprecious'})
+            sid = next(cookie.value for cookie in client.cookie_jar if cookie.name == 'session')
+        assert sid != 'a' * 32
+        assert store.load('a' * 32) == (None, None)
+        assert loads(store.load(sid)[0])['_user_id'] == str(user.id)
+
+    def test_emptied(self, app, store):
+        """A session emptied of its data is deleted along with its cookie."""
+        with app.test_client() as client:
+            with client.session_transaction() as session:
+                session['flavor'] = 'white russian'
+            sid = next(cookie.value for cookie in client.cookie_jar if cookie.name == 'session')
+            with client.session_transaction() as session:
+                session.clear()
+            assert not any(cookie.name == 'session' for cookie in client.cookie_jar)
+        assert store.load(sid) == (None, None)
+
+
+class FakeRedis(object):
+    """Just enough of a redis client for `RedisSessionStore`, recording its round trips."""
+
+    def __init__(self):
+        """Start empty."""
+        self.values = {}
+        self.ttls = {}
+        self.round_trips = []
+
+    def pipeline(self, transaction=True):
+        """Return a pipeline that runs its commands in one round trip."""
+        return FakePipeline(self)
+
+    def get(self, key):
+        """Return the value of `key`."""
+        return self.values.get(key)
+
+    def ttl(self, key):
+        """Return the seconds `key` has left."""
+        return self.ttls.get(key, -2)
+
+    def set(self, key, value, ex=None):
+        """Set `key`."""
+        self.values[key] = value
+        self.ttls[key] = ex
+
+    def expire(self, key, seconds):
+        """Set the expiry of `key`."""
+        self.round_trips.append(['expire'])
+        self.ttls[key] = seconds
+
+    def delete(self, key):
+        """Remove `key`."""
+        self.values.pop(key, None)
+        self.ttls.pop(key, None)
+
+
+class FakePipeline(object):
+    """Commands queued for one round trip."""
+
+    def __init__(self, client):
+        """Queue commands for `client`."""
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        """Queue the command `name`."""
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        """Run the queued commands."""
+        self.client.round_trips.append([name for name, _, _ in self.commands])
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class TestRedisSessionStore:
+    """Sessions in Redis."""
+
+    def test_round_trips(self):
+        """Loading and saving each take one round trip."""
+        client = FakeRedis()
+        store = RedisSessionStore(client)
+        store.save('old', b'm1', 60)
+        store.save('new', b'm2', 60, replaces='old')
+        assert store.load('new') == (b'm2', 60)
+        assert store.load('old') == (None, None)
+        store.touch('new', 120)
+        assert client.values == {'session/new': b'm2'}
+        assert client.ttls == {'session/new': 120}
+        assert client.round_trips == [['set'], ['set', 'delete'], ['get', 'ttl'], ['get', 'ttl'], ['expire']]
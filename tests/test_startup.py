@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Startup tests."""
+import io
+import sys
+
+from dude.app import create_app, warm_up
+from dude.startup import StartupProfile
+
+
+class TestStartupProfile:
+    """Timing the steps of `create_app`."""
+
+    def test_disabled(self):
+        """A disabled profile records nothing."""
+        with StartupProfile() as profile:
+            with profile.step('nothing'):
+                pass
+        assert profile.steps == []
+
+    def test_steps(self, monkeypatch):
+        """Each step's time and imports are reported."""
+        monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+        stream = io.StringIO()
+        with StartupProfile(enabled=True, stream=stream) as profile:
+            with profile.step('import'):
+                import colorsys  # noqa: F401
+            with profile.step('idle'):
+                pass
+        [(name, elapsed, import_time, modules), idle] = profile.steps
+        assert name == 'import'
+        assert 0 < import_time <= elapsed
+        assert modules == 1
+        assert idle[2] == 0
+        assert stream.getvalue().splitlines()[1].startswith('import ')
+
+    def test_create_app(self, monkeypatch, capsys):
+        """`DUDE_STARTUP_PROFILE` reports on `create_app`."""
+        monkeypatch.setenv('DUDE_STARTUP_PROFILE', '1')
+        create_app('tests.settings')
+        report = capsys.readouterr().err
+        for step in ('settings', 'admin', 'cache', 'db', 'blueprints', 'total'):
+            assert '\n{0} '.format(step) in report
+
+
+class TestLazyAdmin:
+    """The admin is loaded by its first request."""
+
+    def test_loaded_on_first_request(self, app, db, testapp):
+        """The first request to /admin/ registers and serves the admin views."""
+        assert 'admin' not in app.extensions
+        assert 'user.index_view' not in app.view_functions
+        testapp.get('/about/')
+        assert 'admin' not in app.extensions
+
+        res = testapp.get('/admin/user/')
+        assert res.html.find('th', class_='column-header col-username')
+        assert 'user.index_view' in app.view_functions
+        testapp.get('/admin/role/')
+        assert len(app.extensions['admin']) == 1
+
+    def test_index(self, app, db, testapp):
+        """The admin index is served by the first request and every one after."""
+        res = testapp.get('/admin/')
+        assert 'admin_loader' not in app.view_functions
+        assert res.status_code == 200
+        testapp.get('/admin/')
+        testapp.get('/admin/user/')
+        testapp.get('/admin/nothing/', status=404)
+
+    def test_unknown(self, app, testapp):
+        """Paths the admin doesn't have are not found."""
+        testapp.get('/admin/nothing/', status=404)
+        assert 'admin' in app.extensions
+
+    def test_migration_commands(self, app):
+        """The db commands set up Flask-Alembic when they're used."""
+        assert 'alembic' not in app.extensions
+        result = app.test_cli_runner().invoke(args=['db', '--help'])
+        assert result.exit_code == 0
+        assert 'upgrade' in result.output
+        assert 'alembic' in app.extensions
+
+
+class TestWarmUp:
+    """Preparing an app before it serves, as the gunicorn master does."""
+
+    def test_warm_up(self, app):
+        """The admin is loaded and the templates compiled without touching the database."""
+        from dude.queries import count_queries
+
+        with count_queries() as queries:
+            assert warm_up(app) is app
+        assert queries.count == 0
+        assert 'user.index_view' in app.view_functions
+        assert 'public/home.html' in {name for _, name in app.jinja_env.cache.keys()}
+
+    def test_dispose_engines(self, app, db):
+        """Every pooled connection is closed."""
+        db.session.execute('SELECT 1')
+        db.session.commit()
+        pool = db.get_engine(app).pool
+        db.dispose_engines(app)
+        assert db.get_engine(app).pool is not pool
+
+
+class TestGunicornConfig:
+    """The gunicorn server hooks."""
+
+    def test_on_starting(self, app, tmpdir):
+        """Metrics files left by earlier workers are removed."""
+        from dude import gunicorn_config
+
+        tmpdir.join('123.json').write('[]')
+        app.config['METRICS_DIR'] = str(tmpdir)
+        gunicorn_config.on_starting(FakeServer(app))
+        assert tmpdir.listdir() == []
+
+    def test_fork_hooks(self, app):
+        """Forks start with fresh pools and no metrics."""
+        from dude import gunicorn_config
+        from dude.metrics import logins_total, registry
+
+        logins_total.inc(result='success')
+        server = FakeServer(app)
+        gunicorn_config.pre_fork(server, None)
+        gunicorn_config.post_fork(server, None)
+        assert registry.snapshot() == {}
+
+    def test_without_freeze(self, app, monkeypatch):
+        """Before Python 3.7 the master warns that workers won't share its memory."""
+        import gc
+
+        from dude import gunicorn_config
+
+        monkeypatch.delattr(gc, 'freeze', raising=False)
+        monkeypatch.setattr(gunicorn_config, '_freeze', gc.collect)
+        server = FakeServer(app)
+        gunicorn_config.when_ready(server)
+        assert len(server.log.warnings) == 1
+        assert 'Python 3.7' in server.log.warnings[0]
+
+    def test_asgi_app(self, app, tmpdir):
+        """The hooks find the Flask app behind the ASGI adapter."""
+        from uvicorn.middleware.wsgi import WSGIMiddleware
+
+        from dude import gunicorn_config
+
+        tmpdir.join('123.json').write('[]')
+        app.config['METRICS_DIR'] = str(tmpdir)
+        gunicorn_config.on_starting(FakeServer(WSGIMiddleware(app, workers=1)))
+        assert tmpdir.listdir() == []
+
+
+class FakeServer(object):
+    """Just enough of a gunicorn arbiter for the hooks."""
+
+    def __init__(self, app):
+        """Serve `app`."""
+        self.app = self
+        self.log = FakeLog()
+        self._wsgi = app
+
+    def wsgi(self):
+        """Return the app."""
+        return self._wsgi
+
+
+class FakeLog(object):
+    """Record gunicorn's warnings."""
+
+    def __init__(self):
+        """Start with none."""
+        self.warnings = []
+
+    def warning(self, msg, *args):
+        """Record `msg`."""
+        self.warnings.append(msg % args if args else msg)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Template bytecode cache tests."""
+import errno
+import os
+
+import pytest
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache
+
+from dude.app import register_templating
+from dude.commands import templates
+from dude.templating import AtomicFileSystemBytecodeCache, make_bytecode_cache
+
+
+class TestBytecodeCache:
+    """The Jinja bytecode cache."""
+
+    def test_disabled_by_default(self, app):
+        """The test settings don't configure a bytecode cache."""
+        assert app.jinja_env.bytecode_cache is None
+
+    def test_unknown_kind(self):
+        """An unknown cache type is a configuration error."""
+        with pytest.raises(ValueError):
+            make_bytecode_cache({'TEMPLATE_BYTECODE_CACHE': 'memcached'})
+
+    def test_compile(self, app, tmpdir):
+        """`flask templates compile` fills the cache with every template."""
+        app.config.update(TEMPLATE_BYTECODE_CACHE='filesystem', TEMPLATE_BYTECODE_CACHE_DIR=str(tmpdir))
+        register_templating(app)
+        assert isinstance(app.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+
+        result = app.test_cli_runner().invoke(templates, ['compile'])
+        assert result.exit_code == 0, result.output
+        compiled = int(result.output.split()[1])
+        assert compiled >= 8
+        assert len(tmpdir.listdir()) == compiled
+        assert any(name.startswith('admin/') for name in app.jinja_env.list_templates())
+
+    def test_read_only(self, tmpdir, monkeypatch):
+        """A cache that can't be written is skipped, and never left with partial files."""
+        cache = AtomicFileSystemBytecodeCache(str(tmpdir))
+        env = Environment(loader=DictLoader({'page.html': 'Hi {{ name }}'}), bytecode_cache=cache)
+
+        def read_only(src, dst):
+            raise OSError(errno.EROFS, 'Read-only file system')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(os, 'replace', read_only)
+            assert env.get_template('page.html').render(name='Walter') == 'Hi Walter'
+        assert tmpdir.listdir() == []
+
+        env.cache.clear()
+        env.get_template('page.html')
+        assert [path.basename.startswith('__jinja2_') for path in tmpdir.listdir()] == [True]
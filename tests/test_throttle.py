@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Login throttling tests."""
+import pytest
+
+from dude.public.forms import LoginForm
+from dude.throttle import LoginThrottled, SlidingWindowLimiter
+
+
+class FakeClock(object):
+    """A clock that only moves when told to."""
+
+    def __init__(self, now=1000.0):
+        """Start at `now`."""
+        self.now = now
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class TestSlidingWindowLimiter:
+    """Sliding window counting."""
+
+    def test_previous_window_decays(self, app):
+        """Hits in the previous window count less as it slides out."""
+        clock = FakeClock(1000.0)
+        limiter = SlidingWindowLimiter('test', clock)
+        for _ in range(4):
+            limiter.hit('foo', 100)
+        assert limiter.count('foo', 100) == 4
+        clock.now = 1150.0
+        assert limiter.count('foo', 100) == pytest.approx(2)
+        clock.now = 1200.0
+        assert limiter.count('foo', 100) == 0
+        assert limiter.count('bar', 100) == 0
+
+
+class TestLoginThrottle:
+    """Throttled logins."""
+
+    def test_rejects_correct_password(self, user, app, db):
+        """Once over the limit, even a correct password is rejected."""
+        app.config['LOGIN_THROTTLE_USERNAME_LIMIT'] = 2
+        for _ in range(2):
+            assert LoginForm(username=user.username, password='wrong').validate() is False
+
+        db.session.remove()
+        with pytest.raises(LoginThrottled):
+            LoginForm(username=user.username.upper(), password='myprecious').validate()
+
+    def test_limits_by_address(self, db, app):
+        """Attempts across many usernames are limited per client address."""
+        app.config['LOGIN_THROTTLE_IP_LIMIT'] = 3
+        for n in range(3):
+            assert LoginForm(username='unknown{}'.format(n), password='x').validate() is False
+        with pytest.raises(LoginThrottled):
+            LoginForm(username='another', password='x').validate()
+
+    def test_disabled(self, user, app):
+        """The throttle can be turned off."""
+        app.config.update(LOGIN_THROTTLE_ENABLED=False, LOGIN_THROTTLE_USERNAME_LIMIT=1)
+        for _ in range(3):
+            assert LoginForm(username=user.username, password='wrong').validate() is False
+
+    def test_returns_429(self, user, testapp, app):
+        """A throttled login gets a 429 with Retry-After."""
+        app.config['LOGIN_THROTTLE_USERNAME_LIMIT'] = 1
+        testapp.post('/', {'username': user.username, 'password': 'wrong'})
+        res = testapp.post('/', {'username': user.username, 'password': 'myprecious'}, status=429)
+        assert res.headers['Retry-After'] == '300'
+
+    def test_forwarded_clients(self, db, testapp, app):
+        """Clients behind the trusted proxy are limited apart, by the address it forwarded."""
+        app.config['LOGIN_THROTTLE_IP_LIMIT'] = 2
+        first, second = {'X-Forwarded-For': '203.0.113.1'}, {'X-Forwarded-For': '203.0.113.2'}
+        for n in range(2):
+            testapp.post('/', {'username': 'unknown{0}'.format(n), 'password': 'x'}, headers=first)
+        testapp.post('/', {'username': 'another', 'password': 'x'}, headers=first, status=429)
+        # Only the address the proxy added counts, not whatever the client claimed before it
+        spoofed = {'X-Forwarded-For': '198.51.100.7, 203.0.113.1'}
+        testapp.post('/', {'username': 'another', 'password': 'x'}, headers=spoofed, status=429)
+        testapp.post('/', {'username': 'another', 'password': 'x'}, headers=second, status=200)
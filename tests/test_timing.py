@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Request timing tests."""
+import json
+import logging
+
+import pytest
+
+from dude.app import create_app
+from dude.database import db as _db
+from dude.timing import TimedCache
+
+
+class TimingSettings(object):
+    """Test settings with timing on."""
+
+    SECRET_KEY = 'not-so-secret-in-tests'
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    BCRYPT_LOG_ROUNDS = 4
+    DEBUG_TB_ENABLED = False
+    CACHE_TYPE = 'simple'
+    WTF_CSRF_ENABLED = False
+    SERVER_TIMING_ENABLED = True
+
+
+@pytest.fixture
+def timed_app():
+    """An application with request timing enabled."""
+    app = create_app(TimingSettings)
+    with app.app_context():
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+
+
+class TestTiming:
+    """Server-Timing instrumentation."""
+
+    def test_disabled(self, testapp):
+        """Nothing is reported unless timing is enabled."""
+        assert 'Server-Timing' not in testapp.get('/about/').headers
+
+    def test_header(self, timed_app):
+        """Queries, templates and cache calls are reported per request."""
+        client = timed_app.test_client()
+        client.post('/register/', data={'username': 'walter', 'email': 'walter@example.com',
+                                        'password': 'shomer', 'confirm': 'shomer'})
+        header = client.get('/about/').headers['Server-Timing']
+        assert 'template;dur=' in header
+        assert 'total;dur=' in header
+
+        res = client.post('/', data={'username': 'walter', 'password': 'shomer'})
+        header = res.headers['Server-Timing']
+        assert 'db;dur=' in header
+        assert 'bcrypt;dur=' in header
+        assert 'cache;dur=' in header  # the login throttle's counters
+
+    def test_log(self, timed_app, caplog):
+        """Each timed request is logged as a json line."""
+        with caplog.at_level(logging.INFO, logger='dude.timing'):
+            timed_app.test_client().get('/about/')
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['path'] == '/about/'
+        assert record['status'] == 200
+        assert record['template_count'] >= 1
+
+    def test_sampling(self):
+        """A sample rate of zero times nothing."""
+        app = create_app(type('Settings', (TimingSettings,), {'SERVER_TIMING_SAMPLE_RATE': 0}))
+        assert isinstance(app.extensions['cache'][next(iter(app.extensions['cache']))], TimedCache)
+        assert 'Server-Timing' not in app.test_client().get('/about/').headers
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Auth token tests."""
+import base64
+
+import pytest
+
+from dude.queries import count_queries
+from dude.user.tokens import TokenUser, issue_token, load_token
+
+
+@pytest.fixture
+def tokens(app):
+    """Enable auth tokens."""
+    app.config['AUTH_TOKENS_ENABLED'] = True
+
+
+def basic(username, password):
+    """Return HTTP Basic auth headers."""
+    credentials = base64.b64encode('{0}:{1}'.format(username, password).encode('utf-8')).decode('ascii')
+    return {'Authorization': 'Basic ' + credentials}
+
+
+def bearer(token):
+    """Return bearer token auth headers."""
+    return {'Authorization': 'Bearer ' + token}
+
+
+class TestIssuing:
+    """Getting a token."""
+
+    def test_basic_credentials(self, user, testapp, tokens):
+        """A username and password get a token for that user."""
+        res = testapp.post('/token/', headers=basic(user.username, 'myprecious'))
+        assert res.json['expires_in'] == 900
+        assert load_token(res.json['token']).id == user.id
+
+    def test_bad_password(self, user, testapp, tokens):
+        """Wrong credentials get a 401."""
+        res = testapp.post('/token/', headers=basic(user.username, 'wrong'), status=401)
+        assert res.headers['WWW-Authenticate'].startswith('Basic')
+
+    def test_renew(self, user, testapp, tokens):
+        """A valid token gets a fresh one."""
+        res = testapp.post('/token/', headers=bearer(issue_token(user)))
+        assert load_token(res.json['token']).id == user.id
+
+    def test_session_not_accepted(self, user, testapp, tokens):
+        """A logged in browser can't be made to fetch a token."""
+        form = testapp.get('/').forms['loginForm']
+        form['username'] = user.username
+        form['password'] = 'myprecious'
+        form.submit().follow()
+        testapp.post('/token/', status=401)
+
+    def test_disabled(self, user, testapp):
+        """Without `AUTH_TOKENS_ENABLED` there's no token endpoint and tokens are ignored."""
+        testapp.post('/token/', headers=basic(user.username, 'myprecious'), status=404)
+        testapp.get('/users/me/', headers=bearer(issue_token(user)), status=401)
+
+
+class TestAuthenticating:
+    """Using a token."""
+
+    def test_no_query(self, user, testapp, tokens):
+        """Once the user is cached, a token request runs no query."""
+        token = issue_token(user)
+        res = testapp.get('/users/me/', headers=bearer(token))
+        assert res.json == {'id': user.id, 'is_admin': False}
+        with count_queries() as queries:
+            testapp.get('/users/me/', headers=bearer(token))
+        assert queries.count == 0
+        assert 'Set-Cookie' not in res.headers
+
+    def test_password_change(self, user, testapp, tokens):
+        """Setting a password revokes the tokens issued before."""
+        token = issue_token(user)
+        user.set_password('white russian')
+        user.save()
+        testapp.get('/users/me/', headers=bearer(token), status=401)
+        testapp.get('/users/me/', headers=bearer(issue_token(user)))
+
+    def test_deactivated(self, user, testapp, tokens):
+        """Deactivating a user revokes their tokens."""
+        token = issue_token(user)
+        user.update(is_active=False)
+        testapp.get('/users/me/', headers=bearer(token), status=401)
+
+    def test_expired(self, user, app, testapp, tokens):
+        """Tokens older than `AUTH_TOKEN_MAX_AGE` are refused."""
+        token = issue_token(user)
+        app.config['AUTH_TOKEN_MAX_AGE'] = -1
+        testapp.get('/users/me/', headers=bearer(token), status=401)
+
+    def test_tampered(self, user, testapp, tokens):
+        """A token whose claims were changed is refused."""
+        token = issue_token(user)
+        signature = token.partition('.')[2]
+        forged = base64.urlsafe_b64encode('[{0},true,true,0]'.format(user.id).encode('ascii')).decode('ascii')
+        testapp.get('/users/me/', headers=bearer(forged.rstrip('=') + '.' + signature), status=401)
+        testapp.get('/users/me/', headers=bearer('nonsense'), status=401)
+
+    def test_page_not_cached(self, user, testapp, tokens):
+        """A page rendered for a token's user is never served to anyone else."""
+        res = testapp.get('/about/', headers=bearer(issue_token(user)))
+        assert 'Logged in as {0}'.format(user.username) in res
+        assert 'X-Page-Cache' not in res.headers
+        res = testapp.get('/about/')
+        assert res.headers['X-Page-Cache'] == 'miss'
+        assert user.username not in res
+
+    def test_other_attributes(self, user, tokens):
+        """Anything the token doesn't carry is read from the full user."""
+        token_user = load_token(issue_token(user))
+        assert isinstance(token_user, TokenUser)
+        assert token_user.get_id() == str(user.id)
+        assert token_user.username == user.username
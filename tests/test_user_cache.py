@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""User loader cache tests."""
+import pytest
+
+from dude.extensions import cache
+from dude.public.views import load_user
+from dude.user.cache import user_cache
+from dude.user.models import User
+
+
+@pytest.fixture
+def cached_user(db):
+    """A saved user with an empty cache."""
+    cache.clear()
+    user = User('foo', 'foo@bar.com', password='foobarbaz123', is_active=True)
+    user.save()
+    return user
+
+
+class TestUserCache:
+    """Cached user loading."""
+
+    def test_miss_then_hit(self, db, cached_user):
+        """The first load queries, the second is served from the cache."""
+        before = user_cache.cache_info()
+        assert load_user(str(cached_user.id)) == cached_user
+        db.session.expunge_all()
+        restored = load_user(str(cached_user.id))
+        after = user_cache.cache_info()
+        assert after.misses == before.misses + 1
+        assert after.hits == before.hits + 1
+        assert restored.id == cached_user.id
+        assert restored.username == 'foo'
+        assert restored.is_active is True
+
+    def test_password_is_not_cached(self, db, cached_user):
+        """The password hash is loaded lazily on a restored user."""
+        load_user(cached_user.id)
+        assert 'password' not in user_cache.columns
+        db.session.expunge_all()
+        restored = load_user(cached_user.id)
+        assert restored.check_password('foobarbaz123') is True
+
+    def test_update_invalidates(self, db, cached_user):
+        """Updating a user drops the cached snapshot."""
+        load_user(cached_user.id)
+        cached_user.update(first_name='Jeff')
+        assert cache.get(user_cache.key(cached_user.id)) is None
+        db.session.expunge_all()
+        assert load_user(cached_user.id).first_name == 'Jeff'
+
+    def test_delete_invalidates(self, cached_user):
+        """Deleting a user drops the cached snapshot."""
+        user_id = cached_user.id
+        load_user(user_id)
+        cached_user.delete()
+        assert cache.get(user_cache.key(user_id)) is None
+        assert load_user(user_id) is None
+
+    def test_unknown_user(self, db):
+        """Unknown ids are not cached."""
+        assert load_user('12345') is None
+        assert cache.get(user_cache.key(12345)) is None
+
+    def test_invalid_id(self, db):
+        """Ids that aren't numbers are unknown users, not errors."""
+        info = user_cache.cache_info()
+        assert load_user('abc') is None
+        assert load_user(None) is None
+        assert user_cache.values('abc', ('email',)) is None
+        assert user_cache.cache_info() == info